@@ -0,0 +1,52 @@
+from dotenv import load_dotenv
+from typing import List, Optional
+import os
+
+load_dotenv()
+
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.getenv(name, str(default)))
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    return os.getenv(name, str(default)).lower() in ("1", "true", "yes", "on")
+
+
+class Settings:
+    """Runtime settings, read once from the environment (and a .env file if present)"""
+
+    def __init__(self):
+        # Database
+        self.database_url: str = os.getenv("DATABASE_URL", "sqlite:///./test.db")
+        # Comma-separated read replicas of the primary; read-only queries are spread over them
+        self.database_replica_urls: List[str] = [
+            url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()
+        ]
+        self.db_pool_size: int = _env_int("DB_POOL_SIZE", 5)           # connections kept open
+        self.db_max_overflow: int = _env_int("DB_MAX_OVERFLOW", 10)    # extra connections under load
+        self.db_pool_timeout: int = _env_int("DB_POOL_TIMEOUT", 30)    # seconds to wait for a free connection
+        self.db_pool_recycle: int = _env_int("DB_POOL_RECYCLE", 1800)  # seconds before a connection is replaced
+        self.db_echo: bool = _env_bool("DB_ECHO", False)
+
+        # SQLite tuning, applied to every new connection
+        self.sqlite_wal: bool = _env_bool("SQLITE_WAL", True)  # readers no longer block the writer
+        self.sqlite_synchronous: str = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")  # safe with WAL, fsync at checkpoints only
+        self.sqlite_busy_timeout: int = _env_int("SQLITE_BUSY_TIMEOUT", 5000)  # ms to wait on a locked database
+        self.sqlite_mmap_size: int = _env_int("SQLITE_MMAP_SIZE", 256 * 1024 * 1024)  # bytes read through mmap
+
+        # Websocket broker; unset runs everything in-process
+        self.broker_url: Optional[str] = os.getenv("BROKER_URL")
+        self.broker_prefix: str = os.getenv("BROKER_PREFIX", "swaraj")
+
+        # Password hashing
+        self.bcrypt_rounds: int = _env_int("BCRYPT_ROUNDS", 12)
+        self.hash_workers: int = _env_int("HASH_WORKERS", min(4, os.cpu_count() or 1))
+        self.hash_queue_limit: int = _env_int("HASH_QUEUE_LIMIT", 64)
+
+    @property
+    def is_sqlite(self) -> bool:
+        return self.database_url.startswith("sqlite")
+
+
+settings = Settings()
@@ -1,9 +1,87 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
+from itertools import cycle
+from typing import Tuple
+from app.config import settings
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
+SQLALCHEMY_DATABASE_URL = settings.database_url
 
-engine = create_engine("sqlite:///./test.db", connect_args={"check_same_thread": False})
+# Async drivers for the same database, used by request handlers and websockets
+ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
+SQLITE_SYNCHRONOUS_MODES = {"OFF", "NORMAL", "FULL", "EXTRA"}
+
+
+def async_database_url(url: str) -> str:
+    scheme, sep, rest = url.partition("://")
+    return ASYNC_DRIVERS.get(scheme, scheme) + sep + rest
+
+
+def _pool_options() -> dict:
+    return {
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_recycle": settings.db_pool_recycle,
+        "echo": settings.db_echo,
+    }
+
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    synchronous = settings.sqlite_synchronous.upper()
+    if synchronous not in SQLITE_SYNCHRONOUS_MODES:
+        raise ValueError(f"SQLITE_SYNCHRONOUS must be one of {sorted(SQLITE_SYNCHRONOUS_MODES)}")
+    cursor = dbapi_connection.cursor()
+    if settings.sqlite_wal:
+        cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute(f"PRAGMA synchronous={synchronous}")
+    cursor.execute(f"PRAGMA busy_timeout={int(settings.sqlite_busy_timeout)}")
+    cursor.execute(f"PRAGMA mmap_size={int(settings.sqlite_mmap_size)}")
+    cursor.close()
+
+
+def create_engines(url: str) -> Tuple[Engine, AsyncEngine]:
+    """Sync and async engine for one database, with the configured pool and SQLite tuning"""
+    is_sqlite = url.startswith("sqlite")
+    sync_engine = create_engine(
+        url,
+        connect_args={"check_same_thread": False} if is_sqlite else {},
+        **_pool_options()
+    )
+    async_engine = create_async_engine(async_database_url(url), **_pool_options())
+    if is_sqlite:
+        event.listen(sync_engine, "connect", _apply_sqlite_pragmas)
+        event.listen(async_engine.sync_engine, "connect", _apply_sqlite_pragmas)
+    return sync_engine, async_engine
+
+
+engine, async_engine = create_engines(SQLALCHEMY_DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-Base = declarative_base()
\ No newline at end of file
+# Objects stay readable after commit, as lazy refreshes are not allowed in async code
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+# Read replicas, used round-robin by ReadSessionLocal/AsyncReadSessionLocal. They
+# lag the primary, so anything that must see a write it just made uses the
+# primary sessions above. Without replicas both fall back to the primary.
+replica_engines = [create_engines(url) for url in settings.database_replica_urls]
+_read_sessions = cycle([
+    sessionmaker(autocommit=False, autoflush=False, bind=sync_engine)
+    for sync_engine, _ in replica_engines
+] or [SessionLocal])
+_async_read_sessions = cycle([
+    async_sessionmaker(replica_async_engine, autoflush=False, expire_on_commit=False)
+    for _, replica_async_engine in replica_engines
+] or [AsyncSessionLocal])
+
+
+def ReadSessionLocal():
+    return next(_read_sessions)()
+
+
+def AsyncReadSessionLocal():
+    return next(_async_read_sessions)()
+
+
+Base = declarative_base()
@@ -0,0 +1,32 @@
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import AsyncIterator, Iterator
+from app.database import SessionLocal, AsyncSessionLocal, ReadSessionLocal, AsyncReadSessionLocal
+
+
+def get_db() -> Iterator[Session]:
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_db() -> AsyncIterator[AsyncSession]:
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def get_read_db() -> Iterator[Session]:
+    """Session on a read replica, for read-only requests that may lag the primary"""
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_read_db() -> AsyncIterator[AsyncSession]:
+    """Async session on a read replica, for read-only requests that may lag the primary"""
+    async with AsyncReadSessionLocal() as db:
+        yield db
@@ -1,6 +1,8 @@
 from fastapi import FastAPI
+from contextlib import asynccontextmanager
 import uvicorn
-from app.database import engine, SessionLocal, Base
+from app.database import engine, async_engine, replica_engines, SessionLocal, Base
+from app.dependencies import get_db
 from typing import Annotated
 from sqlalchemy.orm import Session
 from routes.auth import router as auth_router
@@ -17,22 +19,55 @@ from websocket.location_ws import location_websocket_endpoint
 from websocket.contacts_ws import contacts_websocket_endpoint
 from websocket.sos_ws import sos_websocket_endpoint
 from websocket.admin_ws import admin_websocket_endpoint
+from websocket.manager import manager
+from services.location_services import location_buffer, ensure_live_location_user_index
+from services.location_history import history_maintenance
+from services.geo_index import geo_index
+from services.notification_services import notification_dispatcher
+from services.sos_services import ensure_sos_event_columns
+from services.sos_escalation import sos_scheduler
+from services.awareness import ensure_awareness_indexes
+from services.awareness_search import ensure_awareness_search
+from services.reaction import ensure_reaction_indexes, reaction_buffer, reaction_reconciler
 from routes import mentorship
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await manager.start()
+    await notification_dispatcher.start()
+    await sos_scheduler.start()
+    with SessionLocal() as db:
+        geo_index.load(db)
+    location_buffer.start()
+    history_maintenance.start()
+    reaction_buffer.start()
+    reaction_reconciler.start()
+    yield
+    await reaction_reconciler.stop()
+    await reaction_buffer.stop()
+    await history_maintenance.stop()
+    await location_buffer.stop()
+    await sos_scheduler.stop()
+    await notification_dispatcher.stop()
+    await manager.stop()
+    await async_engine.dispose()
+    for _, replica_async_engine in replica_engines:
+        await replica_async_engine.dispose()
+
+
+app = FastAPI(lifespan=lifespan)
 Base.metadata.create_all(bind=engine)
+ensure_live_location_user_index(engine)
+ensure_sos_event_columns(engine)
+ensure_reaction_indexes(engine)
+ensure_awareness_indexes(engine)
+ensure_awareness_search(engine)
 
 
 app.include_router(mentorship.router)
 
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 db_dependency = Annotated[Session, Depends(get_db)]
 user_dependency = Annotated[User, Depends(get_current_user)]
 
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Benchmark: scalar haversine movement filter vs the batched NumPy version
+"""
+
+import math
+import random
+import time
+import numpy as np
+
+from utils.geo import haversine_distance, significant_moves, filter_moves, MIN_MOVE_KM, MIN_MOVE_INTERVAL
+
+
+def make_fixes(n):
+    random.seed(42)
+    rows = []
+    for _ in range(n):
+        lat, lon = 28.4 + random.random() * 0.4, 77.0 + random.random() * 0.4
+        t = 1_700_000_000 + random.random() * 1000
+        rows.append((lat, lon, t, lat + random.gauss(0, 0.0002), lon + random.gauss(0, 0.0002), t + random.random() * 60))
+    return rows
+
+
+def scalar_filter(rows):
+    # Same per-fix logic location_ws used before batching
+    keep = []
+    for prev_lat, prev_lon, prev_t, lat, lon, t in rows:
+        distance = haversine_distance(prev_lat, prev_lon, lat, lon)
+        keep.append(not (distance < MIN_MOVE_KM and t - prev_t < MIN_MOVE_INTERVAL))
+    return keep
+
+
+def batched_filter(arrays):
+    keep, _, _, _ = significant_moves(*arrays)
+    return keep
+
+
+def dispatched_filter(track):
+    keep, _, _ = filter_moves(None, *track)
+    return keep
+
+
+def bench(fn, arg, repeat):
+    best = math.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(arg)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    print("🚀 Movement filter benchmark (best of 5)")
+    print(f"{'fixes':>8} {'scalar ms':>10} {'numpy ms':>10} {'speedup':>8} {'filter_moves ms':>16}")
+    for n in (1, 10, 100, 1_000, 10_000, 100_000):
+        rows = make_fixes(n)
+        columns = [list(col) for col in zip(*rows)]
+        arrays = tuple(np.array(col, dtype=np.float64) for col in columns)
+        assert list(batched_filter(arrays)) == scalar_filter(rows), "results differ"
+        # filter_moves chains one user's fixes, so time it on the current fixes as a single track
+        track = (columns[3], columns[4], sorted(columns[5]))
+        scalar = bench(scalar_filter, rows, 5)
+        batched = bench(batched_filter, arrays, 5)
+        dispatched = bench(dispatched_filter, track, 5)
+        print(f"{n:>8} {scalar * 1000:>10.3f} {batched * 1000:>10.3f} {scalar / batched:>7.1f}x {dispatched * 1000:>16.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Benchmark: event loop latency seen by websocket streams during a login storm,
+with bcrypt run inline on the loop (before) vs on the bounded hash pool (after)
+"""
+
+import asyncio
+import statistics
+import time
+
+from fastapi import HTTPException
+from utils.hashing import bcrypt_context, PasswordHasher, BCRYPT_ROUNDS
+
+LOGINS = 40
+TICK = 0.01  # a websocket frame is due every 10 ms
+
+
+async def ticker(lags, stop):
+    # Records how late each frame would have gone out
+    while not stop.is_set():
+        due = time.perf_counter() + TICK
+        await asyncio.sleep(TICK)
+        lags.append(time.perf_counter() - due)
+
+
+async def inline_login(hashed):
+    return bcrypt_context.verify("correct horse", hashed)
+
+
+async def storm(login, hashed):
+    lags, stop = [], asyncio.Event()
+    tick = asyncio.create_task(ticker(lags, stop))
+    await asyncio.sleep(0.05)
+    start = time.perf_counter()
+    results = await asyncio.gather(*(login(hashed) for _ in range(LOGINS)), return_exceptions=True)
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await tick
+    rejected = sum(isinstance(r, HTTPException) and r.status_code == 429 for r in results)
+    lags.sort()
+    return {
+        "elapsed": elapsed,
+        "rejected": rejected,
+        "p50": statistics.median(lags) * 1000,
+        "p99": lags[int(len(lags) * 0.99) - 1] * 1000,
+        "max": lags[-1] * 1000,
+    }
+
+
+def report(name, r):
+    print(f"{name:<26} {r['elapsed']:>8.2f} {r['rejected']:>9} {r['p50']:>9.1f} {r['p99']:>9.1f} {r['max']:>9.1f}")
+
+
+async def main():
+    hashed = bcrypt_context.hash("correct horse")
+    print(f"🚀 Login storm: {LOGINS} concurrent logins, bcrypt rounds={BCRYPT_ROUNDS}")
+    print(f"{'mode':<26} {'total s':>8} {'429s':>9} {'lag p50':>9} {'lag p99':>9} {'lag max':>9}  (lag in ms)")
+    report("inline (before)", await storm(inline_login, hashed))
+    pool = PasswordHasher()
+    report("pool (after)", await storm(lambda h: pool.verify("correct horse", h), hashed))
+    limited = PasswordHasher(queue_limit=LOGINS // 4)
+    report(f"pool, queue limit {LOGINS // 4}", await storm(lambda h: limited.verify("correct horse", h), hashed))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Benchmark: awareness search over a synthetic Hindi/English corpus (1M posts by default),
+naive LIKE '%term%' scan (before) vs the ranked FTS5 index (after)
+
+The vocabulary is small, so its common terms are in most posts. For those the
+unranked LIKE stops after its first 10 hits, while search ranks the newest
+SEARCH_WINDOW matches; the index pays off on rarer and inflected terms.
+
+    python bench_search.py [posts]
+"""
+
+import importlib
+import os
+import pkgutil
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+from sqlalchemy import or_, select, text
+from sqlalchemy.orm import Session
+
+import models
+from app.database import create_engines
+from models.awareness import Awareness, AwarenessCategory, AwarenessSource
+from services.awareness_search import ensure_awareness_search, search_index_for
+from utils.text_search import tokenize
+
+POSTS = 1_000_000
+INSERT_BATCH = 20_000
+RUNS = 20
+
+ENGLISH = (
+    "safety women rights law police helpline harassment workplace travel night metro bus station "
+    "report complaint court justice domestic violence protection act contact emergency alert location "
+    "share trusted friend family support counselling legal aid awareness campaign school college "
+    "street light camera patrol cyber stalking online fraud dowry marriage property inheritance"
+).split()
+HINDI = (
+    "महिला सुरक्षा अधिकार कानून पुलिस हेल्पलाइन उत्पीड़न कार्यस्थल यात्रा रात मेट्रो बस स्टेशन "
+    "शिकायत अदालत न्याय घरेलू हिंसा संरक्षण अधिनियम आपातकाल परिवार सहायता परामर्श जागरूकता "
+    "अभियान विद्यालय सड़क कैमरा साइबर दहेज विवाह संपत्ति मदद नंबर"
+).split()
+RARE = "posh"  # in about 1 post in 10,000
+
+
+def load_models():
+    # Awareness relates to every other model through User, so the whole registry must be importable
+    for module in pkgutil.iter_modules(models.__path__):
+        importlib.import_module(f"models.{module.name}")
+
+
+def make_post(rng):
+    vocab = HINDI if rng.random() < 0.4 else ENGLISH
+    # Zipf-like: low indexes are far more common
+    words = [vocab[min(int(rng.paretovariate(1.2)) - 1, len(vocab) - 1)] for _ in range(46)]
+    if rng.random() < 0.0001:
+        words[rng.randrange(len(words))] = RARE
+    return " ".join(words[:6]).capitalize(), " ".join(words[6:]) + ".", rng.choice(list(AwarenessCategory))
+
+
+def build_corpus(engine, n):
+    rng = random.Random(42)
+    Awareness.__table__.create(engine)
+    start = time.perf_counter()
+    with engine.begin() as conn:
+        for offset in range(0, n, INSERT_BATCH):
+            rows = []
+            for _ in range(min(INSERT_BATCH, n - offset)):
+                title, content, category = make_post(rng)
+                rows.append({"title": title, "content": content, "category": category,
+                             "source": AwarenessSource.ngo, "is_verified": True})
+            conn.execute(Awareness.__table__.insert(), rows)
+    return time.perf_counter() - start
+
+
+def timed(fn, runs=RUNS):
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000, result
+
+
+def like_scan(db, q, category):
+    # What a search would do without an index: unranked substring match over every post
+    words = q.rstrip("*").split()
+    clauses = [or_(Awareness.title.like(f"%{word}%"), Awareness.content.like(f"%{word}%")) for word in words]
+    query = select(Awareness.id).where(*clauses, Awareness.is_verified.is_(True))
+    if category:
+        query = query.where(Awareness.category == category)
+    return db.scalars(query.order_by(Awareness.created_at.desc()).limit(10)).all()
+
+
+def fts_search(db, index, q, category):
+    terms, prefix = tokenize(q), q.endswith("*")
+    floor = db.scalar(index.window_floor(terms, category, prefix)) or 0
+    return db.scalars(index.query(terms, category, floor, limit=10, prefix=prefix)).all()
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else POSTS
+    load_models()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench_search.db")
+        engine, _ = create_engines(f"sqlite:///{path}")
+        print(f"🚀 Awareness search: {n:,} posts, median of {RUNS} runs")
+        print(f"corpus insert      {build_corpus(engine, n):>8.1f} s  ({os.path.getsize(path) / 2**20:.0f} MB)")
+        size = os.path.getsize(path)
+        start = time.perf_counter()
+        ensure_awareness_search(engine)
+        print(f"index build        {time.perf_counter() - start:>8.1f} s  (+{(os.path.getsize(path) - size) / 2**20:.0f} MB)")
+        start = time.perf_counter()
+        with engine.begin() as conn:
+            conn.execute(text("INSERT INTO awareness_search(awareness_search) VALUES ('optimize')"))
+        print(f"index optimize     {time.perf_counter() - start:>8.1f} s")
+
+        index = search_index_for(engine)
+        cases = [
+            ("common term", "safety", None),
+            ("rare term", RARE, None),
+            ("Hindi term", "सुरक्षा", None),
+            ("Hindi inflected", "महिलाओं", None),
+            ("two terms", "helpline metro", None),
+            ("term + category", "harassment", AwarenessCategory.law),
+            ("prefix", "counsel*", None),
+        ]
+        print(f"{'query':<18} {'LIKE ms':>10} {'FTS ms':>10} {'speedup':>8} {'hits':>5}")
+        with Session(engine) as db:
+            for name, q, category in cases:
+                like_ms, _ = timed(lambda: like_scan(db, q, category), runs=3)
+                fts_ms, hits = timed(lambda: fts_search(db, index, q, category))
+                print(f"{name:<18} {like_ms:>10.2f} {fts_ms:>10.2f} {like_ms / fts_ms:>7.1f}x {len(hits):>5}")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
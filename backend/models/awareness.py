@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Enum, ForeignKey
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Enum, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from datetime import datetime
@@ -37,3 +37,9 @@ class Awareness(Base):
     
     # Relationships (for future reactions)
     reactions = relationship("Reaction", back_populates="awareness_post")
+
+    __table_args__ = (
+        # Keyset pagination of the feed, newest first, with and without a category
+        Index('ix_awareness_feed', 'is_verified', 'created_at', 'id'),
+        Index('ix_awareness_category_feed', 'category', 'is_verified', 'created_at', 'id'),
+    )
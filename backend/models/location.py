@@ -8,7 +8,7 @@ class LiveLocation(Base):
     __tablename__ = "live_locations"
 
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, unique=True, index=True)  # one row per user
     latitude = Column(Float, nullable=False)
     longitude = Column(Float, nullable=False)
     update_at = Column(DateTime, default=datetime.utcnow() + timedelta(hours=5, minutes=30), onupdate=datetime.utcnow() + timedelta(hours=5, minutes=30))
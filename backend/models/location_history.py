@@ -0,0 +1,17 @@
+from sqlalchemy import Column, Float, ForeignKey, Integer, DateTime, Index
+from app.database import Base
+
+
+class LocationHistory(Base):
+    __tablename__ = "location_history"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    latitude = Column(Float, nullable=False)
+    longitude = Column(Float, nullable=False)
+    recorded_at = Column(DateTime, nullable=False)
+    bucket = Column(Integer, nullable=False, index=True)  # day partition (days since epoch), used for retention
+
+    __table_args__ = (
+        Index("ix_location_history_user_recorded_at", "user_id", "recorded_at"),
+    )
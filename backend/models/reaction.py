@@ -1,7 +1,7 @@
 from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
-from sqlalchemy import UniqueConstraint
+from sqlalchemy import UniqueConstraint, Index
 from app.database import Base
 
 
@@ -20,4 +20,15 @@ class Reaction(Base):
     
     __table_args__ = (
         UniqueConstraint('user_id', 'awareness_id', name='unique_user_awareness_reaction'),
+        # Covers the per-post emoji GROUP BY of reaction summaries
+        Index('ix_reactions_awareness_emoji', 'awareness_id', 'emoji'),
     )
+
+
+class ReactionCount(Base):
+    """Reactions per post and emoji, kept in step with reactions on every write"""
+    __tablename__ = "awareness_reaction_counts"
+
+    awareness_id = Column(Integer, ForeignKey("awareness_posts.id"), primary_key=True)
+    emoji = Column(String(10), primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Float, ForeignKey, Integer, String, DateTime
+from sqlalchemy import Column, Float, ForeignKey, Integer, String, DateTime, Text
 from sqlalchemy.orm import relationship
 from app.database import Base
 from models.user import User
@@ -11,8 +11,31 @@ class SOSEvent(Base):
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     latitude = Column(Float, nullable=False)
     longitude = Column(Float, nullable=False)
-    status = Column(String, default = "triggered") # e.g., triggered, resolved
+    status = Column(String, default = "triggered") # triggered, escalated, acknowledged, responding, resolved
     triggered_at = Column(DateTime, default=datetime.utcnow() + timedelta(hours=5, minutes=30))
     timestamp = Column(DateTime, default=datetime.utcnow() + timedelta(hours=5, minutes=30))
+    delivery_status = Column(String, default="pending")  # pending, delivered, partial, failed
+    escalation_level = Column(Integer, default=0)  # unacknowledged timeouts so far
+    escalate_at = Column(DateTime, nullable=True)  # earliest time (UTC) any worker may claim the next escalation
+    acknowledged_by = Column(Integer, ForeignKey("users.id"), nullable=True)
 
-    user = relationship("User", back_populates="sos_requests")
\ No newline at end of file
+    user = relationship("User", back_populates="sos_requests", foreign_keys=[user_id])
+    deliveries = relationship("SOSDelivery", back_populates="sos_event")
+
+
+class SOSDelivery(Base):
+    """One notification of an SOS to one contact over one channel"""
+    __tablename__ = "sos_deliveries"
+
+    id = Column(Integer, primary_key=True, index=True)
+    sos_id = Column(Integer, ForeignKey("sos_events.id"), nullable=False, index=True)
+    contact_id = Column(Integer, ForeignKey("contacts.id"), nullable=True)
+    channel = Column(String, nullable=False)    # sms, email, push, websocket
+    recipient = Column(String, nullable=False)  # phone number, email address, device token or group
+    message = Column(Text, nullable=False)
+    status = Column(String, default="queued", nullable=False)  # queued, sending, sent, failed
+    attempts = Column(Integer, default=0, nullable=False)
+    last_error = Column(String, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    sos_event = relationship("SOSEvent", back_populates="deliveries")
\ No newline at end of file
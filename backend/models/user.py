@@ -16,7 +16,7 @@ class User(Base):
     hashed_password = Column(String)
     role = Column(Enum(UserRole), default=UserRole.user, nullable=False)
     contacts = relationship("Contact", back_populates="user")  # Relationship to Contact model
-    sos_requests = relationship("SOSEvent", back_populates="user")  # Relationship to SOSEvent model
+    sos_requests = relationship("SOSEvent", back_populates="user", foreign_keys="SOSEvent.user_id")  # Relationship to SOSEvent model
     reactions = relationship("Reaction", back_populates="user")  # Relationship to Reaction model
     locations = relationship("LiveLocation", back_populates="user")  # Relationship to LiveLocation model
     mentorship_sessions = relationship("MentorshipSession", back_populates="user")  # Relationship to MentorshipSession model
\ No newline at end of file
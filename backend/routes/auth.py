@@ -1,21 +1,21 @@
 from datetime import datetime,timedelta
 from typing import Annotated
 from fastapi import HTTPException, Depends, APIRouter
+from sqlalchemy import select
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel, EmailStr
 from starlette import status
-from app.database import SessionLocal, engine
+from app.dependencies import get_db, get_async_db
 from models.user import User, UserRole
-from passlib.context import CryptContext
 from jose import JWTError, jwt
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from schemas.user import Token
+from services.auth_services import SECRET_KEY, ALGORITHM, Principal, authenticate_token
+from utils.hashing import password_hasher
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 
-SECRET_KEY ="your_secret_key"
-ALGORITHM = "HS256"
-bcrypt_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_bearer = OAuth2PasswordBearer(tokenUrl="auth/login")
 
 class CreateUserRequest(BaseModel):
@@ -27,27 +27,22 @@ class UserLogin(BaseModel):
     email: EmailStr
     password: str
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
 
 db_dependency = Annotated[Session, Depends(get_db)]
+async_db_dependency = Annotated[AsyncSession, Depends(get_async_db)]
 @router.post("/", status_code=status.HTTP_201_CREATED)
-async def create_user(db: db_dependency, create_user_request: CreateUserRequest):
+async def create_user(db: async_db_dependency, create_user_request: CreateUserRequest):
     create_user_model = User(
         name=create_user_request.name,
         email=create_user_request.email,
-        hashed_password=bcrypt_context.hash(create_user_request.password)
+        hashed_password=await password_hasher.hash(create_user_request.password)
     )
     db.add(create_user_model)
-    db.commit()
+    await db.commit()
 
 @router.post("/token", response_model=Token)
-async def login_for_access_token(db: db_dependency, form_data: OAuth2PasswordRequestForm = Depends()):
-    user = authenticate_user(db, form_data.username, form_data.password)
+async def login_for_access_token(db: async_db_dependency, form_data: OAuth2PasswordRequestForm = Depends()):
+    user = await authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -59,11 +54,11 @@ async def login_for_access_token(db: db_dependency, form_data: OAuth2PasswordReq
 
 
 
-def authenticate_user(db: Session, username: str, password: str):
-    user = db.query(User).filter(User.email == username).first()
+async def authenticate_user(db: AsyncSession, username: str, password: str):
+    user = await db.scalar(select(User).where(User.email == username))
     if not user:
         return False
-    if not bcrypt_context.verify(password, user.hashed_password):
+    if not await password_hasher.verify(password, user.hashed_password):
         return False
     return user
 
@@ -77,26 +72,10 @@ def create_access_token(username: str, user_id: int, expires_delta: timedelta =
     token = jwt.encode(encode, SECRET_KEY, algorithm=ALGORITHM)
     return token
 
-async def get_current_user(db: db_dependency, token: str = Depends(oauth2_bearer)):
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        user_id: int = payload.get("user_id")
-        if username is None or user_id is None:
-            raise credentials_exception
-    except JWTError:
-        raise credentials_exception
-    user = db.query(User).filter(User.email == username).first()
-    if user is None:
-        raise credentials_exception
-    return user
+async def get_current_user(db: async_db_dependency, token: str = Depends(oauth2_bearer)) -> Principal:
+    return await authenticate_token(token, db)
 
-async def require_admin_or_ngo(current_user: User = Depends(get_current_user)):
+async def require_admin_or_ngo(current_user: Principal = Depends(get_current_user)):
     if current_user.role not in [UserRole.admin, UserRole.ngo]:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
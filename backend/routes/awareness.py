@@ -1,33 +1,27 @@
 from typing import Optional
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
 from routes.auth import require_admin_or_ngo, get_current_user
 from schemas.awareness import (
     AwarenessCreate,
     AwarenessResponse,
     AwarenessFeedResponse,
+    AwarenessSearchResponse,
     AwarenessCategory
 )
 from schemas.reaction import ReactionCreate, ReactionResponse, ReactionSummary
 from services.awareness import (
     create_awareness_post,
-    get_awareness_feed,
-    get_awareness_by_id
+    get_cached_awareness_feed,
+    get_awareness_by_id,
+    search_awareness
 )
 from services.reaction import (
     add_or_update_reaction,
     remove_reaction,
     get_reaction_summary
 )
-from app.database import SessionLocal
-
-
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+from app.dependencies import get_async_db, get_async_read_db
 
 
 router = APIRouter(prefix="/awareness", tags=["awareness"])
@@ -36,28 +30,44 @@ router = APIRouter(prefix="/awareness", tags=["awareness"])
 @router.get("/feed", response_model=AwarenessFeedResponse)
 async def read_feed(
     category: Optional[AwarenessCategory] = None,
-    page: int = 1,
-    page_size: int = 10,
-    db: Session = Depends(get_db)
+    page: int = Query(1, ge=1),
+    page_size: int = Query(10, ge=1, le=50),
+    cursor: Optional[str] = None
+):
+    """Public: Get paginated awareness feed (served from the feed cache).
+
+    Follow next_cursor (?cursor=) to page through; ?page= still works.
+    """
+    return await get_cached_awareness_feed(category, page, page_size, cursor)
+
+
+# Declared before /{post_id} so "search" is not taken for a post id
+@router.get("/search", response_model=AwarenessSearchResponse)
+async def search_posts(
+    q: str = Query(..., min_length=1, max_length=200),
+    category: Optional[AwarenessCategory] = None,
+    page: int = Query(1, ge=1),
+    page_size: int = Query(10, ge=1, le=50),
+    db: AsyncSession = Depends(get_async_read_db)
 ):
-    """Public: Get paginated awareness feed"""
-    return get_awareness_feed(db, category, page, page_size)
+    """Public: Search posts by title and content, best match first"""
+    return await search_awareness(db, q, category, page, page_size)
 
 
 @router.get("/{post_id}", response_model=AwarenessResponse)
-async def read_post(post_id: int, db: Session = Depends(get_db)):
+async def read_post(post_id: int, db: AsyncSession = Depends(get_async_read_db)):
     """Public: Get single awareness post"""
-    return get_awareness_by_id(db, post_id)
+    return await get_awareness_by_id(db, post_id)
 
 
 @router.post("/create", response_model=AwarenessResponse, status_code=201)
 async def create_post(
     awareness_data: AwarenessCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user=Depends(require_admin_or_ngo)
 ):
     """Protected: Admin/NGO create post"""
-    return create_awareness_post(db, awareness_data)
+    return await create_awareness_post(db, awareness_data)
 
 
 @router.post("/{post_id}/react", response_model=ReactionResponse)
@@ -65,10 +75,10 @@ async def react_to_post(
     post_id: int,
     reaction_data: ReactionCreate,
     current_user=Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Users react with emoji (1 per user per post)"""
-    return add_or_update_reaction(
+    return await add_or_update_reaction(
         db, current_user.id, post_id, reaction_data.emoji
     )
 
@@ -77,10 +87,10 @@ async def react_to_post(
 async def unreact_post(
     post_id: int,
     current_user=Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Remove user's reaction"""
-    removed = remove_reaction(db, current_user.id, post_id)
+    removed = await remove_reaction(db, current_user.id, post_id)
     if not removed:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -93,7 +103,7 @@ async def unreact_post(
 async def get_reactions(
     post_id: int,
     current_user=Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get reaction summary for post"""
-    return get_reaction_summary(db, post_id, current_user.id)
+    """Get reaction summary for post (on the primary, so users see their own reaction)"""
+    return await get_reaction_summary(db, post_id, current_user.id)
@@ -1,7 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from typing import Annotated, List
-from app.database import SessionLocal
+from app.dependencies import get_db
 from schemas.contact import ContactCreate, ContactResponse
 from services.contacts_services import create_contact, get_contacts_by_user
 from routes.auth import get_current_user
@@ -9,18 +9,12 @@ from models.user import User
 
 router = APIRouter()
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
 
 db_dependency = Annotated[Session, Depends(get_db)]
 user_dependency = Annotated[User, Depends(get_current_user)]
 
 @router.post("/contacts", response_model=ContactResponse)
-async def add_contact(
+def add_contact(
     contact: ContactCreate,
     db: db_dependency,
     current_user: user_dependency
@@ -36,7 +30,7 @@ async def add_contact(
         raise HTTPException(status_code=400, detail=f"Failed to create contact: {str(e)}")
 
 @router.get("/contacts", response_model=List[ContactResponse])
-async def get_contacts(
+def get_contacts(
     db: db_dependency,
     current_user: user_dependency
 ):
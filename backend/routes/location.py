@@ -1,36 +1,122 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Body, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from routes.auth import get_db, get_current_user
-from schemas.location import LocationUpdate, LocationResponse
-from services.location_services import upsert_live_location, get_live_location
-from models.user import User
-from typing import Annotated
+from sqlalchemy.ext.asyncio import AsyncSession
+from routes.auth import get_current_user, require_admin_or_ngo
+from app.dependencies import get_db, get_async_db
+from schemas.location import LocationUpdate, LocationResponse, LocationHistoryResponse, NearbyUserResponse
+from services.location_services import get_live_location, ingest_location_fixes
+from services.location_history import get_location_history
+from services.geo_index import geo_index
+from services.contacts_services import emergency_contact_query
+from services.sos_escalation import sos_scheduler
+from models.sos import SOSEvent
+from models.user import User, UserRole
+from typing import Annotated, List, Optional
+from datetime import datetime
 from fastapi import status
+import math
 
 router = APIRouter(prefix="/api/location", tags=["Location"])
 
+NEARBY_DISTANCE_STEP = 100  # metres; nearby distances are rounded up to this so they do not pinpoint anyone
+
 @router.post("/update", response_model=dict)
 def update_location(
     location_data: LocationUpdate,
-    db: Annotated[Session, Depends(get_db)],
     current_user: Annotated[User, Depends(get_current_user)]
 ):
-    location = upsert_live_location(
-        db=db,
-        user_id=current_user.id,
-        latitude=location_data.latitude,
-        longitude=location_data.longitude
+    """Report one fix; goes through the same movement filter and SOS tracking as /bulk"""
+    in_sos = sos_scheduler.is_tracking(current_user.id)
+    if in_sos:
+        sos_scheduler.touch(current_user.id)
+    accepted = ingest_location_fixes(current_user.id, [location_data], high_frequency=in_sos)
+    return {
+        "message": "Location updated successfully" if accepted else "Location unchanged",
+        "location": accepted[0] if accepted else None
+    }
+
+@router.post("/bulk", response_model=dict)
+def bulk_update_location(
+    fixes: Annotated[List[LocationUpdate], Body(max_length=1000)],
+    current_user: Annotated[User, Depends(get_current_user)]
+):
+    """Upload fixes the client recorded while offline, oldest first"""
+    in_sos = sos_scheduler.is_tracking(current_user.id)
+    if in_sos:
+        sos_scheduler.touch(current_user.id)
+    accepted = ingest_location_fixes(current_user.id, fixes, high_frequency=in_sos)
+    return {"message": "Locations updated successfully", "received": len(fixes), "accepted": len(accepted)}
+
+def _nearby_response(results):
+    return [
+        NearbyUserResponse(
+            user_id=user_id, distance_m=max(math.ceil(distance / NEARBY_DISTANCE_STEP), 1) * NEARBY_DISTANCE_STEP
+        )
+        for distance, user_id, _, _ in results
+    ]
+
+@router.get("/nearby", response_model=List[NearbyUserResponse])
+def fetch_nearby_users(
+    current_user: Annotated[User, Depends(require_admin_or_ngo)],
+    latitude: float = Query(..., ge=-90, le=90),
+    longitude: float = Query(..., ge=-180, le=180),
+    radius_m: float = Query(1000, gt=0, le=50000),
+    limit: int = Query(20, ge=1, le=500)
+):
+    """Admin/NGO: active users nearest to a point, within radius_m metres"""
+    results = geo_index.nearest(latitude, longitude, k=limit, max_distance=radius_m, exclude={current_user.id})
+    return _nearby_response(results)
+
+@router.get("/nearby/sos/{sos_id}", response_model=List[NearbyUserResponse])
+async def fetch_users_near_sos(
+    sos_id: int,
+    db: Annotated[AsyncSession, Depends(get_async_db)],
+    current_user: Annotated[User, Depends(get_current_user)],
+    radius_m: float = Query(1000, gt=0, le=50000),
+    limit: int = Query(20, ge=1, le=500)
+):
+    """Active users near an SOS event, excluding the person who raised it.
+
+    Open to the person who raised it, their emergency contacts and admins/NGOs.
+    """
+    sos_event = await db.get(SOSEvent, sos_id)
+    if sos_event is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="SOS event not found")
+    if (
+        sos_event.user_id != current_user.id
+        and current_user.role not in (UserRole.admin, UserRole.ngo)
+        and await db.scalar(emergency_contact_query(sos_event.user_id, current_user)) is None
+    ):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not allowed to view this SOS event")
+    # Prefer the user's latest fix over where the SOS was raised
+    location = await get_live_location(db=db, user_id=sos_event.user_id) or sos_event
+    results = geo_index.nearest(
+        location.latitude, location.longitude, k=limit, max_distance=radius_m, exclude={sos_event.user_id}
     )
-    return {"message": "Location updated successfully", "location": location}
+    return _nearby_response(results)
 
 @router.get("/{user_id}", response_model=LocationResponse)
-def fetch_location(
+async def fetch_location(
     user_id: int,
-    db: Annotated[Session, Depends(get_db)],
+    db: Annotated[AsyncSession, Depends(get_async_db)],
     current_user: Annotated[User, Depends(get_current_user)]
 ):
     # Assuming only the user themselves or contacts can fetch, but for now, allow any authenticated user
-    location = get_live_location(db=db, user_id=user_id)
+    location = await get_live_location(db=db, user_id=user_id)
     if location is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Location not found")
-    return location
\ No newline at end of file
+    return location
+
+@router.get("/{user_id}/history", response_model=List[LocationHistoryResponse])
+def fetch_location_history(
+    user_id: int,
+    db: Annotated[Session, Depends(get_db)],
+    current_user: Annotated[User, Depends(get_current_user)],
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    limit: int = Query(1000, ge=1, le=10000)
+):
+    """A user's own route, or that of someone who lists them as an emergency contact"""
+    if user_id != current_user.id and db.scalar(emergency_contact_query(user_id, current_user)) is None:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not allowed to view this location history")
+    return get_location_history(db=db, user_id=user_id, start=start, end=end, limit=limit)
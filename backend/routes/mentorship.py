@@ -2,7 +2,7 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from typing import List
 
-from app.database import SessionLocal
+from app.dependencies import get_db, get_read_db
 from routes.auth import get_current_user
 from schemas.mentorship import (
     MentorshipSessionBase,
@@ -18,18 +18,12 @@ from services.mentorship import (
     get_user_sessions
 )
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
 
 router = APIRouter(prefix="/mentorship", tags=["mentorship"])
 
 
 @router.post("/request", response_model=MentorshipSessionResponse)
-async def request_session(
+def request_session(
     topic_data: MentorshipSessionBase,
     current_user=Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -39,9 +33,9 @@ async def request_session(
 
 
 @router.get("/sessions", response_model=UserSessionsResponse)
-async def list_sessions(
+def list_sessions(
     current_user=Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Get user's mentorship sessions"""
     sessions = get_user_sessions(db, current_user.id)
@@ -53,7 +47,7 @@ async def list_sessions(
 
 
 @router.post("/{session_id}/user-reply")
-async def send_user_reply(
+def send_user_reply(
     session_id: int,
     message_data: MentorshipMessageCreate,
     current_user=Depends(get_current_user),
@@ -64,7 +58,7 @@ async def send_user_reply(
 
 
 @router.post("/{session_id}/mentor-reply")
-async def send_mentor_reply(
+def send_mentor_reply(
     session_id: int,
     message_data: MentorshipMessageCreate,
     current_user=Depends(get_current_user),  # Mentor user
@@ -75,7 +69,7 @@ async def send_mentor_reply(
 
 
 @router.post("/{session_id}/close")
-async def close_mentorship_session(
+def close_mentorship_session(
     session_id: int,
     current_user=Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -1,19 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Dict, List
 
-from app.database import SessionLocal
+from app.dependencies import get_async_db, get_async_read_db
 from routes.auth import get_current_user
 from models.user import User
 from schemas.reaction import ReactionCreate, ReactionResponse, ReactionSummary
-from services.reaction import add_or_update_reaction, remove_reaction, get_reaction_summary
-
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+from services.reaction import add_or_update_reaction, remove_reaction, get_reaction_summary, get_reaction_summaries
 
 router = APIRouter(prefix="/reactions", tags=["reactions"])
 
@@ -21,28 +14,36 @@ router = APIRouter(prefix="/reactions", tags=["reactions"])
 async def react_to_post(
     post_id: int,
     reaction_data: ReactionCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """Add or update reaction to awareness post"""
-    return add_or_update_reaction(db, current_user.id, post_id, reaction_data.emoji)
+    return await add_or_update_reaction(db, current_user.id, post_id, reaction_data.emoji)
 
 @router.delete("/awareness/{post_id}")
 async def remove_reaction_from_post(
     post_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """Remove user's reaction from awareness post"""
-    success = remove_reaction(db, current_user.id, post_id)
+    success = await remove_reaction(db, current_user.id, post_id)
     if not success:
         raise HTTPException(status_code=404, detail="Reaction not found")
     return {"message": "Reaction removed"}
 
-@router.get("/awareness/{post_id}/summary", response_model=List[ReactionSummary])
+@router.get("/awareness/summaries", response_model=Dict[int, ReactionSummary])
+async def get_posts_reactions_summaries(
+    post_ids: List[int] = Query(..., max_length=100),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """Get reaction summaries for several awareness posts at once"""
+    return await get_reaction_summaries(db, post_ids)
+
+@router.get("/awareness/{post_id}/summary", response_model=ReactionSummary)
 async def get_post_reactions_summary(
     post_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """Get reaction summary for awareness post"""
-    return get_reaction_summary(db, post_id)
\ No newline at end of file
+    return await get_reaction_summary(db, post_id)
\ No newline at end of file
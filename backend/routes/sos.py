@@ -1,38 +1,128 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Header, HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 # from core.get_db import get_db
 # from core.get_current_user import get_current_user
-from routes.auth import get_db, get_current_user   
+from routes.auth import get_current_user
+from app.dependencies import get_async_db
 from schemas.location import LocationUpdate, LocationResponse
-from services.location_services import upsert_live_location, get_live_location
-from services.sos_services import trigger_sos
-from services.notification_services import send_location_alerts
+from schemas.sos import SOSStatusUpdate
+from services.sos_services import set_sos_status, acknowledge_sos, sos_event_payload
+from services.sos_escalation import sos_scheduler
+from services.sos_guard import sos_guard, trigger_sos_once
+from services.notification_services import notification_dispatcher
+from models.sos import SOSEvent, SOSDelivery
 from models.user import User
-from typing import Annotated
+from typing import Annotated, Optional
 
 router = APIRouter(prefix="/api/sos", tags=["SOS"])
 
 
 @router.post("/trigger")
-def trigger_sos_alert(
-    db: Annotated[Session, Depends(get_db)],
-    current_user: Annotated[User, Depends(get_current_user)]
+async def trigger_sos_alert(
+    db: Annotated[AsyncSession, Depends(get_async_db)],
+    current_user: Annotated[User, Depends(get_current_user)],
+    idempotency_key: Annotated[Optional[str], Header(max_length=128)] = None
 ):
     try:
-        contacts, location = trigger_sos(db, current_user)
-        
-        for contact in contacts:
-            send_location_alerts( 
-                contact,
-                location,
-                f"Emergency Alert: {current_user.name} has triggered an SOS alert from location ({location.latitude}, {location.longitude}). Please reach out to them immediately."
-                f"Location Link: https://www.google.com/maps?q={location.latitude},{location.longitude}"
-            )
+        # Retries and repeated presses merge into the active event instead of raising a new one
+        trigger = await trigger_sos_once(db, current_user, idempotency_key)
+        sos_event, location = trigger.sos_event, trigger.location
+        if not trigger.created:
+            sos_scheduler.touch(current_user.id)
+            return{
+                "status": "success",
+                "sos_id": sos_event.id,
+                "message": f"SOS alert already active; location updated. {trigger.contact_count} contacts were notified.",
+                "location": f"{location.latitude}, {location.longitude}",
+                "delivery_status": sos_event.delivery_status,
+                "deduplicated": True
+            }
+
+        # Escalates if nobody acknowledges, and tracks the user at high frequency meanwhile
+        sos_scheduler.track(sos_event)
+
+        # Deliveries are recorded now and sent in the background; progress is on GET /api/sos/{sos_id}
+        await notification_dispatcher.enqueue_sos(
+            sos_event.id,
+            trigger.contacts,
+            f"Emergency Alert: {current_user.name} has triggered an SOS alert from location ({location.latitude}, {location.longitude}). Please reach out to them immediately."
+            f"Location Link: https://www.google.com/maps?q={location.latitude},{location.longitude}"
+        )
         return{
             "status": "success",
-            "message": f"SOS alert triggered and notifications sent to {len(contacts)} contacts.",
-            "location": f"{location.latitude}, {location.longitude}" 
+            "sos_id": sos_event.id,
+            "message": f"SOS alert triggered; notifying {trigger.contact_count} contacts.",
+            "location": f"{location.latitude}, {location.longitude}",
+            "delivery_status": sos_event.delivery_status,
+            "deduplicated": False
         }
     
     except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/{sos_id}")
+async def get_sos_status(
+    sos_id: int,
+    db: Annotated[AsyncSession, Depends(get_async_db)],
+    current_user: Annotated[User, Depends(get_current_user)]
+):
+    sos_event = await db.get(SOSEvent, sos_id)
+    if not sos_event or sos_event.user_id != current_user.id:
+        raise HTTPException(status_code=404, detail="SOS event not found")
+    deliveries = (await db.scalars(select(SOSDelivery).where(SOSDelivery.sos_id == sos_id))).all()
+    return {
+        "sos_id": sos_event.id,
+        "status": sos_event.status,
+        "delivery_status": sos_event.delivery_status,
+        "deliveries": [
+            {
+                "contact_id": d.contact_id,
+                "channel": d.channel,
+                "recipient": d.recipient,
+                "status": d.status,
+                "attempts": d.attempts,
+                "last_error": d.last_error
+            }
+            for d in deliveries
+        ]
+    }
+
+
+@router.post("/{sos_id}/status")
+async def update_sos_status(
+    sos_id: int,
+    update: SOSStatusUpdate,
+    db: Annotated[AsyncSession, Depends(get_async_db)],
+    current_user: Annotated[User, Depends(get_current_user)]
+):
+    sos_event = await set_sos_status(db, sos_id, update.status, current_user)
+    sos_scheduler.updated(sos_event)
+    if sos_event.status == "resolved":
+        await sos_guard.release(sos_event.user_id, str(sos_event.id))
+    return sos_event_payload(sos_event)
+
+
+@router.post("/{sos_id}/resolve")
+async def resolve_sos(
+    sos_id: int,
+    db: Annotated[AsyncSession, Depends(get_async_db)],
+    current_user: Annotated[User, Depends(get_current_user)]
+):
+    sos_event = await set_sos_status(db, sos_id, "resolved", current_user)
+    sos_scheduler.updated(sos_event)
+    await sos_guard.release(sos_event.user_id, str(sos_event.id))
+    return sos_event_payload(sos_event)
+
+
+@router.post("/{sos_id}/acknowledge")
+async def acknowledge_sos_alert(
+    sos_id: int,
+    db: Annotated[AsyncSession, Depends(get_async_db)],
+    current_user: Annotated[User, Depends(get_current_user)]
+):
+    """Emergency contacts (or an admin/NGO) confirm they are responding; stops escalation"""
+    sos_event = await acknowledge_sos(db, sos_id, current_user)
+    sos_scheduler.updated(sos_event)
+    return sos_event_payload(sos_event)
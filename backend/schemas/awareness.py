@@ -39,7 +39,16 @@ class AwarenessResponse(AwarenessBase):
 
 class AwarenessFeedResponse(BaseModel):
     posts: List[AwarenessResponse]
-    total: int
+    total: int  # cached for FEED_TOTAL_TTL seconds, so approximate
+    page: Optional[int] = None  # only for offset pagination
+    page_size: int
+    has_next: bool
+    next_cursor: Optional[str] = None  # pass as ?cursor= for the next page
+
+
+class AwarenessSearchResponse(BaseModel):
+    posts: List[AwarenessResponse]  # best match first
+    query: str
     page: int
     page_size: int
     has_next: bool
@@ -23,4 +23,17 @@ class LocationResponse(BaseModel):
     longitude: float = Field(..., description="Longitude of the location")
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class LocationHistoryResponse(BaseModel):
+    user_id: int = Field(..., description="ID of the user")
+    latitude: float = Field(..., description="Latitude of the location")
+    longitude: float = Field(..., description="Longitude of the location")
+    recorded_at: datetime = Field(..., description="Time the location was received")
+
+    class Config:
+        from_attributes = True
+
+class NearbyUserResponse(BaseModel):
+    user_id: int = Field(..., description="ID of the nearby user")
+    distance_m: float = Field(..., description="Distance from the query point in metres, rounded up to 100 m")
@@ -1,5 +1,6 @@
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from pydantic import BaseModel, Field, validator
+from datetime import datetime
 from enum import Enum
 
 
@@ -34,11 +35,14 @@ class ReactionCreate(BaseModel):
 
 
 class ReactionResponse(BaseModel):
-    id: int
+    id: Optional[int] = None  # None while the reaction is still buffered
     user_id: int
     awareness_id: int
     emoji: AllowedEmoji
-    created_at: str
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
 
 
 class ReactionSummary(BaseModel):
@@ -47,7 +51,5 @@ class ReactionSummary(BaseModel):
     user_has_reacted: bool = False
     users_reacted: int
 
-
-ReactionResponse.model_config = {"from_attributes": True}
-ReactionSummary.model_config = {"from_attributes": True}
-ReactionCreate.model_config = {"use_enum_values": True}
\ No newline at end of file
+    class Config:
+        from_attributes = True
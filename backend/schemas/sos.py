@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional,Annotated
+from typing import Optional,Annotated,Literal
 from fastapi import Depends
 from sqlalchemy.orm import Session
 from models.user import User
@@ -13,4 +13,8 @@ class SOSResponse(BaseModel):
     longitude: float = Field(..., description="Longitude of the SOS location")
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+
+class SOSStatusUpdate(BaseModel):
+    status: Literal["responding", "resolved"] = Field(..., description="New status of the SOS event")
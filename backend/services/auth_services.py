@@ -0,0 +1,139 @@
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import HTTPException, status
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional, Set, Tuple
+from jose import JWTError, jwt
+import threading
+import time
+from models.user import User, UserRole
+
+SECRET_KEY = "your_secret_key"
+ALGORITHM = "HS256"
+
+# Verified-token cache limits
+TOKEN_CACHE_SIZE = 10000  # tokens kept, least recently used evicted first
+TOKEN_CACHE_TTL = 60      # seconds a verified token is trusted without re-reading the user
+
+
+@dataclass(frozen=True)
+class Principal:
+    """The authenticated user as seen by route handlers, detached from any session"""
+    id: int
+    name: str
+    email: str
+    role: UserRole
+
+    @property
+    def username(self) -> str:
+        return self.name
+
+    @classmethod
+    def from_user(cls, user: User) -> "Principal":
+        return cls(id=user.id, name=user.name, email=user.email, role=user.role)
+
+
+class TokenCache:
+    """LRU cache of verified tokens to principals.
+
+    An entry lives for at most TOKEN_CACHE_TTL seconds and never past the
+    token's own expiry. Entries of a user are dropped as soon as the user row
+    is updated or deleted through the ORM (see the listeners below); other
+    workers pick the change up once their entry times out.
+    """
+
+    def __init__(self, maxsize: int = TOKEN_CACHE_SIZE, ttl: float = TOKEN_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries: "OrderedDict[str, Tuple[Principal, float]]" = OrderedDict()  # token to (principal, expires)
+        self.tokens: Dict[int, Set[str]] = {}  # user_id to its cached tokens
+        self.lock = threading.Lock()  # used from the sync route threadpool as well
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, token: str) -> Optional[Principal]:
+        with self.lock:
+            entry = self.entries.get(token)
+            if entry is None:
+                return None
+            principal, expires = entry
+            if expires <= time.time():
+                self._discard(token, principal.id)
+                return None
+            self.entries.move_to_end(token)
+            return principal
+
+    def put(self, token: str, principal: Principal, token_expires: Optional[float] = None):
+        expires = time.time() + self.ttl
+        if token_expires is not None:
+            expires = min(expires, token_expires)
+        with self.lock:
+            self.entries[token] = (principal, expires)
+            self.entries.move_to_end(token)
+            self.tokens.setdefault(principal.id, set()).add(token)
+            while len(self.entries) > self.maxsize:
+                old_token, (old_principal, _) = self.entries.popitem(last=False)
+                self._discard(old_token, old_principal.id, popped=True)
+
+    def invalidate_user(self, user_id: int):
+        with self.lock:
+            for token in self.tokens.pop(user_id, ()):
+                self.entries.pop(token, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.tokens.clear()
+
+    def _discard(self, token: str, user_id: int, popped: bool = False):
+        if not popped:
+            self.entries.pop(token, None)
+        tokens = self.tokens.get(user_id)
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self.tokens[user_id]
+
+
+token_cache = TokenCache()
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_cached_tokens(mapper, connection, target):
+    # Role, name or email may have changed, or the user is gone
+    token_cache.invalidate_user(target.id)
+
+
+async def authenticate_token(token: str, db: AsyncSession) -> Principal:
+    """Verify a bearer token and return its user, from the cache when possible.
+
+    Raises a 401 HTTPException if the token is invalid, expired or belongs to
+    a user that no longer exists.
+    """
+    principal = token_cache.get(token)
+    if principal is not None:
+        return principal
+
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        username: str = payload.get("sub")
+        user_id: int = payload.get("user_id")
+        if username is None or user_id is None:
+            raise credentials_exception
+    except JWTError:
+        raise credentials_exception
+    user = await db.get(User, user_id)
+    if user is None:
+        raise credentials_exception
+
+    principal = Principal.from_user(user)
+    token_cache.put(token, principal, payload.get("exp"))
+    return principal
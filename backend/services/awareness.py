@@ -1,21 +1,50 @@
-from typing import List, Optional
-from sqlalchemy.orm import Session
-from sqlalchemy import desc, func
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.engine import Engine
+from sqlalchemy import select, desc, func, tuple_, type_coerce, String
 from fastapi import HTTPException, status
+from datetime import datetime
+import base64
+import json
+import time
 
-from models.awareness import Awareness, AwarenessCategory
+from models.awareness import Awareness, AwarenessCategory, AwarenessSource
 from schemas.awareness import (
     AwarenessCreate, 
     AwarenessResponse, 
     AwarenessFeedResponse,
-    AwarenessFeedFilter
+    AwarenessFeedFilter,
+    AwarenessSearchResponse
 )
 from utils.content_filter import is_content_safe
-from services.reaction import get_reaction_summary
+from schemas.reaction import ReactionSummary
+from services.reaction import get_reaction_summaries
+from services.feed_cache import feed_cache
+from services.awareness_search import index_awareness_post, search_index_for
+from utils.text_search import tokenize
+from app.database import AsyncReadSessionLocal
 
+FEED_TOTAL_TTL = 60  # seconds a feed total is reused before it is counted again
 
-def create_awareness_post(
-    db: Session, 
+_feed_totals: Dict[Optional[str], Tuple[int, float]] = {}  # category to (total, expires)
+
+
+def _post_response(post: Awareness, reactions: ReactionSummary) -> AwarenessResponse:
+    # Built field by field: validating the ORM object would touch the lazy
+    # reactions relationship, which cannot load in async code
+    return AwarenessResponse(
+        id=post.id,
+        title=post.title,
+        content=post.content,
+        category=post.category.value,
+        source=post.source.value,
+        created_at=post.created_at,
+        reactions=reactions
+    )
+
+
+async def create_awareness_post(
+    db: AsyncSession,
     awareness_data: AwarenessCreate
 ) -> AwarenessResponse:
     """Create verified awareness post (Admin/NGO only)"""
@@ -32,65 +61,211 @@ def create_awareness_post(
     post = Awareness(
         title=awareness_data.title.strip(),
         content=awareness_data.content.strip(),
-        category=awareness_data.category,
-        source=awareness_data.source,
+        category=AwarenessCategory(awareness_data.category.value),
+        source=AwarenessSource(awareness_data.source.value),
         is_verified=True
     )
     
     db.add(post)
-    db.commit()
-    db.refresh(post)
+    await db.flush()
+    await index_awareness_post(db, post)
+    await db.commit()
+    await db.refresh(post)
+    # Every page of the feed shifts by one
+    feed_cache.invalidate_all()
+    _feed_totals.clear()
     
-    return AwarenessResponse.model_validate(post)
+    return _post_response(post, ReactionSummary(total_reactions=0, emoji_counts={}, users_reacted=0))
+
+
+def _created_key(db: AsyncSession):
+    """created_at as the driver returns it.
+
+    SQLite keeps it as text, without a fraction when set by the server
+    default, so cursors carry and compare that text rather than a datetime
+    that would be re-rendered with microseconds and never match.
+    """
+    if db.get_bind().dialect.name == "sqlite":
+        return type_coerce(Awareness.created_at, String)
+    return Awareness.created_at
+
+
+def encode_feed_cursor(created_key, post_id: int) -> str:
+    if isinstance(created_key, datetime):
+        created_key = created_key.isoformat()
+    raw = json.dumps([created_key, post_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_feed_cursor(cursor: str) -> Tuple[str, int]:
+    """(created_at as text, id) of the post a cursor points after; 400 if it is malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_key, post_id = json.loads(raw)
+        datetime.fromisoformat(created_key)
+        return created_key, int(post_id)
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid feed cursor"
+        )
+
+
+def _feed_query(category: Optional[AwarenessCategory], *columns):
+    query = select(*columns).where(Awareness.is_verified.is_(True))
+    if category:
+        query = query.where(Awareness.category == category)
+    return query
+
+
+async def _feed_total(db: AsyncSession, category: Optional[AwarenessCategory]) -> int:
+    """Verified posts in the category, counted at most once per FEED_TOTAL_TTL"""
+    key = category.value if category else None
+    cached = _feed_totals.get(key)
+    if cached is not None and cached[1] > time.monotonic():
+        return cached[0]
+    total = await db.scalar(_feed_query(category, func.count()))
+    _feed_totals[key] = (total, time.monotonic() + FEED_TOTAL_TTL)
+    return total
 
 
-def get_awareness_feed(
-    db: Session,
+async def get_awareness_feed_page(
+    db: AsyncSession,
     category: Optional[AwarenessCategory] = None,
-    page: int = 1,
+    cursor: Optional[str] = None,
     page_size: int = 10
 ) -> AwarenessFeedResponse:
-    """Public paginated feed"""
-    
-    query = db.query(Awareness).filter(Awareness.is_verified.is_(True))
-    
-    if category:
-        query = query.filter(Awareness.category == category)
-    
-    # Count total
-    total = query.count()
-    
-    # Paginated results
-    posts = query.order_by(desc(Awareness.created_at)) \
-                .offset((page - 1) * page_size) \
-                .limit(page_size).all()
-    
-    response_posts = []
-    for post in posts:
-        reactions = get_reaction_summary(db, post.id, None)
-        post_response = AwarenessResponse.model_validate(post)
-        post_response.reactions = reactions
-        response_posts.append(post_response)
-    
+    """Public feed, newest first, one keyset page after cursor.
+
+    Seeks ix_awareness_feed / ix_awareness_category_feed to (created_at, id)
+    of the last post of the previous page, so every page costs the same.
+    """
+    created_key = _created_key(db)
+    query = _feed_query(category, Awareness, created_key.label("created_key"))
+    if cursor:
+        after_created, after_id = decode_feed_cursor(cursor)
+        if db.get_bind().dialect.name != "sqlite":
+            after_created = datetime.fromisoformat(after_created)
+        query = query.where(tuple_(created_key, Awareness.id) < tuple_(after_created, after_id))
+
+    # One extra row tells whether there is a next page
+    rows = (await db.execute(
+        query.order_by(desc(Awareness.created_at), desc(Awareness.id)).limit(page_size + 1)
+    )).all()
+    has_next = len(rows) > page_size
+    rows = rows[:page_size]
+    posts = [post for post, _ in rows]
+
+    summaries = await get_reaction_summaries(db, [post.id for post in posts], None)
     return AwarenessFeedResponse(
-        posts=response_posts,
-        total=total,
+        posts=[_post_response(post, summaries[post.id]) for post in posts],
+        total=await _feed_total(db, category),
+        page_size=page_size,
+        has_next=has_next,
+        next_cursor=encode_feed_cursor(rows[-1][1], rows[-1][0].id) if has_next and rows else None
+    )
+
+
+async def get_awareness_feed(
+    db: AsyncSession,
+    category: Optional[AwarenessCategory] = None,
+    page: int = 1,
+    page_size: int = 10
+) -> AwarenessFeedResponse:
+    """Public paginated feed (offset pages, kept for older clients)"""
+
+    cursor = None
+    if page > 1:
+        # Last post of the previous page, skipped over on the index without loading rows
+        created_key = _created_key(db)
+        boundary = (await db.execute(
+            _feed_query(category, created_key.label("created_key"), Awareness.id)
+            .order_by(desc(Awareness.created_at), desc(Awareness.id))
+            .offset((page - 1) * page_size - 1)
+            .limit(1)
+        )).first()
+        if boundary is None:
+            return AwarenessFeedResponse(
+                posts=[], total=await _feed_total(db, category), page=page, page_size=page_size, has_next=False
+            )
+        cursor = encode_feed_cursor(*boundary)
+
+    feed = await get_awareness_feed_page(db, category, cursor, page_size)
+    feed.page = page
+    return feed
+
+
+async def get_cached_awareness_feed(
+    category: Optional[AwarenessCategory] = None,
+    page: int = 1,
+    page_size: int = 10,
+    cursor: Optional[str] = None
+) -> AwarenessFeedResponse:
+    """Feed page (by cursor if given, else by page) served from the feed cache; rebuilds use their own read session"""
+
+    if cursor:
+        decode_feed_cursor(cursor)  # reject bad cursors before they reach the cache
+
+    async def build():
+        async with AsyncReadSessionLocal() as db:
+            if cursor:
+                return await get_awareness_feed_page(db, category, cursor, page_size)
+            return await get_awareness_feed(db, category, page, page_size)
+
+    key = (category.value if category else None, cursor or page, page_size)
+    return await feed_cache.get(key, build, lambda feed: [post.id for post in feed.posts])
+
+
+async def search_awareness(
+    db: AsyncSession,
+    q: str,
+    category: Optional[AwarenessCategory] = None,
+    page: int = 1,
+    page_size: int = 10
+) -> AwarenessSearchResponse:
+    """Public ranked full-text search over titles and content, Hindi or English.
+
+    Ranks the newest SEARCH_WINDOW matches; pages past them come back empty.
+    """
+
+    index = search_index_for(db.get_bind())
+    if index is None:
+        raise HTTPException(
+            status_code=status.HTTP_501_NOT_IMPLEMENTED,
+            detail="Search is not available on this database"
+        )
+
+    posts = []
+    terms = tokenize(q)
+    if terms:
+        prefix = q.rstrip().endswith("*")  # "counsel*" also finds counselling
+        floor = await db.scalar(index.window_floor(terms, category, prefix)) or 0
+        posts = (await db.scalars(
+            index.query(terms, category, floor, limit=page_size + 1, offset=(page - 1) * page_size, prefix=prefix)
+        )).all()
+    has_next = len(posts) > page_size
+    posts = posts[:page_size]
+
+    summaries = await get_reaction_summaries(db, [post.id for post in posts], None)
+    return AwarenessSearchResponse(
+        posts=[_post_response(post, summaries[post.id]) for post in posts],
+        query=q,
         page=page,
         page_size=page_size,
-        has_next=(len(posts) == page_size)
+        has_next=has_next
     )
 
 
-def get_awareness_by_id(
-    db: Session, 
+async def get_awareness_by_id(
+    db: AsyncSession,
     post_id: int
 ) -> AwarenessResponse:
     """Get single verified post"""
     
-    post = db.query(Awareness) \
-            .filter(Awareness.id == post_id, 
-                   Awareness.is_verified.is_(True)) \
-            .first()
+    post = await db.scalar(
+        select(Awareness).where(Awareness.id == post_id,
+                                Awareness.is_verified.is_(True))
+    )
     
     if not post:
         raise HTTPException(
@@ -98,7 +273,11 @@ def get_awareness_by_id(
             detail="Post not found"
         )
     
-    reactions = get_reaction_summary(db, post.id, None)
-    response = AwarenessResponse.model_validate(post)
-    response.reactions = reactions
-    return response
+    summaries = await get_reaction_summaries(db, [post.id], None)
+    return _post_response(post, summaries[post.id])
+
+
+def ensure_awareness_indexes(engine: Engine):
+    """Create awareness indexes added after the table was first created"""
+    for index in Awareness.__table__.indexes:
+        index.create(engine, checkfirst=True)
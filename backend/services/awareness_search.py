@@ -0,0 +1,217 @@
+from sqlalchemy import bindparam, cast, column, desc, func, literal, literal_column, select, table, text
+from sqlalchemy.dialects.postgresql import ARRAY, TSQUERY, TSVECTOR
+from sqlalchemy.engine import Engine
+from sqlalchemy import String, Text
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional
+import logging
+from models.awareness import Awareness, AwarenessCategory
+from utils.text_search import tokenize
+
+logger = logging.getLogger(__name__)
+
+BACKFILL_BATCH = 5000   # posts tokenized and indexed per statement when building the index
+TITLE_WEIGHT = 4.0      # a match in the title ranks like this many matches in the content
+SEARCH_WINDOW = 5000    # newest matches of a query that are ranked
+
+
+class SearchIndex(ABC):
+    """Full-text index over verified awareness posts, kept in a side table.
+
+    Text is tokenized in Python (utils.text_search), so Hindi and English get
+    the same normalization everywhere and the database only stores and ranks
+    the resulting terms. All terms of a query must match; with prefix the last
+    one also matches longer terms (slower: their doclists are merged).
+
+    Only the newest SEARCH_WINDOW matches are ranked: window_floor() finds
+    the oldest post id among them by walking the index without scoring, and
+    query() ranks from there. A term found in most posts is then scored for
+    SEARCH_WINDOW of them rather than for all of them.
+    """
+
+    search = None
+    key = None  # column of the indexed post ids
+    insert_stmt = None
+
+    @abstractmethod
+    def create(self, conn):
+        raise NotImplementedError
+
+    @abstractmethod
+    def window_floor(self, terms: List[str], category: Optional[AwarenessCategory] = None, prefix: bool = False):
+        """Select of the oldest post id within the newest SEARCH_WINDOW matches (no row if fewer)"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def query(self, terms: List[str], category: Optional[AwarenessCategory], floor: int, limit: int, offset: int = 0, prefix: bool = False):
+        """Select of matching posts from id floor on, best first"""
+        raise NotImplementedError
+
+    @staticmethod
+    @abstractmethod
+    def document(post_id: int, title: str, content: str, category) -> Dict:
+        raise NotImplementedError
+
+
+class SQLiteSearchIndex(SearchIndex):
+    """FTS5 table keyed by post id, ranked by bm25.
+
+    The ascii tokenizer splits on ASCII separators only and keeps every other
+    character, so the pre-tokenized Devanagari terms are stored as they are
+    (unicode61 would split words at their vowel signs). The category is
+    indexed as a third column, so filtering by it happens before ranking.
+    """
+
+    search = table("awareness_search", column("rowid"))
+    key = search.c.rowid
+    insert_stmt = text(
+        "INSERT INTO awareness_search (rowid, title, content, category) VALUES (:id, :title, :content, :category)"
+    )
+
+    def create(self, conn):
+        conn.execute(text(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS awareness_search "
+            "USING fts5(title, content, category, tokenize='ascii')"
+        ))
+
+    @staticmethod
+    def _match(terms, category, prefix):
+        match = "{title content} : (" + " ".join(f'"{term}"' for term in terms) + ("*)" if prefix else ")")
+        if category:
+            match += f" AND category : {category.value}"
+        return text("awareness_search MATCH :match").bindparams(match=match)
+
+    def window_floor(self, terms, category=None, prefix=False):
+        return (
+            select(self.key).where(self._match(terms, category, prefix))
+            .order_by(self.key.desc()).offset(SEARCH_WINDOW - 1).limit(1)
+        )
+
+    def query(self, terms, category, floor, limit, offset=0, prefix=False):
+        rank = func.bm25(literal_column("awareness_search"), TITLE_WEIGHT, 1.0, 0.0).label("rank")
+        # Ranked and cut inside the FTS table; only the page's posts are loaded
+        matches = (
+            select(self.key.label("post_id"), rank)
+            .where(self._match(terms, category, prefix), self.key >= floor)
+            .order_by(rank).limit(limit).offset(offset)
+        ).subquery()
+        return (
+            select(Awareness)
+            .join(matches, matches.c.post_id == Awareness.id)
+            .where(Awareness.is_verified.is_(True))
+            .order_by(matches.c.rank, desc(Awareness.id))
+        )
+
+    @staticmethod
+    def document(post_id, title, content, category):
+        return {
+            "id": post_id,
+            "title": " ".join(tokenize(title)),
+            "content": " ".join(tokenize(content)),
+            "category": getattr(category, "value", category),
+        }
+
+
+class PostgresSearchIndex(SearchIndex):
+    """tsvector table with a GIN index, ranked by ts_rank.
+
+    Terms go in through array_to_tsvector and queries are cast straight to
+    tsquery, so no text search configuration re-parses them.
+    """
+
+    search = table("awareness_search", column("post_id"), column("document", TSVECTOR))
+    key = search.c.post_id
+    insert_stmt = text(
+        "INSERT INTO awareness_search (post_id, document) VALUES (:id, "
+        "setweight(array_to_tsvector(:title), 'A') || setweight(array_to_tsvector(:content), 'B'))"
+    ).bindparams(bindparam("title", type_=ARRAY(Text)), bindparam("content", type_=ARRAY(Text)))
+
+    def create(self, conn):
+        conn.execute(text(
+            "CREATE TABLE IF NOT EXISTS awareness_search ("
+            "post_id INTEGER PRIMARY KEY REFERENCES awareness_posts (id), document tsvector NOT NULL)"
+        ))
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_awareness_search_document ON awareness_search USING GIN (document)"
+        ))
+
+    @staticmethod
+    def _tsquery(terms, prefix):
+        quoted = ["'" + term.replace("'", "''") + "'" for term in terms]
+        return cast(literal(" & ".join(quoted) + (":*" if prefix else ""), String), TSQUERY)
+
+    def _matches(self, columns, terms, category, prefix):
+        query = (
+            select(*columns)
+            .join(self.search, self.key == Awareness.id)
+            .where(self.search.c.document.op("@@")(self._tsquery(terms, prefix)), Awareness.is_verified.is_(True))
+        )
+        if category:
+            query = query.where(Awareness.category == category)
+        return query
+
+    def window_floor(self, terms, category=None, prefix=False):
+        return (
+            self._matches([self.key], terms, category, prefix)
+            .order_by(self.key.desc()).offset(SEARCH_WINDOW - 1).limit(1)
+        )
+
+    def query(self, terms, category, floor, limit, offset=0, prefix=False):
+        # Weights {D, C, B, A}: title terms count TITLE_WEIGHT times content terms
+        weights = literal_column(f"'{{0, 0, 0.25, {0.25 * TITLE_WEIGHT}}}'::float4[]")
+        rank = func.ts_rank(weights, self.search.c.document, self._tsquery(terms, prefix))
+        return (
+            self._matches([Awareness], terms, category, prefix)
+            .where(self.key >= floor)
+            .order_by(desc(rank), desc(Awareness.id)).limit(limit).offset(offset)
+        )
+
+    @staticmethod
+    def document(post_id, title, content, category=None):
+        return {
+            "id": post_id,
+            "title": list(dict.fromkeys(tokenize(title))),
+            "content": list(dict.fromkeys(tokenize(content))),
+        }
+
+
+SEARCH_INDEXES = {"sqlite": SQLiteSearchIndex(), "postgresql": PostgresSearchIndex()}
+
+
+def search_index_for(bind) -> Optional[SearchIndex]:
+    """Search index of the bind's dialect, or None if it has no full-text support here"""
+    return SEARCH_INDEXES.get(bind.dialect.name)
+
+
+async def index_awareness_post(db, post: Awareness):
+    """Add a new verified post to the search index in the caller's transaction (post must be flushed)"""
+    index = search_index_for(db.get_bind())
+    if index is not None:
+        await db.execute(index.insert_stmt, index.document(post.id, post.title, post.content, post.category))
+
+
+def ensure_awareness_search(engine: Engine) -> int:
+    """Create the search table and index every post not in it yet. Returns the posts indexed."""
+    index = search_index_for(engine)
+    if index is None:
+        logger.warning(f"Awareness search is not available on {engine.dialect.name}")
+        return 0
+    indexed = 0
+    with engine.begin() as conn:
+        index.create(conn)
+        done = set(conn.scalars(select(index.key)))
+        last_id = 0
+        while rows := conn.execute(
+            select(Awareness.id, Awareness.title, Awareness.content, Awareness.category)
+            .where(Awareness.id > last_id, Awareness.is_verified.is_(True))
+            .order_by(Awareness.id)
+            .limit(BACKFILL_BATCH)
+        ).all():
+            last_id = rows[-1][0]
+            documents = [index.document(*row) for row in rows if row[0] not in done]
+            if documents:
+                conn.execute(index.insert_stmt, documents)
+                indexed += len(documents)
+    if indexed:
+        logger.info(f"Indexed {indexed} awareness posts for search")
+    return indexed
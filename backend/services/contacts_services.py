@@ -1,3 +1,4 @@
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from models.contact import Contact
 from schemas.contact import ContactCreate
@@ -17,4 +18,8 @@ def create_contact(db: Session, contact: ContactCreate, user_id: int) -> Contact
     return db_contact
 
 def get_contacts_by_user(db: Session, user_id: int) -> list[Contact]:
-    return db.query(Contact).filter(Contact.user_id == user_id).all()
\ No newline at end of file
+    return db.query(Contact).filter(Contact.user_id == user_id).all()
+
+def emergency_contact_query(user_id: int, viewer):
+    """Select of viewer's entry among user_id's emergency contacts; no row if they are not one"""
+    return select(Contact.id).where(Contact.user_id == user_id, Contact.email == viewer.email)
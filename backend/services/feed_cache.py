@@ -0,0 +1,122 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, Optional, Set
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Awareness feed page cache
+FEED_CACHE_TTL = 30      # seconds a page is served without rebuilding
+FEED_STALE_TTL = 300     # seconds a page past its TTL may still be served while it is rebuilt
+FEED_CACHE_SIZE = 512    # pages kept, least recently used evicted first
+
+
+@dataclass
+class _Page:
+    value: Any
+    post_ids: Set[int]
+    fresh_until: float
+    expires_at: float
+
+
+class FeedCache:
+    """Precomputed feed pages keyed by (category, page, page_size).
+
+    A fresh page is returned as is. A page past FEED_CACHE_TTL but within
+    FEED_STALE_TTL is returned immediately while one background task rebuilds
+    it. On a miss every concurrent caller awaits the same rebuild, so a burst
+    of traffic after an expiry or invalidation costs one set of queries.
+
+    invalidate_all() (a post was added, shifting every page) drops all pages;
+    invalidate_posts() (reactions changed) only marks the pages showing those
+    posts stale. A rebuild that started before an invalidation is not stored
+    as fresh. Invalidation is per process; other workers catch up within
+    FEED_CACHE_TTL.
+    """
+
+    def __init__(self, ttl: float = FEED_CACHE_TTL, stale_ttl: float = FEED_STALE_TTL, maxsize: int = FEED_CACHE_SIZE):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.maxsize = maxsize
+        self.pages: "OrderedDict[Hashable, _Page]" = OrderedDict()
+        self.pages_by_post: Dict[int, Set[Hashable]] = {}  # post_id to keys of pages showing it
+        self.inflight: Dict[Hashable, asyncio.Task] = {}  # key to its running rebuild
+        self.epoch = 0    # bumped by invalidate_all
+        self.version = 0  # bumped by every invalidation
+
+    def __len__(self):
+        return len(self.pages)
+
+    async def get(self, key: Hashable, build: Callable[[], Awaitable[Any]], post_ids: Callable[[Any], Iterable[int]]):
+        """Cached page for key; build() computes it, post_ids(page) lists the posts on it"""
+        now = time.monotonic()
+        page = self.pages.get(key)
+        if page is not None and now < page.expires_at:
+            self.pages.move_to_end(key)
+            if now >= page.fresh_until:
+                self._rebuild(key, build, post_ids)  # stale-while-revalidate
+            return page.value
+        # Shielded so a caller that disconnects does not cancel the rebuild for the others
+        return await asyncio.shield(self._rebuild(key, build, post_ids))
+
+    def _rebuild(self, key, build, post_ids) -> asyncio.Task:
+        task = self.inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._run(key, build, post_ids))
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())  # logged in _run
+            self.inflight[key] = task
+        return task
+
+    async def _run(self, key, build, post_ids):
+        epoch, version = self.epoch, self.version
+        try:
+            value = await build()
+        except Exception as e:
+            logger.error(f"Feed page {key} rebuild failed: {e}")
+            raise
+        finally:
+            if self.inflight.get(key) is asyncio.current_task():
+                del self.inflight[key]
+        if epoch == self.epoch:
+            now = time.monotonic()
+            # Invalidated while building: keep it, but only as a stale page
+            fresh_until = now + self.ttl if version == self.version else now
+            self._store(key, _Page(value, set(post_ids(value)), fresh_until, now + self.ttl + self.stale_ttl))
+        return value
+
+    def _store(self, key, page: _Page):
+        self._drop(key)
+        self.pages[key] = page
+        for post_id in page.post_ids:
+            self.pages_by_post.setdefault(post_id, set()).add(key)
+        while len(self.pages) > self.maxsize:
+            self._drop(next(iter(self.pages)))
+
+    def _drop(self, key):
+        page = self.pages.pop(key, None)
+        if page is None:
+            return
+        for post_id in page.post_ids:
+            keys = self.pages_by_post.get(post_id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.pages_by_post[post_id]
+
+    def invalidate_all(self):
+        self.epoch += 1
+        self.version += 1
+        self.pages.clear()
+        self.pages_by_post.clear()
+        self.inflight.clear()  # let the next miss start a rebuild that sees the change
+
+    def invalidate_posts(self, post_ids: Iterable[int]):
+        self.version += 1
+        for post_id in post_ids:
+            for key in self.pages_by_post.get(post_id, ()):
+                self.pages[key].fresh_until = 0
+
+
+feed_cache = FeedCache()
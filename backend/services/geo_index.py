@@ -0,0 +1,150 @@
+from sqlalchemy.orm import Session
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set, Tuple
+import math
+import threading
+import time
+from models.location import LiveLocation
+from utils.geo import haversine_distance
+
+CELL_SIZE = 0.005            # grid cell edge in degrees (~550 m of latitude)
+ACTIVE_WINDOW = 15 * 60      # seconds a location counts as active
+MAX_SEARCH_DISTANCE = 50000  # metres, upper bound for nearest-neighbour searches
+EVICT_INTERVAL = 60          # seconds between sweeps for stale users
+METRES_PER_DEGREE = 111320
+
+
+class GeoIndex:
+    """Uniform lat/lon grid over the latest location of every tracked user.
+
+    Each user sits in exactly one cell. Radius and k-nearest queries only look
+    at the cells around the query point, so their cost depends on how many
+    users are nearby, not on how many are tracked.
+    """
+
+    def __init__(self, cell_size: float = CELL_SIZE, active_window: float = ACTIVE_WINDOW):
+        self.cell_size = cell_size
+        self.active_window = active_window
+        self.positions: Dict[int, Tuple[float, float, float, Tuple[int, int]]] = {}  # user_id to (lat, lon, updated, cell)
+        self.cells: Dict[Tuple[int, int], Set[int]] = {}  # cell to user_ids in it
+        self.lock = threading.Lock()  # updated from the sync route threadpool as well
+        self.last_evicted = time.time()
+
+    def _cell(self, latitude: float, longitude: float) -> Tuple[int, int]:
+        return (math.floor(latitude / self.cell_size), math.floor(longitude / self.cell_size))
+
+    def update(self, user_id: int, latitude: float, longitude: float, updated: Optional[float] = None):
+        cell = self._cell(latitude, longitude)
+        now = time.time()
+        with self.lock:
+            previous = self.positions.get(user_id)
+            if previous is not None and previous[3] != cell:
+                self._remove_from_cell(user_id, previous[3])
+            self.positions[user_id] = (latitude, longitude, updated or now, cell)
+            self.cells.setdefault(cell, set()).add(user_id)
+        if now - self.last_evicted > EVICT_INTERVAL:
+            self.last_evicted = now
+            self.evict_stale(now)
+
+    def remove(self, user_id: int):
+        with self.lock:
+            previous = self.positions.pop(user_id, None)
+            if previous is not None:
+                self._remove_from_cell(user_id, previous[3])
+
+    def _remove_from_cell(self, user_id: int, cell: Tuple[int, int]):
+        members = self.cells.get(cell)
+        if members is not None:
+            members.discard(user_id)
+            if not members:
+                del self.cells[cell]
+
+    def evict_stale(self, now: Optional[float] = None) -> int:
+        """Drop users whose location is older than the active window"""
+        cutoff = (now or time.time()) - self.active_window
+        with self.lock:
+            stale = [uid for uid, (_, _, updated, _) in self.positions.items() if updated < cutoff]
+        for user_id in stale:
+            self.remove(user_id)
+        return len(stale)
+
+    def _cell_metres(self, latitude: float) -> float:
+        # Shortest edge of a cell at this latitude
+        return self.cell_size * METRES_PER_DEGREE * max(math.cos(math.radians(latitude)), 0.01)
+
+    def _ring(self, center: Tuple[int, int], ring: int):
+        ci, cj = center
+        if ring == 0:
+            yield center
+            return
+        for j in range(cj - ring, cj + ring + 1):
+            yield (ci - ring, j)
+            yield (ci + ring, j)
+        for i in range(ci - ring + 1, ci + ring):
+            yield (i, cj - ring)
+            yield (i, cj + ring)
+
+    def _scan(self, cells, latitude, longitude, max_distance, cutoff, exclude, out):
+        for cell in cells:
+            members = self.cells.get(cell)
+            if not members:
+                continue
+            for user_id in members:
+                if user_id in exclude:
+                    continue
+                lat, lon, updated, _ = self.positions[user_id]
+                if updated < cutoff:
+                    continue
+                distance = haversine_distance(latitude, longitude, lat, lon) * 1000
+                if distance <= max_distance:
+                    out.append((distance, user_id, lat, lon))
+
+    def within(
+        self,
+        latitude: float,
+        longitude: float,
+        radius: float,
+        exclude: Optional[Set[int]] = None
+    ) -> List[Tuple[float, int, float, float]]:
+        """Active users within radius metres, nearest first, as (distance_m, user_id, lat, lon)"""
+        return self.nearest(latitude, longitude, k=None, max_distance=radius, exclude=exclude)
+
+    def nearest(
+        self,
+        latitude: float,
+        longitude: float,
+        k: Optional[int] = 10,
+        max_distance: float = MAX_SEARCH_DISTANCE,
+        exclude: Optional[Set[int]] = None
+    ) -> List[Tuple[float, int, float, float]]:
+        """Up to k active users nearest to the point (all within max_distance if k is None)"""
+        exclude = exclude or set()
+        cutoff = time.time() - self.active_window
+        center = self._cell(latitude, longitude)
+        cell_metres = self._cell_metres(latitude)
+        max_ring = math.ceil(max_distance / cell_metres)
+
+        found: List[Tuple[float, int, float, float]] = []
+        with self.lock:
+            for ring in range(max_ring + 1):
+                self._scan(self._ring(center, ring), latitude, longitude, max_distance, cutoff, exclude, found)
+                if k is not None and len(found) >= k:
+                    # Everything outside the rings scanned so far is at least this far away
+                    covered = ring * cell_metres
+                    found.sort()
+                    if found[k - 1][0] <= covered:
+                        break
+        found.sort()
+        return found[:k] if k is not None else found
+
+    def load(self, db: Session):
+        """Seed the index from live_locations (e.g. on startup)"""
+        for location in db.query(LiveLocation).all():
+            updated = None
+            if location.update_at is not None:
+                # update_at is stored as naive IST
+                updated = (location.update_at - timedelta(hours=5, minutes=30) - datetime(1970, 1, 1)).total_seconds()
+            self.update(location.user_id, location.latitude, location.longitude, updated)
+
+
+geo_index = GeoIndex()
@@ -0,0 +1,133 @@
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+import threading
+import time
+import numpy as np
+
+CACHE_TTL = 6 * 3600      # seconds without an update before a user is evicted
+EVICT_INTERVAL = 60       # seconds between sweeps for stale users
+INITIAL_CAPACITY = 1024   # slots allocated up front; doubled when full
+
+
+class LocationCache:
+    """Last accepted location of every tracked user, stored in parallel arrays.
+
+    Each user owns one slot in float64 arrays for latitude, longitude, fix
+    time and last update, so a user costs a few dozen bytes plus the slot map
+    entry instead of a dict or tuple of boxed floats and datetimes. Freed
+    slots are reused. Users not updated for CACHE_TTL seconds are evicted.
+
+    Every update is stamped with a cache-wide increasing version, so clients
+    can ask for only the users that changed after a version they have seen.
+    """
+
+    def __init__(self, ttl: float = CACHE_TTL, capacity: int = INITIAL_CAPACITY):
+        self.ttl = ttl
+        self.slots: Dict[int, int] = {}  # user_id to slot
+        self.free: List[int] = []
+        self.size = 0  # slots handed out so far, used or freed
+        self.user_ids = np.full(capacity, -1, dtype=np.int64)  # -1 marks a free slot
+        self.latitudes = np.zeros(capacity, dtype=np.float64)
+        self.longitudes = np.zeros(capacity, dtype=np.float64)
+        self.times = np.zeros(capacity, dtype=np.float64)    # epoch seconds of the fix
+        self.touched = np.zeros(capacity, dtype=np.float64)  # epoch seconds of the last update
+        self.versions = np.zeros(capacity, dtype=np.int64)   # cache version of the last update
+        self.version = 0
+        self.lock = threading.Lock()  # written from the sync route threadpool as well
+        self.last_evicted = time.time()
+
+    def __len__(self):
+        return len(self.slots)
+
+    def __contains__(self, user_id: int):
+        return user_id in self.slots
+
+    def _grow(self):
+        capacity = len(self.user_ids) * 2
+        self.user_ids = np.concatenate((self.user_ids, np.full(capacity - len(self.user_ids), -1, dtype=np.int64)))
+        for name in ("latitudes", "longitudes", "times", "touched", "versions"):
+            array = getattr(self, name)
+            setattr(self, name, np.concatenate((array, np.zeros(capacity - len(array), dtype=array.dtype))))
+
+    def set(self, user_id: int, latitude: float, longitude: float, fix_time: Optional[float] = None) -> int:
+        """Store a user's location and return the version it was stamped with"""
+        now = time.time()
+        with self.lock:
+            slot = self.slots.get(user_id)
+            if slot is None:
+                if self.free:
+                    slot = self.free.pop()
+                else:
+                    if self.size == len(self.user_ids):
+                        self._grow()
+                    slot = self.size
+                    self.size += 1
+                self.slots[user_id] = slot
+                self.user_ids[slot] = user_id
+            self.latitudes[slot] = latitude
+            self.longitudes[slot] = longitude
+            self.times[slot] = fix_time if fix_time is not None else now
+            self.touched[slot] = now
+            self.version += 1
+            self.versions[slot] = version = self.version
+        if now - self.last_evicted > EVICT_INTERVAL:
+            self.last_evicted = now
+            self.evict_stale(now)
+        return version
+
+    def get_version(self, user_id: int) -> int:
+        """Version of a user's last update, or 0 if unknown"""
+        with self.lock:
+            slot = self.slots.get(user_id)
+            return int(self.versions[slot]) if slot is not None else 0
+
+    def get(self, user_id: int) -> Optional[Tuple[float, float, float]]:
+        """(latitude, longitude, fix time) of a user, or None"""
+        with self.lock:
+            slot = self.slots.get(user_id)
+            if slot is None:
+                return None
+            return float(self.latitudes[slot]), float(self.longitudes[slot]), float(self.times[slot])
+
+    def remove(self, user_id: int):
+        with self.lock:
+            slot = self.slots.pop(user_id, None)
+            if slot is not None:
+                self.user_ids[slot] = -1
+                self.free.append(slot)
+
+    def evict_stale(self, now: Optional[float] = None) -> int:
+        """Free the slots of users not updated within the TTL"""
+        cutoff = (now or time.time()) - self.ttl
+        with self.lock:
+            used = self.user_ids[:self.size]
+            stale = np.flatnonzero((used >= 0) & (self.touched[:self.size] < cutoff))
+            for slot in stale.tolist():
+                del self.slots[int(self.user_ids[slot])]
+                self.user_ids[slot] = -1
+                self.free.append(slot)
+        return len(stale)
+
+    def snapshot(self, user_ids: Optional[Iterable[int]] = None, since: int = 0) -> Tuple[int, Dict[int, dict]]:
+        """Current version plus location dicts (latitude, longitude, timestamp, version)
+        of the given users, or all users, updated after version since"""
+        with self.lock:
+            if user_ids is None:
+                slots = np.flatnonzero(self.user_ids[:self.size] >= 0)
+            else:
+                slots = np.array([self.slots[uid] for uid in user_ids if uid in self.slots], dtype=np.int64)
+            if since:
+                slots = slots[self.versions[slots] > since]
+            ids = self.user_ids[slots].tolist()
+            lats = self.latitudes[slots].tolist()
+            lons = self.longitudes[slots].tolist()
+            times = self.times[slots].tolist()
+            versions = self.versions[slots].tolist()
+            version = self.version
+        return version, {
+            uid: {"latitude": lat, "longitude": lon, "timestamp": datetime.utcfromtimestamp(t).isoformat(), "version": v}
+            for uid, lat, lon, t, v in zip(ids, lats, lons, times, versions)
+        }
+
+
+location_cache = LocationCache()
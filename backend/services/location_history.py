@@ -0,0 +1,149 @@
+from sqlalchemy import select, insert, delete, tuple_
+from sqlalchemy.orm import Session
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional, Tuple
+import asyncio
+import logging
+from models.location_history import LocationHistory
+from app.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+EPOCH = datetime(1970, 1, 1)
+
+# Retention and compaction of old history
+RETENTION_DAYS = 30            # whole day buckets older than this are deleted
+COMPACT_AFTER_DAYS = 2         # points older than this are thinned out
+COMPACT_MIN_INTERVAL = 60      # seconds between kept points after compaction
+MAINTENANCE_INTERVAL = 3600    # seconds between maintenance runs
+COMPACT_CHUNK = 10000          # rows read per compaction step
+
+
+def history_bucket(recorded_at: datetime) -> int:
+    """Day partition a point belongs to"""
+    return (recorded_at - EPOCH).days
+
+
+def append_location_history(db: Session, points: Iterable[Tuple[int, float, float, datetime]]):
+    """Bulk append (user_id, latitude, longitude, recorded_at) points. Caller commits."""
+    rows = [
+        {
+            "user_id": user_id,
+            "latitude": latitude,
+            "longitude": longitude,
+            "recorded_at": recorded_at,
+            "bucket": history_bucket(recorded_at),
+        }
+        for user_id, latitude, longitude, recorded_at in points
+    ]
+    if rows:
+        db.execute(insert(LocationHistory.__table__), rows)
+    return len(rows)
+
+
+def get_location_history(
+    db: Session,
+    user_id: int,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    limit: int = 1000
+) -> List[LocationHistory]:
+    """Points of a user in [start, end), oldest first"""
+    query = select(LocationHistory).where(LocationHistory.user_id == user_id)
+    if start:
+        query = query.where(LocationHistory.recorded_at >= start)
+    if end:
+        query = query.where(LocationHistory.recorded_at < end)
+    query = query.order_by(LocationHistory.recorded_at).limit(limit)
+    return list(db.scalars(query))
+
+
+def purge_location_history(db: Session, before: datetime) -> int:
+    """Drop every day bucket that ends before the given time"""
+    result = db.execute(delete(LocationHistory).where(LocationHistory.bucket < history_bucket(before)))
+    db.commit()
+    return result.rowcount
+
+
+def compact_location_history(
+    db: Session,
+    start: datetime,
+    end: datetime,
+    min_interval: int = COMPACT_MIN_INTERVAL
+) -> int:
+    """Thin points in [start, end) to at most one per user every min_interval seconds"""
+    removed = 0
+    last_kept = {}  # user_id to recorded_at of the last kept point
+    cursor = (0, start, 0)
+    while True:
+        user_id, recorded_at, row_id = cursor
+        rows = db.execute(
+            select(LocationHistory.id, LocationHistory.user_id, LocationHistory.recorded_at)
+            .where(
+                LocationHistory.recorded_at >= start,
+                LocationHistory.recorded_at < end,
+                tuple_(LocationHistory.user_id, LocationHistory.recorded_at, LocationHistory.id) > tuple_(user_id, recorded_at, row_id)
+            )
+            .order_by(LocationHistory.user_id, LocationHistory.recorded_at, LocationHistory.id)
+            .limit(COMPACT_CHUNK)
+        ).all()
+        if not rows:
+            break
+
+        drop = []
+        for row_id, user_id, recorded_at in rows:
+            previous = last_kept.get(user_id)
+            if previous is not None and (recorded_at - previous).total_seconds() < min_interval:
+                drop.append(row_id)
+            else:
+                last_kept[user_id] = recorded_at
+        if drop:
+            db.execute(delete(LocationHistory).where(LocationHistory.id.in_(drop)))
+            db.commit()
+            removed += len(drop)
+        cursor = (rows[-1][1], rows[-1][2], rows[-1][0])
+    return removed
+
+
+class LocationHistoryMaintenance:
+    """Periodically applies retention and compaction to location_history"""
+
+    def __init__(self, interval: float = MAINTENANCE_INTERVAL, session_factory=SessionLocal):
+        self.interval = interval
+        self.session_factory = session_factory
+        self.task: Optional[asyncio.Task] = None
+
+    def run_once(self, now: Optional[datetime] = None):
+        now = now or datetime.utcnow() + timedelta(hours=5, minutes=30)
+        db = self.session_factory()
+        try:
+            purged = purge_location_history(db, now - timedelta(days=RETENTION_DAYS))
+            # Only the day that just aged past COMPACT_AFTER_DAYS needs thinning; older days were done already
+            compact_end = now - timedelta(days=COMPACT_AFTER_DAYS)
+            compacted = compact_location_history(db, compact_end - timedelta(days=1), compact_end)
+            logger.info(f"Location history maintenance: purged {purged}, compacted {compacted}")
+        finally:
+            db.close()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.to_thread(self.run_once)
+            except Exception as e:
+                logger.error(f"Location history maintenance failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+
+history_maintenance = LocationHistoryMaintenance()
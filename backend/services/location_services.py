@@ -1,31 +1,257 @@
-from sqlalchemy import Column, Float, ForeignKey, Integer
-from sqlalchemy.orm import relationship, Session
-from datetime import datetime, timedelta
+from sqlalchemy import select, insert, update, delete, func, inspect
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Sequence, Tuple
+import asyncio
+import logging
+import math
+import threading
+import time
 from models.location import LiveLocation
+from services.location_history import append_location_history
+from services.geo_index import geo_index
+from services.location_cache import location_cache
+from schemas.location import LocationUpdate
+from utils.geo import filter_moves
 from app.database import SessionLocal
 
+logger = logging.getLogger(__name__)
 
-def upsert_live_location(db: Session, user_id: int, latitude: float, longitude: float):
-    location = db.query(LiveLocation).filter(LiveLocation.user_id == user_id).first()
-    if location:
-        location.latitude = latitude
-        location.longitude = longitude
-        location.update_at = datetime.utcnow() + timedelta(hours=5, minutes=30)
-    else:
-        location = LiveLocation(
-            user_id=user_id,
-            latitude=latitude,
-            longitude=longitude,
-            update_at=datetime.utcnow() + timedelta(hours=5, minutes=30)
-        )
-        db.add(location)
-    db.commit()
-    db.refresh(location)
-    return location
-
-def get_live_location(db: Session, user_id: int):  
-    return db.query(LiveLocation).filter(LiveLocation.user_id == user_id).first()
+# Write-behind limits for buffered location pings
+FLUSH_INTERVAL = 1.0  # seconds a ping may wait before it is written
+FLUSH_SIZE = 500      # users with pending pings that trigger an early flush
+
+
+def _upsert_insert(db: Session):
+    """Dialect insert() supporting ON CONFLICT, or None if the backend has no native UPSERT"""
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        return sqlite.insert
+    if dialect == "postgresql":
+        return postgresql.insert
+    return None
+
+
+def _live_location_upsert(dialect_insert):
+    stmt = dialect_insert(LiveLocation.__table__)
+    return stmt.on_conflict_do_update(
+        index_elements=["user_id"],
+        set_={
+            "latitude": stmt.excluded.latitude,
+            "longitude": stmt.excluded.longitude,
+            "update_at": stmt.excluded.update_at,
+        }
+    )
+
+
+async def get_live_location(db: AsyncSession, user_id: int):
+    pending = location_buffer.get(user_id)
+    if pending is not None:
+        return pending
+    return await db.scalar(select(LiveLocation).where(LiveLocation.user_id == user_id))
+
+def fix_time(timestamp: Optional[str]) -> Optional[float]:
+    """Epoch seconds of a client timestamp, or None without one; naive timestamps are taken as UTC"""
+    if not timestamp:
+        return None
+    parsed = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def receive_times(client_times: Sequence[Optional[float]], now: float) -> List[float]:
+    """Server-clock times of a batch of fixes, for throttling.
+
+    Client clocks can be off by minutes, so fixes are compared with earlier
+    ones on the time the server received them. Within a batch the client's
+    spacing is kept, counting its newest stamped fix as received now; fixes
+    without a timestamp are received now.
+    """
+    stamped = [t for t in client_times if t is not None]
+    newest = max(stamped, default=now)
+    return [now if t is None else now - (newest - t) for t in client_times]
+
+
+def ingest_location_fixes(user_id: int, fixes: Sequence[LocationUpdate], high_frequency: bool = False) -> List[dict]:
+    """Drop fixes that barely moved, queue the rest for storage and return them.
+
+    Each fix is compared with the last accepted one, earlier in the batch or
+    from a previous call, so a slow walk keeps a fix every few metres.
+    Throttling runs on server receive time (see receive_times); the client's
+    timestamp is only kept to order the location history.
+    With high_frequency (user in an active SOS) every fix is kept.
+    Returned dicts carry latitude, longitude, timestamp, speed_mps and bearing.
+    """
+    if not fixes:
+        return []
+    now = time.time()
+    lats = [f.latitude for f in fixes]
+    lons = [f.longitude for f in fixes]
+    client_times = [fix_time(f.timestamp) for f in fixes]
+    times = receive_times(client_times, now)
+
+    keep, bearings, speeds = filter_moves(location_cache.get(user_id), lats, lons, times)
+    if high_frequency:
+        keep = [True] * len(keep)
+
+    accepted = []
+    for i, kept in enumerate(keep):
+        if not kept:
+            continue
+        taken = client_times[i] if client_times[i] is not None else now
+        recorded_at = datetime.utcfromtimestamp(taken) + timedelta(hours=5, minutes=30)
+        location_buffer.add(user_id, lats[i], lons[i], recorded_at)
+        location_cache.set(user_id, lats[i], lons[i], times[i])
+        accepted.append({
+            "latitude": lats[i],
+            "longitude": lons[i],
+            "timestamp": fixes[i].timestamp or datetime.utcfromtimestamp(now).isoformat(),
+            "speed_mps": None if math.isnan(speeds[i]) else round(speeds[i], 2),
+            "bearing": None if math.isnan(bearings[i]) else round(bearings[i], 1),
+        })
+    return accepted
+
+
+def ensure_live_location_user_index(engine: Engine):
+    """Collapse duplicate rows per user and add the unique user_id index on databases created before it existed"""
+    table = LiveLocation.__table__
+    existing = inspect(engine).get_indexes(table.name)
+    if any(i["unique"] and i["column_names"] == ["user_id"] for i in existing):
+        return
+    index = next(i for i in table.indexes if i.unique and list(i.columns) == [table.c.user_id])
+    with engine.begin() as conn:
+        latest = select(func.max(table.c.id)).group_by(table.c.user_id)
+        conn.execute(delete(table).where(table.c.id.not_in(latest)))
+        index.create(conn, checkfirst=True)
 
 async def save_live_location(user_id: int, data: dict):
     print(f"[TRACKING] User {user_id}: {data}")
-    # Here you can implement saving to the database if needed
\ No newline at end of file
+    # Here you can implement saving to the database if needed
+
+
+class LocationWriteBuffer:
+    """Coalesces location pings per user and writes them to live_locations in bulk.
+
+    add() only touches memory, so callers (ingest_location_fixes, for the
+    location websocket and the REST endpoints) never wait on the database. A background task flushes the
+    latest ping of every user at most FLUSH_INTERVAL seconds later, or earlier
+    once FLUSH_SIZE users are pending. Every ping is also appended to the
+    location history in the same transaction. stop() flushes whatever is left.
+    """
+
+    def __init__(self, interval: float = FLUSH_INTERVAL, max_pending: int = FLUSH_SIZE, session_factory=SessionLocal):
+        self.interval = interval
+        self.max_pending = max_pending
+        self.session_factory = session_factory
+        self.pending: Dict[int, Tuple[float, float, datetime]] = {}  # user_id to (lat, lon, update_at)
+        self.inflight: Dict[int, Tuple[float, float, datetime]] = {}  # batch being written, still readable
+        self.history: List[Tuple[int, float, float, datetime]] = []  # every ping since the last flush
+        self.lock = threading.Lock()  # add() is also called from the sync route threadpool
+        self.flush_lock = threading.Lock()  # keeps batches written in the order they were taken
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.wakeup: Optional[asyncio.Event] = None
+        self.task: Optional[asyncio.Task] = None
+
+    def add(self, user_id: int, latitude: float, longitude: float, recorded_at: Optional[datetime] = None) -> LiveLocation:
+        update_at = datetime.utcnow() + timedelta(hours=5, minutes=30)
+        with self.lock:
+            self.pending[user_id] = (latitude, longitude, update_at)
+            self.history.append((user_id, latitude, longitude, recorded_at or update_at))
+            full = len(self.pending) >= self.max_pending
+        if full and self.loop is not None:
+            self.loop.call_soon_threadsafe(self.wakeup.set)
+        geo_index.update(user_id, latitude, longitude)
+        return LiveLocation(user_id=user_id, latitude=latitude, longitude=longitude, update_at=update_at)
+
+    def get(self, user_id: int) -> Optional[LiveLocation]:
+        """Latest not-yet-written location of a user, if any"""
+        with self.lock:
+            entry = self.pending.get(user_id) or self.inflight.get(user_id)
+        if entry is None:
+            return None
+        latitude, longitude, update_at = entry
+        return LiveLocation(user_id=user_id, latitude=latitude, longitude=longitude, update_at=update_at)
+
+    def flush(self) -> int:
+        """Write all pending pings in one transaction. Returns the number of users written."""
+        with self.flush_lock:
+            with self.lock:
+                batch, self.pending = self.pending, {}
+                history, self.history = self.history, []
+                self.inflight = batch
+            try:
+                if batch:
+                    self._write(batch, history)
+            finally:
+                with self.lock:
+                    self.inflight = {}
+        return len(batch)
+
+    def _write(self, batch: Dict[int, Tuple[float, float, datetime]], history: List[Tuple[int, float, float, datetime]]):
+        db = self.session_factory()
+        try:
+            rows = [
+                {"user_id": user_id, "latitude": latitude, "longitude": longitude, "update_at": update_at}
+                for user_id, (latitude, longitude, update_at) in batch.items()
+            ]
+            dialect_insert = _upsert_insert(db)
+            if dialect_insert is not None:
+                # One executemany UPSERT for the whole batch
+                db.execute(_live_location_upsert(dialect_insert), rows)
+            else:
+                existing = dict(db.execute(
+                    select(LiveLocation.user_id, LiveLocation.id).where(LiveLocation.user_id.in_(batch.keys()))
+                ).all())
+                updates = [{"id": existing[row["user_id"]], **row} for row in rows if row["user_id"] in existing]
+                inserts = [row for row in rows if row["user_id"] not in existing]
+                if updates:
+                    db.execute(update(LiveLocation), updates)
+                if inserts:
+                    db.execute(insert(LiveLocation), inserts)
+            append_location_history(db, history)
+            db.commit()
+        except Exception:
+            db.rollback()
+            # Put the batch back unless a newer ping arrived meanwhile
+            with self.lock:
+                for user_id, entry in batch.items():
+                    self.pending.setdefault(user_id, entry)
+                self.history[:0] = history
+            raise
+        finally:
+            db.close()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self.wakeup.clear()
+            try:
+                await asyncio.to_thread(self.flush)
+            except Exception as e:
+                logger.error(f"Failed to flush live locations: {e}")
+
+    def start(self):
+        self.loop = asyncio.get_running_loop()
+        self.wakeup = asyncio.Event()
+        self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        self.loop = None
+        await asyncio.to_thread(self.flush)
+
+
+location_buffer = LocationWriteBuffer()
@@ -1,2 +1,316 @@
-def send_location_alerts(recipient, location, message):
-    print(f"Sending alert to {recipient.name} ({recipient.email}): {message}")
\ No newline at end of file
+from sqlalchemy import select, update, func
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from functools import partial
+from typing import Dict, List, Optional, Sequence
+import asyncio
+import logging
+import random
+from models.sos import SOSEvent, SOSDelivery
+from models.contact import Contact
+from app.database import AsyncSessionLocal
+from services.sos_services import publish_sos_event, SOS_STATUS_CHANGED
+
+logger = logging.getLogger(__name__)
+
+# Delivery limits (per-channel concurrency is set on each Channel)
+MAX_ATTEMPTS = 5           # tries per delivery before it is marked failed
+RETRY_BASE_DELAY = 1.0     # seconds; doubled per attempt, with full jitter
+RETRY_MAX_DELAY = 60.0     # seconds, upper bound for a single backoff
+STALE_SENDING = 300        # seconds a delivery may stay claimed before start() hands it out again
+
+
+class Channel(ABC):
+    """A way of reaching a contact. Subclasses set name/concurrency and implement send()."""
+    name = "channel"
+    concurrency = 10  # sends of this channel running at once
+
+    def address(self, contact: Contact) -> Optional[str]:
+        """Where this contact is reached on this channel, or None to skip it"""
+        return None
+
+    @abstractmethod
+    async def send(self, recipient: str, message: str):
+        """Deliver one message; raise to have it retried"""
+        raise NotImplementedError
+
+
+class SMSChannel(Channel):
+    name = "sms"
+    concurrency = 10
+
+    def address(self, contact):
+        return contact.phone_number
+
+    async def send(self, recipient, message):
+        # No SMS provider is configured yet
+        logger.info(f"[SMS] {recipient}: {message}")
+
+
+class EmailChannel(Channel):
+    name = "email"
+    concurrency = 20
+
+    def address(self, contact):
+        return contact.email
+
+    async def send(self, recipient, message):
+        # No mail server is configured yet
+        logger.info(f"[EMAIL] {recipient}: {message}")
+
+
+class PushChannel(Channel):
+    """Mobile push. There is no device registry yet, so no contact has an address."""
+    name = "push"
+    concurrency = 50
+
+    async def send(self, recipient, message):
+        logger.info(f"[PUSH] {recipient}: {message}")
+
+
+class WebSocketChannel(Channel):
+    """Pushes the alert to the contact's open dashboard sockets (group contact:{id}).
+
+    With no socket open the send fails and is retried like any other, so the
+    delivery is not reported as sent. Alerts are replayable events: a
+    dashboard reconnecting with ?sos_since gets the ones it missed.
+    """
+    name = "websocket"
+    concurrency = 100
+
+    def __init__(self, connections=None):
+        self.connections = connections  # ConnectionManager, websocket.manager.manager if None
+
+    def address(self, contact):
+        return f"contact:{contact.id}"
+
+    async def send(self, recipient, message):
+        connections = self.connections
+        if connections is None:
+            from websocket.manager import manager as connections
+        if not await connections.group_size(recipient):
+            raise RuntimeError(f"No dashboard open for {recipient}")
+        await connections.publish_event({"type": "sos_alert", "message": message}, [recipient])
+
+
+class FakeChannel(Channel):
+    """In-memory channel for tests and local runs: records sends, can be slow or flaky"""
+
+    def __init__(self, name: str, concurrency: int = 10, latency: float = 0.0, failures: int = 0, address_field: str = "email"):
+        self.name = name
+        self.concurrency = concurrency
+        self.latency = latency
+        self.failures = failures  # sends that fail before the first success
+        self.address_field = address_field
+        self.sent: List[tuple] = []
+
+    def address(self, contact):
+        return getattr(contact, self.address_field, None)
+
+    async def send(self, recipient, message):
+        await asyncio.sleep(self.latency)
+        if self.failures > 0:
+            self.failures -= 1
+            raise RuntimeError(f"{self.name} backend unavailable")
+        self.sent.append((recipient, message))
+
+
+def default_channels() -> List[Channel]:
+    return [SMSChannel(), EmailChannel(), PushChannel(), WebSocketChannel()]
+
+
+def backoff_delay(attempt: int) -> float:
+    """Full-jitter exponential backoff before retry number attempt (1-based)"""
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** (attempt - 1)))
+
+
+@dataclass
+class _Delivery:
+    id: int
+    sos_id: int
+    channel: str
+    recipient: str
+    message: str
+    attempts: int = 0
+
+
+class NotificationDispatcher:
+    """Sends SOS alerts to contacts in the background.
+
+    enqueue_sos() records one SOSDelivery row per contact and channel in a
+    single insert and queues them, so the SOS request does not wait for any
+    send and an alert survives a restart once enqueue_sos() has returned.
+    Each channel has its own queue drained by channel.concurrency workers, so
+    a slow SMS gateway neither exceeds its limit nor holds up email or
+    websocket alerts. Failed sends are retried with jittered exponential
+    backoff up to MAX_ATTEMPTS times. Each outcome is written to its
+    SOSDelivery row and summed up in SOSEvent.delivery_status.
+
+    Every send first claims its row (queued to sending) with a conditional
+    update, so several workers resuming the same queued rows in start() send
+    each of them once. Rows left claimed by a worker that died are handed out
+    again after STALE_SENDING seconds.
+    """
+
+    def __init__(self, channels: Optional[Sequence[Channel]] = None, session_factory=AsyncSessionLocal):
+        self.channels: Dict[str, Channel] = {c.name: c for c in (channels or default_channels())}
+        self.session_factory = session_factory
+        self.queues: Dict[str, asyncio.Queue] = {}  # channel name to its deliveries
+        self.tasks: List[asyncio.Task] = []
+        self.retries: set = set()  # pending retry timers
+        self.sending: set = set()  # ids of deliveries claimed by this process
+        self.status_lock = asyncio.Lock()
+
+    async def enqueue_sos(self, sos_id: int, contacts: Sequence[Contact], message: str):
+        """Record the deliveries of an SOS alert and queue them for sending"""
+        rows = []
+        for contact in contacts:
+            for channel in self.channels.values():
+                recipient = channel.address(contact)
+                if recipient:
+                    rows.append(SOSDelivery(
+                        sos_id=sos_id, contact_id=contact.id, channel=channel.name,
+                        recipient=recipient, message=message
+                    ))
+        if not rows:
+            await self._update_event_status(sos_id)
+            return
+        async with self.session_factory() as db:
+            db.add_all(rows)
+            await db.commit()
+        if self.queues:  # otherwise start() picks them up
+            for row in rows:
+                self._enqueue(_Delivery(row.id, row.sos_id, row.channel, row.recipient, row.message))
+
+    def _enqueue(self, job: _Delivery):
+        queue = self.queues.get(job.channel)
+        if queue is None:
+            logger.error(f"Dropping SOS delivery {job.id}: unknown channel {job.channel}")
+            return
+        queue.put_nowait(job)
+
+    async def _claim(self, job: _Delivery) -> bool:
+        async with self.session_factory() as db:
+            result = await db.execute(
+                update(SOSDelivery).where(SOSDelivery.id == job.id, SOSDelivery.status == "queued")
+                .values(status="sending", updated_at=datetime.utcnow())
+            )
+            await db.commit()
+        return result.rowcount == 1
+
+    async def _deliver(self, channel: Channel, job: _Delivery):
+        if not await self._claim(job):
+            return  # sent or being sent by another worker
+        self.sending.add(job.id)
+        job.attempts += 1
+        try:
+            await channel.send(job.recipient, job.message)
+        except Exception as e:
+            self.sending.discard(job.id)
+            if job.attempts >= MAX_ATTEMPTS:
+                await self._record(job, "failed", str(e))
+                return
+            await self._record(job, "queued", str(e))
+            self._retry_later(job, backoff_delay(job.attempts))
+            return
+        self.sending.discard(job.id)
+        await self._record(job, "sent", None)
+
+    def _retry_later(self, job: _Delivery, delay: float):
+        async def retry():
+            await asyncio.sleep(delay)
+            self._enqueue(job)
+        task = asyncio.create_task(retry())
+        self.retries.add(task)
+        task.add_done_callback(self.retries.discard)
+
+    async def _record(self, job: _Delivery, status: str, error: Optional[str]):
+        async with self.session_factory() as db:
+            await db.execute(
+                update(SOSDelivery).where(SOSDelivery.id == job.id)
+                .values(status=status, attempts=job.attempts, last_error=error)
+            )
+            await db.commit()
+        if status != "queued":
+            await self._update_event_status(job.sos_id)
+
+    async def _update_event_status(self, sos_id: int):
+        # Serialized, so a summary read before a later outcome cannot be written after it
+        async with self.status_lock:
+            async with self.session_factory() as db:
+                # Locks the event row, so workers sharing a database take turns too
+                sos_event = await db.scalar(select(SOSEvent).where(SOSEvent.id == sos_id).with_for_update())
+                if sos_event is None:
+                    return
+                counts = dict((await db.execute(
+                    select(SOSDelivery.status, func.count()).where(SOSDelivery.sos_id == sos_id).group_by(SOSDelivery.status)
+                )).all())
+                if counts.get("queued") or counts.get("sending"):
+                    status = "pending"
+                elif not counts.get("failed"):
+                    status = "delivered"
+                elif counts.get("sent"):
+                    status = "partial"
+                else:
+                    status = "failed"
+                if sos_event.delivery_status == status:
+                    return
+                sos_event.delivery_status = status
+                await db.commit()
+        await publish_sos_event(SOS_STATUS_CHANGED, sos_event)
+
+    async def _worker(self, queue: asyncio.Queue, handle):
+        while True:
+            job = await queue.get()
+            try:
+                await handle(job)
+            except Exception as e:
+                logger.error(f"Failed to dispatch SOS notification: {e}")
+            finally:
+                queue.task_done()
+
+    async def _resume(self):
+        stale = datetime.utcnow() - timedelta(seconds=STALE_SENDING)
+        async with self.session_factory() as db:
+            await db.execute(
+                update(SOSDelivery).where(SOSDelivery.status == "sending", SOSDelivery.updated_at < stale)
+                .values(status="queued")
+            )
+            await db.commit()
+            pending = (await db.scalars(select(SOSDelivery).where(SOSDelivery.status == "queued"))).all()
+        for row in pending:
+            self._enqueue(_Delivery(row.id, row.sos_id, row.channel, row.recipient, row.message, row.attempts))
+
+    async def start(self):
+        for channel in self.channels.values():
+            queue = self.queues[channel.name] = asyncio.Queue()
+            handle = partial(self._deliver, channel)
+            self.tasks += [asyncio.create_task(self._worker(queue, handle)) for _ in range(channel.concurrency)]
+        await self._resume()
+
+    async def join(self):
+        """Wait until every queued delivery has been sent or given up on (for tests)"""
+        while True:
+            for queue in self.queues.values():
+                await queue.join()
+            if not self.retries:
+                return
+            await asyncio.gather(*self.retries, return_exceptions=True)
+
+    async def stop(self):
+        for task in [*self.tasks, *self.retries]:
+            task.cancel()
+        await asyncio.gather(*self.tasks, *self.retries, return_exceptions=True)
+        self.tasks, self.queues = [], {}
+        if self.sending:
+            # Sends cut off mid-flight go back to the queue for the next start()
+            async with self.session_factory() as db:
+                await db.execute(
+                    update(SOSDelivery).where(SOSDelivery.id.in_(self.sending), SOSDelivery.status == "sending")
+                    .values(status="queued")
+                )
+                await db.commit()
+            self.sending.clear()
+
+notification_dispatcher = NotificationDispatcher()
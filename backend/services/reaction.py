@@ -1,8 +1,16 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import event, select, func, update, delete, insert
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import Session
-from sqlalchemy import func
 from fastapi import HTTPException, status
-from typing import List, Dict, Optional
-from models.reaction import Reaction
+from typing import Iterable, List, Dict, Optional, Set, Tuple
+from collections import OrderedDict, defaultdict
+from datetime import datetime, timezone
+import asyncio
+import logging
+import threading
+import time
+from models.reaction import Reaction, ReactionCount
 from models.awareness import Awareness
 from schemas.reaction import (
     ReactionCreate,
@@ -11,99 +19,494 @@ from schemas.reaction import (
     AllowedEmoji
 )
 from utils.validator import validate_awareness_exists, validate_allowed_emoji
+from services.feed_cache import feed_cache
+from services.location_services import _upsert_insert
+from app.database import SessionLocal
 
+logger = logging.getLogger(__name__)
 
-def add_or_update_reaction(
-    db: Session,
+# Write-behind limits for buffered reactions
+REACTION_FLUSH_INTERVAL = 0.25  # seconds a reaction may wait before it is written
+REACTION_FLUSH_SIZE = 2000      # pending (user, post) reactions that trigger an early flush
+READ_RETRIES = 5                # summary reads retried while a flush commits underneath them
+VALIDATED_POST_TTL = 60         # seconds a post checked as existing and verified is trusted without a query
+VALIDATED_POST_SIZE = 10000     # such posts remembered, least recently checked dropped first
+
+RECONCILE_INTERVAL = 6 * 3600  # seconds between full recounts of awareness_reaction_counts
+
+_MISSING = object()
+
+
+def _count_upsert(dialect_insert):
+    stmt = dialect_insert(ReactionCount.__table__)
+    return stmt.on_conflict_do_update(
+        index_elements=["awareness_id", "emoji"],
+        set_={"count": ReactionCount.count + stmt.excluded.count}
+    )
+
+
+def _stored_reactions_for_update(db: Session, keys: Iterable[Tuple[int, int]]) -> Dict[Tuple[int, int], Tuple[int, str]]:
+    """(id, emoji) of the stored reaction of each (user_id, awareness_id), locked until commit.
+
+    Counter deltas are taken from these rows, so another worker cannot change
+    one of them between this read and the write that replaces it. (SQLite has
+    no row locks, but only one transaction writes at a time.)
+    """
+    keys = list(keys)
+    rows = db.execute(
+        select(Reaction.id, Reaction.user_id, Reaction.awareness_id, Reaction.emoji).where(
+            Reaction.awareness_id.in_({awareness_id for _, awareness_id in keys}),
+            Reaction.user_id.in_({user_id for user_id, _ in keys})
+        ).with_for_update()
+    )
+    return {(user_id, awareness_id): (reaction_id, emoji) for reaction_id, user_id, awareness_id, emoji in rows}
+
+
+def _apply_count_deltas(db: Session, deltas: Dict[Tuple[int, str], int]):
+    """Add each (awareness_id, emoji) delta to its counter"""
+    rows = [
+        {"awareness_id": awareness_id, "emoji": emoji, "count": delta}
+        for (awareness_id, emoji), delta in deltas.items() if delta
+    ]
+    if not rows:
+        return
+    dialect_insert = _upsert_insert(db)
+    if dialect_insert is not None:
+        db.execute(_count_upsert(dialect_insert), rows)
+        return
+    for row in rows:
+        result = db.execute(
+            update(ReactionCount)
+            .where(ReactionCount.awareness_id == row["awareness_id"], ReactionCount.emoji == row["emoji"])
+            .values(count=ReactionCount.count + row["count"])
+        )
+        if result.rowcount == 0 and row["count"] > 0:
+            db.add(ReactionCount(**row))
+
+
+class ReactionWriteBuffer:
+    """Coalesces reactions per (user, post) and writes them in bulk.
+
+    add() and remove() only touch memory, so a viral post does not turn every
+    tap into a transaction. A background task writes the latest reaction of
+    every (user, post) at most REACTION_FLUSH_INTERVAL seconds later, or
+    earlier once REACTION_FLUSH_SIZE are pending: one locking SELECT of the
+    stored reactions, bulk inserts/updates/deletes and one counter upsert per
+    (post, emoji), all in one transaction. Counter deltas come from the rows
+    each write actually replaced, so writes from other workers do not make
+    the counters drift. stop() flushes whatever is left.
+
+    Summaries merge the pending reactions into the stored counts (see
+    get_reaction_summaries), so a user sees their own reaction immediately.
+    """
+
+    def __init__(self, interval: float = REACTION_FLUSH_INTERVAL, max_pending: int = REACTION_FLUSH_SIZE, session_factory=SessionLocal):
+        self.interval = interval
+        self.max_pending = max_pending
+        self.session_factory = session_factory
+        self.pending: Dict[Tuple[int, int], Optional[str]] = {}  # (user_id, awareness_id) to emoji, None when removed
+        self.inflight: Dict[Tuple[int, int], Optional[str]] = {}  # batch being written, still readable
+        self.posts: "OrderedDict[int, float]" = OrderedDict()  # post validated as existing and verified to when that expires
+        self.generation = 0  # odd while a flush commits; bumped twice per flush
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()  # keeps batches written in the order they were taken
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.wakeup: Optional[asyncio.Event] = None
+        self.task: Optional[asyncio.Task] = None
+
+    def _put(self, user_id: int, awareness_id: int, emoji: Optional[str]):
+        with self.lock:
+            self.pending[(user_id, awareness_id)] = emoji
+            full = len(self.pending) >= self.max_pending
+        if full and self.loop is not None:
+            self.loop.call_soon_threadsafe(self.wakeup.set)
+
+    def add(self, user_id: int, awareness_id: int, emoji: str):
+        self._put(user_id, awareness_id, emoji)
+
+    def remove(self, user_id: int, awareness_id: int):
+        self._put(user_id, awareness_id, None)
+
+    def post_validated(self, awareness_id: int) -> bool:
+        with self.lock:
+            expires = self.posts.get(awareness_id)
+            if expires is None:
+                return False
+            if expires <= time.monotonic():
+                del self.posts[awareness_id]
+                return False
+            return True
+
+    def remember_post(self, awareness_id: int):
+        with self.lock:
+            self.posts[awareness_id] = time.monotonic() + VALIDATED_POST_TTL
+            self.posts.move_to_end(awareness_id)
+            while len(self.posts) > VALIDATED_POST_SIZE:
+                self.posts.popitem(last=False)
+
+    def forget_post(self, awareness_id: int):
+        with self.lock:
+            self.posts.pop(awareness_id, None)
+
+    def get(self, user_id: int, awareness_id: int):
+        """Not-yet-written reaction of a user on a post (None if removed), or _MISSING"""
+        key = (user_id, awareness_id)
+        with self.lock:
+            if key in self.pending:
+                return self.pending[key]
+            return self.inflight.get(key, _MISSING)
+
+    def snapshot(self, awareness_ids: Iterable[int]) -> Tuple[int, Dict[Tuple[int, int], Optional[str]]]:
+        """(generation, not-yet-written reactions on the given posts)"""
+        awareness_ids = set(awareness_ids)
+        with self.lock:
+            if not self.pending and not self.inflight:
+                return self.generation, {}
+            entries = {key: emoji for key, emoji in self.inflight.items() if key[1] in awareness_ids}
+            entries.update((key, emoji) for key, emoji in self.pending.items() if key[1] in awareness_ids)
+            return self.generation, entries
+
+    def flush(self) -> Set[int]:
+        """Write all pending reactions in one transaction. Returns the posts written."""
+        with self.flush_lock:
+            with self.lock:
+                batch, self.pending = self.pending, {}
+                self.inflight = batch
+            try:
+                if batch:
+                    self._write(batch)
+            finally:
+                with self.lock:
+                    self.inflight = {}
+        return {awareness_id for _, awareness_id in batch}
+
+    def _write(self, batch: Dict[Tuple[int, int], Optional[str]]):
+        db = self.session_factory()
+        try:
+            stored = _stored_reactions_for_update(db, batch)
+            deltas: Dict[Tuple[int, str], int] = defaultdict(int)
+            updates, removed = [], []
+            inserts = self._plan(batch, stored, deltas, updates, removed)
+
+            dialect_insert = _upsert_insert(db)
+            if inserts and dialect_insert is not None:
+                # A reaction another worker stored since the read above is left alone here...
+                written = {(user_id, awareness_id) for user_id, awareness_id in db.execute(
+                    dialect_insert(Reaction.__table__)
+                    .on_conflict_do_nothing(index_elements=["user_id", "awareness_id"])
+                    .returning(Reaction.user_id, Reaction.awareness_id),
+                    inserts
+                )}
+                conflicts = {
+                    (row["user_id"], row["awareness_id"]): row["emoji"]
+                    for row in inserts if (row["user_id"], row["awareness_id"]) not in written
+                }
+                inserts = [row for row in inserts if (row["user_id"], row["awareness_id"]) in written]
+                # ...and replaced as an update, with the delta taken from its locked row
+                if conflicts:
+                    self._plan(conflicts, _stored_reactions_for_update(db, conflicts), deltas, updates, removed)
+            elif inserts:
+                db.execute(insert(Reaction), inserts)
+            for row in inserts:
+                deltas[(row["awareness_id"], row["emoji"])] += 1
+            if updates:
+                db.execute(update(Reaction), updates)
+            if removed:
+                db.execute(delete(Reaction).where(Reaction.id.in_(removed)))
+            _apply_count_deltas(db, deltas)
+            with self.lock:
+                self.generation += 1
+            try:
+                db.commit()
+            finally:
+                with self.lock:
+                    self.generation += 1
+        except Exception:
+            db.rollback()
+            # Put the batch back unless a newer reaction arrived meanwhile
+            with self.lock:
+                for key, emoji in batch.items():
+                    self.pending.setdefault(key, emoji)
+            raise
+        finally:
+            db.close()
+
+    @staticmethod
+    def _plan(batch, stored, deltas, updates: List[dict], removed: List[int]) -> List[dict]:
+        """Add the batch's updates and removals of stored reactions, with their counter deltas.
+
+        Returns the new reactions to insert; their deltas are added once the insert shows
+        which of them were really new.
+        """
+        inserts = []
+        for (user_id, awareness_id), emoji in batch.items():
+            reaction_id, old = stored.get((user_id, awareness_id), (None, None))
+            if emoji == old:
+                continue
+            if reaction_id is None:
+                if emoji is not None:
+                    inserts.append({"user_id": user_id, "awareness_id": awareness_id, "emoji": emoji})
+                continue
+            deltas[(awareness_id, old)] -= 1
+            if emoji is None:
+                removed.append(reaction_id)
+            else:
+                deltas[(awareness_id, emoji)] += 1
+                updates.append({"id": reaction_id, "emoji": emoji})
+        return inserts
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self.wakeup.clear()
+            try:
+                posts = await asyncio.to_thread(self.flush)
+            except Exception as e:
+                logger.error(f"Failed to flush reactions: {e}")
+                continue
+            if posts:
+                feed_cache.invalidate_posts(posts)
+
+    def start(self):
+        self.loop = asyncio.get_running_loop()
+        self.wakeup = asyncio.Event()
+        self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        self.loop = None
+        feed_cache.invalidate_posts(await asyncio.to_thread(self.flush))
+
+
+reaction_buffer = ReactionWriteBuffer()
+
+
+@event.listens_for(Awareness, "after_update")
+@event.listens_for(Awareness, "after_delete")
+def _forget_validated_post(mapper, connection, target):
+    # The post may have been unverified, or it is gone
+    reaction_buffer.forget_post(target.id)
+
+
+async def add_or_update_reaction(
+    db: AsyncSession,
     user_id: int,
     awareness_id: int,
     emoji: str
 ) -> ReactionResponse:
-    """Add new reaction or update existing one"""
+    """Add new reaction or update existing one (buffered, written within REACTION_FLUSH_INTERVAL)"""
 
-    # Validate post exists
-    awareness = validate_awareness_exists(db, awareness_id)
+    # Validate post exists, at most once per VALIDATED_POST_TTL
+    if not reaction_buffer.post_validated(awareness_id):
+        await validate_awareness_exists(db, awareness_id)
+        reaction_buffer.remember_post(awareness_id)
     validate_allowed_emoji(emoji)
+    emoji = AllowedEmoji(emoji).value
 
-    # Check existing reaction
-    existing = db.query(Reaction).filter(
-        Reaction.user_id == user_id,
-        Reaction.awareness_id == awareness_id
-    ).first()
-
-    if existing:
-        # Update emoji
-        existing.emoji = emoji
-        db.commit()
-        db.refresh(existing)
-        return ReactionResponse.model_validate(existing)
-
-    # Create new reaction
-    new_reaction = Reaction(
+    reaction_buffer.add(user_id, awareness_id, emoji)
+    return ReactionResponse(
         user_id=user_id,
         awareness_id=awareness_id,
-        emoji=emoji
+        emoji=emoji,
+        created_at=datetime.now(timezone.utc)
     )
 
-    db.add(new_reaction)
-    db.commit()
-    db.refresh(new_reaction)
-
-    return ReactionResponse.model_validate(new_reaction)
 
-
-def remove_reaction(
-    db: Session,
+async def remove_reaction(
+    db: AsyncSession,
     user_id: int,
     awareness_id: int
 ) -> bool:
     """Remove user's reaction"""
 
-    reaction = db.query(Reaction).filter(
-        Reaction.user_id == user_id,
-        Reaction.awareness_id == awareness_id
-    ).first()
-
-    if not reaction:
+    pending = reaction_buffer.get(user_id, awareness_id)
+    if pending is _MISSING:
+        exists = await db.scalar(select(Reaction.id).where(
+            Reaction.user_id == user_id,
+            Reaction.awareness_id == awareness_id
+        ))
+        if not exists:
+            return False
+    elif pending is None:
         return False
 
-    db.delete(reaction)
-    db.commit()
+    reaction_buffer.remove(user_id, awareness_id)
     return True
 
 
-def get_reaction_summary(
-    db: Session,
+async def _stored_reactions(db: AsyncSession, awareness_ids: List[int], current_user_id: Optional[int], pending):
+    """Stored counts, posts the user reacted to, and stored emoji of the pending (user, post) keys"""
+    emoji_counts: Dict[int, Dict[str, int]] = {awareness_id: {} for awareness_id in awareness_ids}
+    rows = await db.execute(
+        select(ReactionCount.awareness_id, ReactionCount.emoji, ReactionCount.count)
+        .where(ReactionCount.awareness_id.in_(awareness_ids), ReactionCount.count > 0)
+    )
+    for awareness_id, emoji, count in rows:
+        emoji_counts[awareness_id][emoji] = count
+
+    reacted = set()
+    if current_user_id:
+        reacted = set(await db.scalars(select(Reaction.awareness_id).where(
+            Reaction.user_id == current_user_id,
+            Reaction.awareness_id.in_(awareness_ids)
+        )))
+
+    stored = {}
+    if pending:
+        rows = await db.execute(
+            select(Reaction.user_id, Reaction.awareness_id, Reaction.emoji).where(
+                Reaction.awareness_id.in_({awareness_id for _, awareness_id in pending}),
+                Reaction.user_id.in_({user_id for user_id, _ in pending})
+            )
+        )
+        stored = {(user_id, awareness_id): emoji for user_id, awareness_id, emoji in rows}
+    return emoji_counts, reacted, stored
+
+
+async def get_reaction_summaries(
+    db: AsyncSession,
+    awareness_ids: Iterable[int],
+    current_user_id: Optional[int] = None
+) -> Dict[int, ReactionSummary]:
+    """Emoji counts + user reaction status for a batch of posts, in two queries.
+
+    Counts are read from awareness_reaction_counts, one row per post and
+    emoji, so the cost does not grow with the number of reactions. Reactions
+    still in reaction_buffer are merged in (one more query for the stored
+    reactions they replace); the read is retried if a flush commits while it
+    runs, so nothing is counted twice. Posts are not validated here; every id
+    asked for gets a summary (empty for posts without reactions).
+    """
+    awareness_ids = list(dict.fromkeys(awareness_ids))
+    if not awareness_ids:
+        return {}
+
+    for attempt in range(READ_RETRIES):
+        generation, pending = reaction_buffer.snapshot(awareness_ids)
+        if generation % 2 and attempt < READ_RETRIES - 1:
+            await asyncio.sleep(0.001)  # a flush is committing
+            continue
+        emoji_counts, reacted, stored = await _stored_reactions(db, awareness_ids, current_user_id, pending)
+        if reaction_buffer.generation == generation:
+            break
+    else:
+        logger.warning(f"Reaction summaries of {len(awareness_ids)} posts read during repeated flushes")
+
+    # Not-yet-written reactions replace the stored reaction of their user
+    for (user_id, awareness_id), emoji in pending.items():
+        old = stored.get((user_id, awareness_id))
+        if old == emoji:
+            continue
+        counts = emoji_counts[awareness_id]
+        if old is not None:
+            counts[old] = counts.get(old, 0) - 1
+            if counts[old] <= 0:
+                del counts[old]
+        if emoji is not None:
+            counts[emoji] = counts.get(emoji, 0) + 1
+        if user_id == current_user_id:
+            if emoji is None:
+                reacted.discard(awareness_id)
+            else:
+                reacted.add(awareness_id)
+
+    summaries = {}
+    for awareness_id, counts in emoji_counts.items():
+        # One reaction per user per post, so reactions and reacting users are the same count
+        total = sum(counts.values())
+        summaries[awareness_id] = ReactionSummary(
+            total_reactions=total,
+            emoji_counts=counts,
+            user_has_reacted=awareness_id in reacted,
+            users_reacted=total
+        )
+    return summaries
+
+
+async def get_reaction_summary(
+    db: AsyncSession,
     awareness_id: int,
     current_user_id: Optional[int] = None
 ) -> ReactionSummary:
     """Get emoji counts + user reaction status"""
 
-    validate_awareness_exists(db, awareness_id)
+    await validate_awareness_exists(db, awareness_id)
+    summaries = await get_reaction_summaries(db, [awareness_id], current_user_id)
+    return summaries[awareness_id]
 
-    # Get all reactions for this post
-    reactions = db.query(Reaction).filter(
-        Reaction.awareness_id == awareness_id
-    ).all()
 
-    # Count emojis
-    emoji_counts = {}
-    for reaction in reactions:
-        emoji = reaction.emoji
-        emoji_counts[emoji] = emoji_counts.get(emoji, 0) + 1
+def ensure_reaction_indexes(engine: Engine):
+    """Create reaction indexes added after the table was first created"""
+    for index in Reaction.__table__.indexes:
+        index.create(engine, checkfirst=True)
 
-    # Check if current user reacted
-    user_has_reacted = False
-    if current_user_id:
-        user_reaction = db.query(Reaction).filter(
-            Reaction.user_id == current_user_id,
-            Reaction.awareness_id == awareness_id
-        ).first()
-        user_has_reacted = bool(user_reaction)
-
-    return ReactionSummary(
-        total_reactions=len(reactions),
-        emoji_counts=emoji_counts,
-        user_has_reacted=user_has_reacted,
-        users_reacted=len(reactions)
+
+def reconcile_reaction_counts(db: Session, awareness_ids: Optional[Iterable[int]] = None) -> int:
+    """Recompute counters from the reactions table in bulk (all posts, or the given ones).
+
+    Repairs drift from writes made outside the services above, and fills the
+    table on databases that had reactions before it existed.
+    """
+    counts = select(Reaction.awareness_id, Reaction.emoji, func.count()).group_by(Reaction.awareness_id, Reaction.emoji)
+    stale = delete(ReactionCount)
+    if awareness_ids is not None:
+        awareness_ids = list(awareness_ids)
+        counts = counts.where(Reaction.awareness_id.in_(awareness_ids))
+        stale = stale.where(ReactionCount.awareness_id.in_(awareness_ids))
+    db.execute(stale)
+    result = db.execute(
+        insert(ReactionCount).from_select(["awareness_id", "emoji", "count"], counts)
     )
+    db.commit()
+    return result.rowcount
+
+
+class ReactionCountReconciler:
+    """Periodically recounts awareness_reaction_counts from reactions, starting at startup"""
+
+    def __init__(self, interval: float = RECONCILE_INTERVAL, session_factory=SessionLocal):
+        self.interval = interval
+        self.session_factory = session_factory
+        self.task: Optional[asyncio.Task] = None
+
+    def run_once(self):
+        db = self.session_factory()
+        try:
+            with reaction_buffer.flush_lock:  # no counter deltas applied mid-recount
+                rows = reconcile_reaction_counts(db)
+            logger.info(f"Reaction counts reconciled: {rows} counters")
+        finally:
+            db.close()
+        feed_cache.invalidate_all()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.to_thread(self.run_once)
+            except Exception as e:
+                logger.error(f"Reaction count reconciliation failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+
+reaction_reconciler = ReactionCountReconciler()
@@ -0,0 +1,232 @@
+from sqlalchemy import func, select, update
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from models.sos import SOSEvent
+from models.contact import Contact
+from app.database import AsyncSessionLocal
+from services.geo_index import geo_index, MAX_SEARCH_DISTANCE
+from services.location_cache import location_cache
+from services.notification_services import notification_dispatcher
+from services.sos_services import (
+    change_sos_status, sos_event_payload, SOS_ESCALATED, ACTIVE_SOS_STATUSES
+)
+from services.sos_guard import sos_guard
+from websocket.manager import manager
+
+logger = logging.getLogger(__name__)
+
+# Escalation of unacknowledged SOS events
+ACK_TIMEOUT = 120            # seconds without acknowledgement before each escalation
+MAX_ESCALATIONS = 3          # escalations before the scheduler stops re-notifying
+RESPONDER_RADIUS = 1000      # metres searched for nearby users; doubled at every escalation
+MAX_NEARBY_ALERTS = 200      # nearby users alerted per escalation
+STALE_AFTER = 2 * 3600       # seconds without a location fix or status change before auto-resolve
+
+ESCALATE = "escalate"
+EXPIRE = "expire"
+
+
+@dataclass
+class _ActiveSOS:
+    sos_id: int
+    user_id: int
+    last_activity: float  # loop time of the last fix or status change
+
+
+def responder_radius(level: int) -> float:
+    return min(RESPONDER_RADIUS * 2 ** level, MAX_SEARCH_DISTANCE)
+
+
+class SOSEscalationScheduler:
+    """Drives active SOS events through their timeouts from a single task.
+
+    Every pending timeout is an entry in one heap ordered by due time; the
+    task sleeps until the earliest one (or until an earlier one is pushed),
+    so thousands of active events cost one task and two heap entries each.
+    Entries are not removed when an event is acknowledged or resolved: they
+    are checked against the event when they come due and skipped.
+
+    While an event is active its user is tracked at high frequency: location
+    fixes skip the movement throttle and go out in the priority lane. Each
+    ACK_TIMEOUT without acknowledgement re-notifies the contacts and alerts
+    active users in a radius that doubles every time, up to MAX_ESCALATIONS.
+    Events without a fix or status change for STALE_AFTER seconds are
+    resolved automatically.
+
+    Every worker runs its own scheduler over all active events, so each
+    escalation is claimed first with a compare-and-set on the event's
+    escalation_level and escalate_at; only the worker whose update lands
+    sends it. The others re-arm for the next level, in case the winner dies.
+    """
+
+    def __init__(self, session_factory=AsyncSessionLocal):
+        self.session_factory = session_factory
+        self.heap: List[Tuple[float, int, int, str]] = []  # (due, tiebreak, sos_id, action)
+        self.counter = itertools.count()
+        self.active: Dict[int, _ActiveSOS] = {}  # sos_id to its tracking state
+        self.by_user: Dict[int, int] = {}  # user_id to active sos_id
+        self.wakeup: Optional[asyncio.Event] = None
+        self.task: Optional[asyncio.Task] = None
+
+    def _now(self) -> float:
+        return time.monotonic()
+
+    def _schedule(self, due: float, sos_id: int, action: str):
+        entry = (due, next(self.counter), sos_id, action)
+        heapq.heappush(self.heap, entry)
+        if self.wakeup is not None and self.heap[0] is entry:
+            self.wakeup.set()  # new earliest deadline
+
+    def track(self, sos_event: SOSEvent):
+        """Start escalation and high-frequency tracking for a newly triggered event"""
+        now = self._now()
+        self.active[sos_event.id] = _ActiveSOS(sos_event.id, sos_event.user_id, now)
+        self.by_user[sos_event.user_id] = sos_event.id
+        if sos_event.status in ("triggered", "escalated") and (sos_event.escalation_level or 0) < MAX_ESCALATIONS:
+            self._schedule(now + ACK_TIMEOUT, sos_event.id, ESCALATE)
+        self._schedule(now + STALE_AFTER, sos_event.id, EXPIRE)
+
+    def untrack(self, sos_id: int):
+        state = self.active.pop(sos_id, None)
+        if state is not None and self.by_user.get(state.user_id) == sos_id:
+            del self.by_user[state.user_id]
+
+    def updated(self, sos_event: SOSEvent):
+        """Note a status change made outside the scheduler"""
+        if sos_event.status == "resolved":
+            self.untrack(sos_event.id)
+        elif sos_event.id in self.active:
+            self.active[sos_event.id].last_activity = self._now()
+
+    def is_tracking(self, user_id: int) -> bool:
+        return user_id in self.by_user
+
+    def touch(self, user_id: int):
+        """A location fix arrived from the user; keeps their event from going stale"""
+        sos_id = self.by_user.get(user_id)
+        if sos_id is not None:
+            self.active[sos_id].last_activity = self._now()
+
+    async def _fire(self, sos_id: int, action: str):
+        state = self.active.get(sos_id)
+        if state is None:
+            return
+        if action == EXPIRE:
+            stale_at = state.last_activity + STALE_AFTER
+            if stale_at > self._now():
+                self._schedule(stale_at, sos_id, EXPIRE)
+                return
+        async with self.session_factory() as db:
+            sos_event = await db.get(SOSEvent, sos_id)
+            if sos_event is None or sos_event.status not in ACTIVE_SOS_STATUSES:
+                self.untrack(sos_id)
+                return
+            if action == EXPIRE:
+                logger.info(f"Auto-resolving stale SOS {sos_id}")
+                await change_sos_status(db, sos_event, "resolved", reason="stale")
+                self.untrack(sos_id)
+                await sos_guard.release(sos_event.user_id, str(sos_id))
+            elif sos_event.status in ("triggered", "escalated"):
+                await self._escalate(db, sos_event)
+
+    async def _claim_escalation(self, db, sos_event: SOSEvent) -> bool:
+        """Take the event's next escalation for this worker. False if another worker took it or it is not due."""
+        now = datetime.utcnow()
+        level = sos_event.escalation_level or 0
+        result = await db.execute(
+            update(SOSEvent)
+            .where(
+                SOSEvent.id == sos_event.id,
+                SOSEvent.status.in_(("triggered", "escalated")),
+                func.coalesce(SOSEvent.escalation_level, 0) == level,
+                SOSEvent.escalate_at.is_(None) | (SOSEvent.escalate_at <= now),
+            )
+            .values(escalation_level=level + 1, escalate_at=now + timedelta(seconds=ACK_TIMEOUT))
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+        await db.refresh(sos_event)
+        return result.rowcount == 1
+
+    async def _escalate(self, db, sos_event: SOSEvent):
+        if not await self._claim_escalation(db, sos_event):
+            # Sent (or not due yet) elsewhere; be ready to take the next level if that worker goes away
+            level = sos_event.escalation_level or 0
+            if sos_event.status in ("triggered", "escalated") and level < MAX_ESCALATIONS:
+                wait = (sos_event.escalate_at - datetime.utcnow()).total_seconds() if sos_event.escalate_at else 0
+                self._schedule(self._now() + max(wait, 0) + 1, sos_event.id, ESCALATE)
+            return
+        level = sos_event.escalation_level
+        radius = responder_radius(level)
+        fix = location_cache.get(sos_event.user_id)
+        latitude, longitude = (fix[0], fix[1]) if fix else (sos_event.latitude, sos_event.longitude)
+        nearby = geo_index.within(latitude, longitude, radius, exclude={sos_event.user_id})[:MAX_NEARBY_ALERTS]
+
+        await change_sos_status(db, sos_event, "escalated", event_type=SOS_ESCALATED, radius_m=radius, nearby=len(nearby))
+        logger.warning(f"SOS {sos_event.id} unacknowledged, escalation {level}: {len(nearby)} users within {radius} m")
+
+        # Active users around the person in distress, reached on their own location socket
+        if nearby:
+            await manager.broadcast(
+                {"type": "sos_nearby_alert", "sos": sos_event_payload(sos_event), "radius_m": radius},
+                [f"user:{user_id}" for _, user_id, _, _ in nearby],
+                priority=True
+            )
+        contacts = (await db.scalars(select(Contact).where(Contact.user_id == sos_event.user_id))).all()
+        if contacts:
+            await notification_dispatcher.enqueue_sos(
+                sos_event.id,
+                contacts,
+                f"Reminder: the SOS alert raised from ({latitude}, {longitude}) has not been acknowledged yet. "
+                f"Location Link: https://www.google.com/maps?q={latitude},{longitude}"
+            )
+        if level < MAX_ESCALATIONS:
+            self._schedule(self._now() + ACK_TIMEOUT, sos_event.id, ESCALATE)
+
+    async def _run(self):
+        while True:
+            if not self.heap:
+                await self.wakeup.wait()
+                self.wakeup.clear()
+                continue
+            delay = self.heap[0][0] - self._now()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                self.wakeup.clear()
+                continue
+            _, _, sos_id, action = heapq.heappop(self.heap)
+            try:
+                await self._fire(sos_id, action)
+            except Exception as e:
+                logger.error(f"SOS {action} failed for event {sos_id}: {e}")
+
+    async def start(self):
+        """Resume tracking of events left active by a previous run"""
+        self.wakeup = asyncio.Event()
+        self.heap, self.active, self.by_user = [], {}, {}
+        async with self.session_factory() as db:
+            active = (await db.scalars(select(SOSEvent).where(SOSEvent.status.in_(ACTIVE_SOS_STATUSES)))).all()
+        for sos_event in active:
+            self.track(sos_event)
+        self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+
+sos_scheduler = SOSEscalationScheduler()
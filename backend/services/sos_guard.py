@@ -0,0 +1,260 @@
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+import asyncio
+import heapq
+import logging
+import time
+from app.config import settings
+from models.sos import SOSEvent
+from models.contact import Contact
+from services.location_services import get_live_location
+from services.sos_services import trigger_sos, publish_sos_event, SOS_UPDATED, ACTIVE_SOS_STATUSES
+
+logger = logging.getLogger(__name__)
+
+# Deduplication of repeated SOS triggers
+DEDUP_WINDOW = 600          # seconds after the last trigger in which a new one merges into the active event
+CLAIM_TTL = 10              # seconds a claim may stay pending while its event is being created
+CLAIM_WAIT = 2.0            # seconds a concurrent trigger waits for a pending claim to resolve
+CLAIM_POLL = 0.05           # seconds between checks while waiting
+IDEMPOTENCY_TTL = 24 * 3600  # seconds an Idempotency-Key keeps pointing at its event
+
+PENDING = "pending"
+
+
+@dataclass
+class SOSTrigger:
+    """Outcome of trigger_sos_once"""
+    sos_event: SOSEvent
+    location: Any  # the user's live location, or the event when there is none
+    created: bool
+    contact_count: int
+    contacts: List[Contact] = field(default_factory=list)  # to notify; only filled when created
+
+
+class SOSGuard(ABC):
+    """Per-user active-SOS claim plus Idempotency-Key mapping.
+
+    claim() is atomic: of any number of concurrent triggers from one user,
+    exactly one gets to create an event; the others see its id (or PENDING
+    while it is being created) and merge into it instead.
+    """
+
+    @abstractmethod
+    async def claim(self, user_id: int) -> Tuple[bool, Optional[str]]:
+        """(True, None) if this caller now owns the user's claim, else (False, current value)"""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def bind(self, user_id: int, sos_id: int):
+        """Point the user's claim at the event it created and (re)start the dedup window"""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get(self, user_id: int) -> Optional[str]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def release(self, user_id: int, value: str):
+        """Drop the user's claim if it still holds value"""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def remember_key(self, user_id: int, key: str, sos_id: int):
+        raise NotImplementedError
+
+    @abstractmethod
+    async def lookup_key(self, user_id: int, key: str) -> Optional[int]:
+        raise NotImplementedError
+
+
+class InMemorySOSGuard(SOSGuard):
+    """Single-process guard; the event loop makes each method atomic.
+
+    Expiry times are also kept in a heap, and every write drops the entries
+    that have expired, so keys nobody reads again do not pile up.
+    """
+
+    def __init__(self):
+        self.entries: Dict[str, Tuple[str, float]] = {}  # key to (value, expires)
+        self.expiries: List[Tuple[float, str]] = []  # heap of (expires, key), stale once the key is rewritten
+
+    def _get(self, key: str) -> Optional[str]:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if entry[1] <= time.time():
+            del self.entries[key]
+            return None
+        return entry[0]
+
+    def _set(self, key: str, value: str, ttl: float):
+        now = time.time()
+        while self.expiries and self.expiries[0][0] <= now:
+            expires, old_key = heapq.heappop(self.expiries)
+            entry = self.entries.get(old_key)
+            if entry is not None and entry[1] == expires:
+                del self.entries[old_key]
+        self.entries[key] = (value, now + ttl)
+        heapq.heappush(self.expiries, (now + ttl, key))
+
+    async def claim(self, user_id):
+        current = self._get(f"active:{user_id}")
+        if current is not None:
+            return False, current
+        self._set(f"active:{user_id}", PENDING, CLAIM_TTL)
+        return True, None
+
+    async def bind(self, user_id, sos_id):
+        self._set(f"active:{user_id}", str(sos_id), DEDUP_WINDOW)
+
+    async def get(self, user_id):
+        return self._get(f"active:{user_id}")
+
+    async def release(self, user_id, value):
+        if self._get(f"active:{user_id}") == value:
+            del self.entries[f"active:{user_id}"]
+
+    async def remember_key(self, user_id, key, sos_id):
+        self._set(f"idem:{user_id}:{key}", str(sos_id), IDEMPOTENCY_TTL)
+
+    async def lookup_key(self, user_id, key):
+        value = self._get(f"idem:{user_id}:{key}")
+        return int(value) if value is not None else None
+
+
+class RedisSOSGuard(SOSGuard):
+    """Guard shared by every worker: claims are SET NX with a TTL, releases compare-and-delete"""
+
+    def __init__(self, url: Optional[str] = None, client=None, prefix: str = settings.broker_prefix):
+        if client is None:
+            try:
+                import redis.asyncio as aioredis
+            except ImportError:
+                raise RuntimeError("BROKER_URL is set but the redis package is not installed")
+            client = aioredis.from_url(url, decode_responses=True)
+        self.client = client
+        self.prefix = f"{prefix}:sos"
+
+    def _active(self, user_id):
+        return f"{self.prefix}:active:{user_id}"
+
+    @staticmethod
+    def _text(value):
+        return value.decode() if isinstance(value, bytes) else value
+
+    async def claim(self, user_id):
+        if await self.client.set(self._active(user_id), PENDING, nx=True, ex=CLAIM_TTL):
+            return True, None
+        return False, self._text(await self.client.get(self._active(user_id)))
+
+    async def bind(self, user_id, sos_id):
+        await self.client.set(self._active(user_id), str(sos_id), ex=DEDUP_WINDOW)
+
+    async def get(self, user_id):
+        return self._text(await self.client.get(self._active(user_id)))
+
+    async def release(self, user_id, value):
+        key = self._active(user_id)
+        async with self.client.pipeline(transaction=True) as pipe:
+            try:
+                await pipe.watch(key)
+                if self._text(await pipe.get(key)) != value:
+                    return
+                pipe.multi()
+                pipe.delete(key)
+                await pipe.execute()
+            except Exception as e:
+                # Someone re-claimed in between; their claim wins
+                logger.info(f"SOS claim of user {user_id} changed during release: {e}")
+
+    async def remember_key(self, user_id, key, sos_id):
+        await self.client.set(f"{self.prefix}:idem:{user_id}:{key}", str(sos_id), ex=IDEMPOTENCY_TTL)
+
+    async def lookup_key(self, user_id, key):
+        value = await self.client.get(f"{self.prefix}:idem:{user_id}:{key}")
+        return int(value) if value is not None else None
+
+
+def create_sos_guard(url: Optional[str] = settings.broker_url) -> SOSGuard:
+    if url:
+        return RedisSOSGuard(url)
+    return InMemorySOSGuard()
+
+
+sos_guard = create_sos_guard()
+
+
+async def _wait_for_claim(user_id: int) -> Optional[str]:
+    """Value of the user's claim once it is no longer pending, or None if it went away"""
+    deadline = time.monotonic() + CLAIM_WAIT
+    value = await sos_guard.get(user_id)
+    while value == PENDING and time.monotonic() < deadline:
+        await asyncio.sleep(CLAIM_POLL)
+        value = await sos_guard.get(user_id)
+    return value
+
+
+async def _contact_count(db: AsyncSession, user_id: int) -> int:
+    return await db.scalar(select(func.count()).select_from(Contact).where(Contact.user_id == user_id))
+
+
+async def _merge(db: AsyncSession, user, sos_event: SOSEvent) -> SOSTrigger:
+    """Refresh an active event with the user's latest location instead of raising a new one"""
+    location = await get_live_location(db, user.id)
+    if location is not None:
+        sos_event.latitude = location.latitude
+        sos_event.longitude = location.longitude
+        await db.commit()
+    await sos_guard.bind(user.id, sos_event.id)
+    await publish_sos_event(SOS_UPDATED, sos_event)
+    return SOSTrigger(sos_event, location or sos_event, False, await _contact_count(db, user.id))
+
+
+async def trigger_sos_once(db: AsyncSession, user, idempotency_key: Optional[str] = None) -> SOSTrigger:
+    """Raise an SOS, or merge into the user's active one.
+
+    Only a created event carries the contacts to notify: repeats within
+    DEDUP_WINDOW of the last trigger, and retries carrying an Idempotency-Key
+    already seen, only refresh the event's location.
+    """
+    if idempotency_key:
+        sos_id = await sos_guard.lookup_key(user.id, idempotency_key)
+        sos_event = await db.get(SOSEvent, sos_id) if sos_id is not None else None
+        if sos_event is not None:
+            return SOSTrigger(sos_event, sos_event, False, await _contact_count(db, user.id))
+
+    for _ in range(3):
+        claimed, value = await sos_guard.claim(user.id)
+        if claimed:
+            break
+        if value == PENDING:
+            value = await _wait_for_claim(user.id)
+        if value is None:
+            continue  # the creator failed or its claim expired; take the claim ourselves
+        if value == PENDING:
+            # The creator is stuck; a duplicate beats a missing alert
+            logger.warning(f"Could not resolve pending SOS claim of user {user.id}; raising a new event")
+            break
+        sos_event = await db.get(SOSEvent, int(value))
+        if sos_event is not None and sos_event.status in ACTIVE_SOS_STATUSES:
+            merged = await _merge(db, user, sos_event)
+            if idempotency_key:
+                await sos_guard.remember_key(user.id, idempotency_key, sos_event.id)
+            return merged
+        # Claim left behind by a resolved event
+        await sos_guard.release(user.id, value)
+
+    try:
+        sos_event, contacts, location = await trigger_sos(db, user)
+    except Exception:
+        if claimed:
+            await sos_guard.release(user.id, PENDING)
+        raise
+    await sos_guard.bind(user.id, sos_event.id)
+    if idempotency_key:
+        await sos_guard.remember_key(user.id, idempotency_key, sos_event.id)
+    return SOSTrigger(sos_event, location, True, len(contacts), list(contacts))
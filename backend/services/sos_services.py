@@ -1,22 +1,78 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import Engine, inspect, literal, select, text, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import APIRouter, Depends, HTTPException, status
 from models.sos import SOSEvent
-from models.user import User
+from models.user import User, UserRole
 from models.contact import Contact
-from services.location_services import upsert_live_location, get_live_location
-from routes.auth import get_db, get_current_user
+from services.contacts_services import emergency_contact_query
+from services.location_services import get_live_location
+from websocket.manager import manager
+from typing import Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Typed SOS events published to responders and the user's emergency contacts
+SOS_TRIGGERED = "sos_triggered"
+SOS_STATUS_CHANGED = "sos_status_changed"
+SOS_RESOLVED = "sos_resolved"
+SOS_ESCALATED = "sos_escalated"
+SOS_UPDATED = "sos_updated"  # repeated trigger merged in, location refreshed
+
+# Allowed status transitions; resolved is final
+SOS_TRANSITIONS = {
+    "triggered": {"escalated", "acknowledged", "responding", "resolved"},
+    "escalated": {"escalated", "acknowledged", "responding", "resolved"},
+    "acknowledged": {"responding", "resolved"},
+    "responding": {"resolved"},
+    "resolved": set(),
+}
+ACTIVE_SOS_STATUSES = ("triggered", "escalated", "acknowledged", "responding")
+# sos_events columns added by ensure_sos_event_columns on databases created before them
+SOS_EVENT_LATE_COLUMNS = ("delivery_status", "escalation_level", "acknowledged_by", "escalate_at")
+
+
+def sos_groups(user_id: int):
+    return ["sos_responders", f"emergency_contacts:{user_id}"]
+
+
+def sos_event_payload(sos_event: SOSEvent) -> dict:
+    return {
+        "id": sos_event.id,
+        "user_id": sos_event.user_id,
+        "latitude": sos_event.latitude,
+        "longitude": sos_event.longitude,
+        "status": sos_event.status,
+        "delivery_status": sos_event.delivery_status,
+        "escalation_level": sos_event.escalation_level,
+        "acknowledged_by": sos_event.acknowledged_by,
+        "triggered_at": sos_event.triggered_at.isoformat() if sos_event.triggered_at else None,
+    }
+
+
+async def publish_sos_event(event_type: str, sos_event: SOSEvent, **extra) -> int:
+    """Push an SOS event to live subscribers; returns its replay seq, or None if the broker failed"""
+    try:
+        return await manager.publish_event(
+            {"type": event_type, "sos": sos_event_payload(sos_event), **extra},
+            sos_groups(sos_event.user_id),
+        )
+    except Exception as e:
+        # The event is already stored; subscribers catch up over REST
+        logger.error(f"Failed to publish {event_type} for SOS {sos_event.id}: {e}")
+        return None
 
 
 # Create SOS event
-def trigger_sos(db: Session, user: User):
+async def trigger_sos(db: AsyncSession, user: User):
 
     # Fetch user's live location
-    location = get_live_location(db, user.id)
+    location = await get_live_location(db, user.id)
     if not location:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Live location not found")
     
     # Fetch user's emergency contacts
-    contacts = db.query(Contact).filter(Contact.user_id == user.id).all()
+    contacts = (await db.scalars(select(Contact).where(Contact.user_id == user.id))).all()
     if not contacts:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No emergency contacts found")
     
@@ -27,7 +83,76 @@ def trigger_sos(db: Session, user: User):
         longitude=location.longitude
     )
     db.add(sos_event)
-    db.commit()
-    db.refresh(sos_event)
+    await db.commit()
+    await db.refresh(sos_event)
     
-    return contacts, location
\ No newline at end of file
+    await publish_sos_event(SOS_TRIGGERED, sos_event)
+    return sos_event, contacts, location
+
+
+async def change_sos_status(
+    db: AsyncSession,
+    sos_event: SOSEvent,
+    new_status: str,
+    event_type: Optional[str] = None,
+    **extra
+) -> SOSEvent:
+    """Move an SOS event along SOS_TRANSITIONS, commit and publish the change"""
+    if new_status not in SOS_TRANSITIONS[sos_event.status]:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Cannot change SOS status from {sos_event.status} to {new_status}"
+        )
+    sos_event.status = new_status
+    await db.commit()
+    if event_type is None:
+        event_type = SOS_RESOLVED if new_status == "resolved" else SOS_STATUS_CHANGED
+    await publish_sos_event(event_type, sos_event, **extra)
+    return sos_event
+
+
+async def set_sos_status(db: AsyncSession, sos_id: int, new_status: str, user) -> SOSEvent:
+    """Change an SOS event's status as its owner or an admin/NGO, and publish the change"""
+    sos_event = await db.get(SOSEvent, sos_id)
+    if not sos_event:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="SOS event not found")
+    if sos_event.user_id != user.id and user.role not in (UserRole.admin, UserRole.ngo):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not allowed to update this SOS event")
+    if sos_event.status == new_status:
+        return sos_event
+    return await change_sos_status(db, sos_event, new_status)
+
+
+async def acknowledge_sos(db: AsyncSession, sos_id: int, user) -> SOSEvent:
+    """Acknowledge an SOS as one of the user's emergency contacts or an admin/NGO; stops escalation"""
+    sos_event = await db.get(SOSEvent, sos_id)
+    if not sos_event:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="SOS event not found")
+    if user.role not in (UserRole.admin, UserRole.ngo):
+        contact = await db.scalar(emergency_contact_query(sos_event.user_id, user))
+        if contact is None:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not an emergency contact")
+    if sos_event.status == "acknowledged":
+        return sos_event
+    sos_event.acknowledged_by = user.id
+    return await change_sos_status(db, sos_event, "acknowledged")
+
+
+def ensure_sos_event_columns(engine: Engine):
+    """Add sos_events columns introduced after the table was first created (SQLite has no create_all migration).
+
+    Columns get their model default as a server DEFAULT, so existing events are
+    filled in, and NULLs left by an earlier run of this migration are backfilled.
+    """
+    table = SOSEvent.__table__
+    existing = {c["name"] for c in inspect(engine).get_columns(table.name)}
+    with engine.begin() as conn:
+        for column in table.columns:
+            default = column.default.arg if column.default is not None and column.default.is_scalar else None
+            if column.name not in existing:
+                ddl = column.type.compile(dialect=engine.dialect)
+                if default is not None:
+                    ddl += " DEFAULT " + str(literal(default).compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True}))
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {ddl}"))
+            elif column.name in SOS_EVENT_LATE_COLUMNS and default is not None:
+                conn.execute(update(table).where(column.is_(None)).values({column.name: default}))
@@ -0,0 +1,38 @@
+import asyncio
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Point the app at a throwaway database before anything imports app.config
+_tmp = tempfile.mkdtemp(prefix="swaraj-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp, 'test.db')}"
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def run(coro):
+    """Run a coroutine to completion on a fresh event loop"""
+    return asyncio.run(coro)
+
+
+@pytest.fixture
+def arun():
+    return run
+
+
+@pytest.fixture
+def db_tables():
+    """Schema of the full app on the test database, emptied after each test"""
+    import app.main  # noqa: F401 (creates the tables and runs the ensure_* migrations)
+    from sqlalchemy import inspect, text
+    from app.database import Base, engine, async_engine
+
+    yield engine
+    run(async_engine.dispose())
+    with engine.begin() as conn:
+        for table in reversed(Base.metadata.sorted_tables):
+            conn.execute(table.delete())
+        if "awareness_search" in inspect(conn).get_table_names():
+            conn.execute(text("DELETE FROM awareness_search"))
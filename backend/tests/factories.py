@@ -0,0 +1,39 @@
+from sqlalchemy.orm import Session
+
+from models.contact import Contact
+from models.sos import SOSEvent
+from models.user import User
+
+
+def make_user(db: Session, email: str = "user@example.com", **fields) -> User:
+    user = User(name=email.split("@")[0], email=email, hashed_password="x", **fields)
+    db.add(user)
+    db.flush()
+    return user
+
+
+def make_contact(db: Session, user: User, email: str = "contact@example.com", phone_number: str = "9000000000") -> Contact:
+    contact = Contact(user_id=user.id, name="Contact", email=email, phone_number=phone_number, message="Help")
+    db.add(contact)
+    db.flush()
+    return contact
+
+
+def make_sos(db: Session, user: User, **fields) -> SOSEvent:
+    sos_event = SOSEvent(user_id=user.id, latitude=28.6, longitude=77.2, **fields)
+    db.add(sos_event)
+    db.flush()
+    return sos_event
+
+
+class FakeWebSocket:
+    """Accepted websocket that records the text frames sent to it"""
+
+    def __init__(self):
+        self.sent = []
+
+    async def send_text(self, frame):
+        self.sent.append(frame)
+
+    async def close(self, code=1000, reason=None):
+        pass
@@ -0,0 +1,92 @@
+import pytest
+from sqlalchemy.orm import Session
+
+from app.database import AsyncSessionLocal
+from models.awareness import Awareness, AwarenessCategory, AwarenessSource
+from services.awareness import search_awareness
+from services.awareness_search import SearchIndex, ensure_awareness_search
+from utils.text_search import tokenize
+
+
+def test_hindi_inflections_share_a_stem():
+    assert tokenize("महिलाओं") == tokenize("महिला") == tokenize("महिलाएं")
+    assert tokenize("लड़कियों") == tokenize("लड़की")
+
+
+def test_nukta_and_chandrabindu_are_folded():
+    assert tokenize("ज़रूरत") == tokenize("जरूरत")
+    assert tokenize("माँ") == tokenize("मां")
+
+
+def test_stopwords_are_dropped_in_both_languages():
+    assert tokenize("The law of the land") == ["law", "land"]
+    assert tokenize("महिलाओं के लिए कानून") == tokenize("महिला कानून")
+
+
+def test_english_plurals_and_possessives():
+    assert tokenize("Laws") == ["law"]
+    assert tokenize("women's rights") == ["women", "right"]
+    assert tokenize("address bus") == ["address", "bus"]
+
+
+@pytest.fixture
+def posts(db_tables):
+    """Verified posts added straight to the table, so only the backfill indexes them"""
+    specs = [
+        ("helpline", "Helpline numbers", "Save these before you travel.", AwarenessCategory.guideline, True),
+        ("rights", "Know your rights", "Call the helpline if the police refuse a complaint.", AwarenessCategory.law, True),
+        ("travel", "Night travel", "Share your live location with a trusted contact.", AwarenessCategory.guideline, True),
+        ("hindi", "घरेलू हिंसा", "महिलाओं के लिए सुरक्षा कानून", AwarenessCategory.law, True),
+        ("counselling", "Counselling centres", "Free sessions for survivors.", AwarenessCategory.guideline, True),
+        ("draft", "Helpline draft", "helpline helpline", AwarenessCategory.guideline, False),
+    ]
+    with Session(db_tables) as db:
+        rows = {
+            name: Awareness(title=title, content=content, category=category,
+                            source=AwarenessSource.ngo, is_verified=verified)
+            for name, title, content, category, verified in specs
+        }
+        db.add_all(rows.values())
+        db.commit()
+        ids = {name: row.id for name, row in rows.items()}
+    assert ensure_awareness_search(db_tables) == 5  # the unverified draft is not indexed
+    assert ensure_awareness_search(db_tables) == 0  # already indexed posts are skipped
+    return ids
+
+
+def search(arun, q, category=None):
+    async def scenario():
+        async with AsyncSessionLocal() as db:
+            return await search_awareness(db, q, category)
+    return [post.id for post in arun(scenario()).posts]
+
+
+def test_title_matches_rank_above_content_matches(posts, arun):
+    assert search(arun, "helpline") == [posts["helpline"], posts["rights"]]
+
+
+def test_category_filter(posts, arun):
+    assert search(arun, "helpline", AwarenessCategory.law) == [posts["rights"]]
+
+
+def test_prefix_search_is_opt_in(posts, arun):
+    assert search(arun, "counsel") == []
+    assert search(arun, "counsel*") == [posts["counselling"]]
+
+
+def test_hindi_query_matches_inflected_text(posts, arun):
+    assert search(arun, "महिला") == [posts["hindi"]]
+
+
+def test_all_terms_must_match(posts, arun):
+    assert search(arun, "helpline police") == [posts["rights"]]
+    assert search(arun, "the of") == []
+
+
+def test_incomplete_index_fails_when_created():
+    class Incomplete(SearchIndex):
+        def create(self, conn):
+            pass
+
+    with pytest.raises(TypeError):
+        Incomplete()
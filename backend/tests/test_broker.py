@@ -0,0 +1,140 @@
+import asyncio
+
+import fakeredis.aioredis
+import pytest
+
+from websocket import broker as broker_module
+from websocket.broker import Broker, InMemoryBroker, RedisBroker
+
+
+def make_broker(kind, log_size=3):
+    if kind == "memory":
+        return InMemoryBroker(log_size=log_size)
+    return RedisBroker(client=fakeredis.aioredis.FakeRedis(), prefix="test", log_size=log_size)
+
+
+@pytest.mark.parametrize("kind", ["memory", "redis"])
+def test_published_frames_reach_the_handler(kind, arun):
+    async def scenario():
+        broker = make_broker(kind)
+        received = asyncio.Queue()
+
+        async def handler(groups, frame, key, priority):
+            await received.put((groups, frame, key, priority))
+
+        broker.bind(handler)
+        await broker.start()
+        try:
+            await broker.publish(["sos_responders"], '{"type":"sos"}', None, True)
+            await broker.publish(["user:1"], b"\x00binary", "location_update:1")
+            return [await asyncio.wait_for(received.get(), 1) for _ in range(2)]
+        finally:
+            await broker.stop()
+
+    assert arun(scenario()) == [
+        (["sos_responders"], '{"type":"sos"}', None, True),
+        (["user:1"], b"\x00binary", "location_update:1", False),
+    ]
+
+
+@pytest.mark.parametrize("kind", ["memory", "redis"])
+def test_event_log_replays_by_group_and_seq(kind, arun):
+    async def scenario():
+        broker = make_broker(kind)
+        for groups in (["a"], ["b"], ["a", "b"], ["a"]):
+            seq = await broker.next_event_seq()
+            await broker.record_event(seq, groups, f"e{seq}")
+        return await broker.get_events(["a"], since=0), await broker.get_events(["b"], since=3)
+
+    everything, after = arun(scenario())
+    # Capped at three events, so e1 is gone and the oldest kept is seq 2
+    assert everything == (4, 2, ["e3", "e4"])
+    assert after == (4, 2, [])
+
+
+def test_incomplete_broker_fails_when_created():
+    class Incomplete(Broker):
+        async def publish(self, groups, frame, key=None, priority=False):
+            pass
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+class DroppingPubSub:
+    """Subscribes through a real client, then loses the connection on listen()"""
+
+    def __init__(self, pubsub):
+        self.pubsub = pubsub
+
+    async def subscribe(self, channel):
+        await self.pubsub.subscribe(channel)
+
+    async def listen(self):
+        raise ConnectionError("Connection reset by peer")
+        yield
+
+    async def aclose(self):
+        await self.pubsub.aclose()
+
+
+def test_redis_listener_resubscribes_after_the_connection_drops(arun, monkeypatch):
+    monkeypatch.setattr(broker_module, "RESUBSCRIBE_BASE_DELAY", 0.01)
+
+    async def scenario():
+        client = fakeredis.aioredis.FakeRedis()
+        pubsubs = []
+
+        def pubsub():
+            inner = fakeredis.aioredis.FakeRedis.pubsub(client)
+            pubsubs.append(inner)
+            return DroppingPubSub(inner) if len(pubsubs) < 3 else inner
+
+        client.pubsub = pubsub
+        broker = RedisBroker(client=client, prefix="test")
+        received = asyncio.Queue()
+
+        async def handler(groups, frame, key, priority):
+            await received.put(frame)
+
+        broker.bind(handler)
+        await broker.start()
+        try:
+            for _ in range(100):
+                if len(pubsubs) == 3:
+                    break
+                await asyncio.sleep(0.01)
+            await asyncio.sleep(0.01)
+            await broker.publish(["user:1"], "after")
+            return len(pubsubs), await asyncio.wait_for(received.get(), 1), broker.listener.done()
+        finally:
+            await broker.stop()
+
+    assert arun(scenario()) == (3, "after", False)
+
+
+@pytest.mark.parametrize("kind", ["memory", "redis"])
+def test_member_counts_follow_joins_and_leaves(kind, arun):
+    async def scenario():
+        broker = make_broker(kind)
+        for delta in (1, 1, -1):
+            broker.track_members("contact:1", delta)
+        await asyncio.sleep(0.01)  # Redis updates are sent in the background
+        return await broker.count_members("contact:1"), await broker.count_members("contact:2")
+
+    assert arun(scenario()) == (1, 0)
+
+
+def test_redis_member_counts_are_shared_and_withdrawn_on_stop(arun):
+    async def scenario():
+        client = fakeredis.aioredis.FakeRedis()
+        one, two = (RedisBroker(client=client, prefix="test") for _ in range(2))
+        await one.start()
+        one.track_members("contact:1", 1)
+        two.track_members("contact:1", 1)
+        await asyncio.sleep(0.01)
+        shared = await two.count_members("contact:1")
+        await one.stop()
+        return shared, await two.count_members("contact:1")
+
+    assert arun(scenario()) == (2, 1)
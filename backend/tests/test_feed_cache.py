@@ -0,0 +1,76 @@
+import asyncio
+
+from services.feed_cache import FeedCache
+
+
+class Builder:
+    def __init__(self, delay=0.0):
+        self.calls = 0
+        self.delay = delay
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return {"posts": [1, 2], "build": self.calls}
+
+
+def post_ids(page):
+    return page["posts"]
+
+
+def test_concurrent_misses_share_one_rebuild(arun):
+    async def scenario():
+        cache, build = FeedCache(), Builder(delay=0.05)
+        pages = await asyncio.gather(*(cache.get("page", build, post_ids) for _ in range(10)))
+        return build.calls, {page["build"] for page in pages}
+
+    assert arun(scenario()) == (1, {1})
+
+
+def test_stale_page_is_served_while_it_rebuilds(arun):
+    async def scenario():
+        cache, build = FeedCache(ttl=0, stale_ttl=60), Builder()
+        first = await cache.get("page", build, post_ids)
+        stale = await cache.get("page", build, post_ids)  # past ttl: served as is
+        await asyncio.sleep(0.01)  # background rebuild finishes
+        return first["build"], stale["build"], build.calls
+
+    assert arun(scenario()) == (1, 1, 2)
+
+
+def test_invalidating_a_post_marks_only_its_pages_stale(arun):
+    async def scenario():
+        cache = FeedCache()
+        on_page, elsewhere = Builder(), Builder()
+        await cache.get("a", on_page, post_ids)
+        await cache.get("b", elsewhere, lambda page: [3])
+        cache.invalidate_posts([1])
+        await cache.get("a", on_page, post_ids)
+        await cache.get("b", elsewhere, lambda page: [3])
+        await asyncio.sleep(0.01)
+        return on_page.calls, elsewhere.calls
+
+    assert arun(scenario()) == (2, 1)
+
+
+def test_rebuild_started_before_invalidate_all_is_not_kept(arun):
+    async def scenario():
+        cache, build = FeedCache(), Builder(delay=0.05)
+        task = asyncio.create_task(cache.get("page", build, post_ids))
+        await asyncio.sleep(0.01)
+        cache.invalidate_all()  # a post was added while the page was being built
+        await task
+        await cache.get("page", build, post_ids)
+        return build.calls, len(cache)
+
+    assert arun(scenario()) == (2, 1)
+
+
+def test_least_recently_used_pages_are_evicted(arun):
+    async def scenario():
+        cache = FeedCache(maxsize=2)
+        for key in ("a", "b", "c"):
+            await cache.get(key, Builder(), post_ids)
+        return list(cache.pages), cache.pages_by_post[1]
+
+    assert arun(scenario()) == (["b", "c"], {"b", "c"})
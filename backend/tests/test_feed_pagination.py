@@ -0,0 +1,106 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from app.database import AsyncSessionLocal
+from models.awareness import Awareness, AwarenessCategory, AwarenessSource
+from services import awareness
+from services.awareness import get_awareness_feed, get_awareness_feed_page
+from services.feed_cache import feed_cache
+
+
+@pytest.fixture
+def posts(db_tables):
+    """Seven verified posts, five of them created in the same second, and one unverified"""
+    feed_cache.invalidate_all()
+    awareness._feed_totals.clear()
+    base = datetime(2026, 1, 1, 10, 0, 0)
+    created = [base] * 5 + [base - timedelta(minutes=1), base + timedelta(minutes=1)]
+    with Session(db_tables) as db:
+        rows = [
+            Awareness(title=f"Post {i}", content="text", category=AwarenessCategory.law,
+                      source=AwarenessSource.ngo, created_at=at)
+            for i, at in enumerate(created)
+        ]
+        rows.append(Awareness(title="Hidden", content="text", category=AwarenessCategory.law,
+                              source=AwarenessSource.ngo, is_verified=False, created_at=base))
+        db.add_all(rows)
+        db.commit()
+        ids = [row.id for row in rows[:7]]
+    # Newest first, ties broken by id
+    return [ids[6], *sorted(ids[:5], reverse=True), ids[5]]
+
+
+def walk(arun, page_size, category=None):
+    async def scenario():
+        pages, cursor = [], None
+        async with AsyncSessionLocal() as db:
+            while True:
+                page = await get_awareness_feed_page(db, category, cursor, page_size)
+                pages.append(page)
+                if not page.has_next:
+                    return pages
+                cursor = page.next_cursor
+    return arun(scenario())
+
+
+def test_cursor_walk_returns_every_post_once_across_ties(posts, arun):
+    pages = walk(arun, 3)
+    assert [post.id for page in pages for post in page.posts] == posts
+    assert [len(page.posts) for page in pages] == [3, 3, 1]
+    assert pages[-1].next_cursor is None
+    assert all(page.total == 7 for page in pages)
+
+
+def test_exact_multiple_of_page_size_ends_without_cursor(posts, arun):
+    pages = walk(arun, 7)
+    assert len(pages) == 1 and not pages[0].has_next and pages[0].next_cursor is None
+
+
+def test_empty_category(posts, arun):
+    [page] = walk(arun, 3, AwarenessCategory.crime)
+    assert page.posts == [] and page.next_cursor is None and page.total == 0
+
+
+def test_zero_page_size_does_not_fail(posts, arun):
+    async def scenario():
+        async with AsyncSessionLocal() as db:
+            return await get_awareness_feed_page(db, None, None, 0)
+    page = arun(scenario())
+    assert page.posts == [] and page.next_cursor is None
+
+
+def test_offset_pages_match_cursor_pages(posts, arun):
+    async def scenario():
+        async with AsyncSessionLocal() as db:
+            return [await get_awareness_feed(db, None, page, 3) for page in (1, 2, 3, 4)]
+    pages = arun(scenario())
+    assert [post.id for page in pages for post in page.posts] == posts
+    assert pages[3].posts == [] and not pages[3].has_next
+
+
+def test_malformed_cursor_is_rejected(posts, arun):
+    async def scenario():
+        async with AsyncSessionLocal() as db:
+            await get_awareness_feed_page(db, None, "not-a-cursor", 3)
+    with pytest.raises(HTTPException) as error:
+        arun(scenario())
+    assert error.value.status_code == 400
+
+
+@pytest.mark.parametrize("query", ["page_size=0", "page_size=51", "page=0"])
+def test_feed_route_rejects_out_of_range_paging(posts, query):
+    from app.main import app
+    assert TestClient(app).get(f"/awareness/feed?{query}").status_code == 422
+
+
+def test_feed_route_follows_cursor(posts):
+    from app.main import app
+    client = TestClient(app)
+    first = client.get("/awareness/feed?page_size=4").json()
+    second = client.get(f"/awareness/feed?page_size=4&cursor={first['next_cursor']}").json()
+    assert [post["id"] for post in first["posts"] + second["posts"]] == posts
+    assert second["next_cursor"] is None
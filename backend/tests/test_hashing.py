@@ -0,0 +1,60 @@
+import asyncio
+import threading
+
+import pytest
+from fastapi import HTTPException
+
+from utils.hashing import PasswordHasher
+
+
+class BlockingContext:
+    """Stands in for CryptContext; hashes wait until released"""
+
+    def __init__(self):
+        self.release = threading.Event()
+
+    def hash(self, password):
+        self.release.wait(5)
+        return f"hashed:{password}"
+
+
+def test_cancelled_request_keeps_its_slot_until_the_hash_finishes(arun):
+    context = BlockingContext()
+    hasher = PasswordHasher(workers=1, queue_limit=1, context=context)
+
+    async def scenario():
+        task = asyncio.create_task(hasher.hash("secret"))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        assert hasher.pending == 1  # still running in the pool
+        with pytest.raises(HTTPException) as error:
+            await hasher.hash("another")
+        assert error.value.status_code == 429
+        context.release.set()
+        for _ in range(100):
+            if not hasher.pending:
+                break
+            await asyncio.sleep(0.01)
+        return await hasher.hash("after")
+
+    assert arun(scenario()) == "hashed:after"
+    assert hasher.pending == 0
+
+
+def test_queued_hash_cancelled_before_it_starts_frees_its_slot(arun):
+    context = BlockingContext()
+    hasher = PasswordHasher(workers=1, queue_limit=2, context=context)
+
+    async def scenario():
+        running = asyncio.create_task(hasher.hash("first"))
+        queued = asyncio.create_task(hasher.hash("second"))
+        await asyncio.sleep(0.05)
+        queued.cancel()
+        await asyncio.gather(queued, return_exceptions=True)
+        assert hasher.pending == 1
+        context.release.set()
+        return await running
+
+    assert arun(scenario()) == "hashed:first"
+    assert hasher.pending == 0
@@ -0,0 +1,84 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from models.location import LiveLocation
+from models.location_history import LocationHistory
+from services import location_services
+from services.geo_index import geo_index
+from services.location_services import LocationWriteBuffer
+
+
+@pytest.fixture
+def buffer(db_tables):
+    yield LocationWriteBuffer()
+    for user_id in (1, 2):
+        geo_index.remove(user_id)
+
+
+def live(engine):
+    with Session(engine) as db:
+        return {row.user_id: (row.latitude, row.longitude) for row in db.scalars(select(LiveLocation))}
+
+
+def history(engine):
+    with Session(engine) as db:
+        return [(row.user_id, row.latitude) for row in db.scalars(select(LocationHistory).order_by(LocationHistory.id))]
+
+
+def test_flush_writes_latest_ping_per_user_and_every_ping_to_history(buffer, db_tables):
+    buffer.add(1, 28.1, 77.0)
+    buffer.add(1, 28.2, 77.0)
+    buffer.add(2, 19.0, 72.8)
+    assert buffer.flush() == 2
+    assert live(db_tables) == {1: (28.2, 77.0), 2: (19.0, 72.8)}
+    assert history(db_tables) == [(1, 28.1), (1, 28.2), (2, 19.0)]
+    assert buffer.flush() == 0
+
+
+def test_later_flush_updates_rows_in_place(buffer, db_tables):
+    buffer.add(1, 28.1, 77.0)
+    buffer.flush()
+    buffer.add(1, 28.3, 77.1)
+    buffer.flush()
+    assert live(db_tables) == {1: (28.3, 77.1)}
+    assert len(history(db_tables)) == 2
+
+
+def test_pending_ping_is_readable_before_it_is_written(buffer, db_tables):
+    buffer.add(1, 28.1, 77.0, recorded_at=datetime(2026, 1, 1))
+    assert (buffer.get(1).latitude, buffer.get(1).longitude) == (28.1, 77.0)
+    assert buffer.get(2) is None
+    assert geo_index.nearest(28.1, 77.0, k=1)[0][1] == 1
+    assert live(db_tables) == {}
+
+
+def test_failed_flush_keeps_the_batch_and_newer_pings(buffer, db_tables, monkeypatch):
+    def fail(db, points):
+        buffer.add(1, 28.9, 77.0)  # arrives while the batch is being written
+        raise RuntimeError("database unavailable")
+
+    monkeypatch.setattr(location_services, "append_location_history", fail)
+    buffer.add(1, 28.1, 77.0)
+    buffer.add(2, 19.0, 72.8)
+    with pytest.raises(RuntimeError):
+        buffer.flush()
+    assert buffer.get(1).latitude == 28.9  # the newer ping wins over the failed one
+    assert buffer.get(2).latitude == 19.0
+
+    monkeypatch.undo()
+    buffer.flush()
+    assert live(db_tables) == {1: (28.9, 77.0), 2: (19.0, 72.8)}
+    assert [lat for _, lat in history(db_tables)] == [28.1, 19.0, 28.9]
+
+
+def test_stop_flushes_what_is_left(buffer, db_tables, arun):
+    async def scenario():
+        buffer.start()
+        buffer.add(1, 28.1, 77.0)
+        await buffer.stop()
+
+    arun(scenario())
+    assert live(db_tables) == {1: (28.1, 77.0)}
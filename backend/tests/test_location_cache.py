@@ -0,0 +1,33 @@
+from services.location_cache import LocationCache
+
+
+def test_set_get_and_versions():
+    cache = LocationCache(capacity=2)
+    v1 = cache.set(1, 28.6, 77.2, fix_time=100.0)
+    v2 = cache.set(2, 19.0, 72.8, fix_time=200.0)
+    assert cache.get(1) == (28.6, 77.2, 100.0)
+    assert v2 > v1
+    version, changed = cache.snapshot(since=v1)
+    assert version == v2 and list(changed) == [2]
+    assert changed[2]["latitude"] == 19.0
+
+
+def test_grows_and_reuses_freed_slots():
+    cache = LocationCache(capacity=2)
+    for user_id in range(5):
+        cache.set(user_id, float(user_id), 0.0)
+    assert len(cache) == 5 and all(cache.get(u)[0] == float(u) for u in range(5))
+    cache.remove(0)
+    cache.set(9, 9.0, 0.0)
+    assert cache.size == 5
+    assert cache.get(0) is None and cache.get(9)[0] == 9.0
+
+
+def test_stale_users_are_evicted():
+    cache = LocationCache(ttl=60)
+    cache.set(1, 1.0, 1.0)
+    cache.set(2, 2.0, 2.0)
+    cache.touched[cache.slots[1]] -= 120
+    assert cache.evict_stale() == 1
+    assert 1 not in cache and 2 in cache
+    assert set(cache.snapshot()[1]) == {2}
@@ -0,0 +1,85 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from schemas.location import LocationUpdate
+from services.geo_index import geo_index
+from services.location_cache import location_cache
+from services.location_services import ingest_location_fixes, location_buffer, receive_times
+
+USER_ID = 9001
+
+
+@pytest.fixture(autouse=True)
+def clean_state():
+    yield
+    location_cache.remove(USER_ID)
+    geo_index.remove(USER_ID)
+    location_buffer.pending.clear()
+    location_buffer.history.clear()
+
+
+def fix(latitude, timestamp=None):
+    return LocationUpdate(latitude=latitude, longitude=77.2, timestamp=timestamp)
+
+
+def stamp(delta: timedelta) -> str:
+    return (datetime.utcnow() + delta).isoformat()
+
+
+def test_receive_times_keep_client_spacing_anchored_at_now():
+    assert receive_times([100.0, 160.0, None], now=1000.0) == [940.0, 1000.0, 1000.0]
+    assert receive_times([None, None], now=5.0) == [5.0, 5.0]
+
+
+def test_skewed_client_clock_does_not_defeat_the_throttle():
+    # Client clock 25 minutes behind, then a fix without a timestamp 1 m away
+    assert ingest_location_fixes(USER_ID, [fix(28.6, stamp(-timedelta(minutes=25)))])
+    assert ingest_location_fixes(USER_ID, [fix(28.60001)]) == []
+
+
+def test_client_clock_ahead_does_not_defeat_the_throttle():
+    assert ingest_location_fixes(USER_ID, [fix(28.6, stamp(timedelta(hours=2)))])
+    assert ingest_location_fixes(USER_ID, [fix(28.60001, stamp(timedelta(hours=2, seconds=5)))]) == []
+
+
+def test_offline_batch_keeps_its_own_spacing():
+    start = timedelta(minutes=-10)
+    batch = [fix(28.6, stamp(start)), fix(28.60001, stamp(start + timedelta(minutes=1)))]
+    assert len(ingest_location_fixes(USER_ID, batch)) == 2
+
+
+def test_history_keeps_the_client_timestamp():
+    taken = datetime.utcnow() - timedelta(minutes=3)
+    ingest_location_fixes(USER_ID, [fix(28.6, taken.isoformat())])
+    [(_, _, _, recorded_at)] = location_buffer.history
+    assert recorded_at == taken + timedelta(hours=5, minutes=30)
+
+
+def walk(n, start=None):
+    # 1.4 m/s north with a fix every second: each step is far below MIN_MOVE_KM
+    start = start or datetime.utcnow() - timedelta(seconds=n)
+    return [fix(28.6 + i * 1.4 / 111_195, (start + timedelta(seconds=i)).isoformat()) for i in range(n)]
+
+
+@pytest.mark.parametrize("n", [20, 200])
+def test_slow_walk_in_one_batch_keeps_its_route(n):
+    accepted = ingest_location_fixes(USER_ID, walk(n))
+    # Every 8th step is 11.2 m from the last kept fix
+    assert len(accepted) == 1 + (n - 1) // 8
+    assert len(location_buffer.history) == len(accepted)
+    assert all(a["speed_mps"] == pytest.approx(1.4, abs=0.01) for a in accepted[1:])
+
+
+def test_scalar_and_vectorized_filters_agree(monkeypatch):
+    from utils import geo
+    track = walk(300)
+    lats = [f.latitude for f in track]
+    times = [float(i) for i in range(len(track))]
+    lats[100:140] = [lats[100]] * 40  # a stop longer than MIN_MOVE_INTERVAL
+    args = (lats, [77.2] * len(lats), times)
+    vectorized = geo.filter_moves(None, *args)
+    monkeypatch.setattr(geo, "VECTORIZE_MIN_BATCH", len(lats) + 1)
+    scalar = geo.filter_moves(None, *args)
+    assert vectorized[0] == scalar[0]
+    assert vectorized[2] == pytest.approx(scalar[2], nan_ok=True)
@@ -0,0 +1,107 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from models.user import UserRole
+from routes.auth import get_current_user
+from services.auth_services import Principal
+from services.geo_index import geo_index
+from services.location_cache import location_cache
+from services.location_services import location_buffer
+from services.sos_escalation import sos_scheduler
+from tests.factories import make_contact, make_sos, make_user
+
+
+@pytest.fixture
+def people(db_tables):
+    """Victim with one emergency contact, a stranger and an admin; the victim has an SOS"""
+    with Session(db_tables, expire_on_commit=False) as db:
+        victim = make_user(db, "victim@example.com")
+        contact = make_user(db, "friend@example.com")
+        stranger = make_user(db, "stranger@example.com")
+        admin = make_user(db, "admin@example.com", role=UserRole.admin)
+        make_contact(db, victim, "friend@example.com")
+        sos_id = make_sos(db, victim).id
+        db.commit()
+    people = {name: Principal.from_user(user) for name, user in
+              [("victim", victim), ("contact", contact), ("stranger", stranger), ("admin", admin)]}
+    geo_index.update(stranger.id, 28.6008, 77.2)  # ~90 m north of the SOS
+    yield people, sos_id
+    for principal in people.values():
+        geo_index.remove(principal.id)
+
+
+@pytest.fixture
+def client_as():
+    from app.main import app
+
+    def client(principal):
+        app.dependency_overrides[get_current_user] = lambda: principal
+        return TestClient(app)
+
+    yield client
+    app.dependency_overrides.clear()
+
+
+@pytest.mark.parametrize("who, expected", [("victim", 200), ("contact", 200), ("admin", 200), ("stranger", 403)])
+def test_users_near_sos_is_limited_to_people_involved(people, client_as, who, expected):
+    principals, sos_id = people
+    response = client_as(principals[who]).get(f"/api/location/nearby/sos/{sos_id}")
+    assert response.status_code == expected
+
+
+def test_nearby_distances_are_coarse(people, client_as):
+    principals, sos_id = people
+    [nearby] = client_as(principals["victim"]).get(f"/api/location/nearby/sos/{sos_id}").json()
+    assert nearby == {"user_id": principals["stranger"].id, "distance_m": 100}
+
+
+@pytest.mark.parametrize("who, expected", [("admin", 200), ("victim", 403), ("stranger", 403)])
+def test_nearby_by_coordinates_is_for_responders(people, client_as, who, expected):
+    principals, _ = people
+    response = client_as(principals[who]).get("/api/location/nearby?latitude=28.6&longitude=77.2")
+    assert response.status_code == expected
+
+
+@pytest.mark.parametrize("who, expected", [("victim", 200), ("contact", 200), ("stranger", 403), ("admin", 403)])
+def test_location_history_is_for_the_user_and_their_contacts(people, client_as, who, expected):
+    principals, _ = people
+    response = client_as(principals[who]).get(f"/api/location/{principals['victim'].id}/history")
+    assert response.status_code == expected
+
+
+def test_single_update_goes_through_the_movement_filter(people, client_as):
+    principals, _ = people
+    victim = principals["victim"]
+    client = client_as(victim)
+    try:
+        first = client.post("/api/location/update", json={"latitude": 28.6, "longitude": 77.2}).json()
+        assert first["location"]["latitude"] == 28.6
+        assert location_cache.get(victim.id)[:2] == (28.6, 77.2)
+        # 1 m away, a moment later: filtered out
+        second = client.post("/api/location/update", json={"latitude": 28.60001, "longitude": 77.2}).json()
+        assert second["location"] is None
+        assert location_cache.get(victim.id)[:2] == (28.6, 77.2)
+        assert location_buffer.get(victim.id).latitude == 28.6
+    finally:
+        location_cache.remove(victim.id)
+        location_buffer.pending.clear()
+        location_buffer.history.clear()
+
+
+def test_single_update_keeps_an_active_sos_fresh(people, client_as, monkeypatch):
+    principals, _ = people
+    victim = principals["victim"]
+    touched = []
+    monkeypatch.setattr(sos_scheduler, "is_tracking", lambda user_id: user_id == victim.id)
+    monkeypatch.setattr(sos_scheduler, "touch", touched.append)
+    try:
+        client = client_as(victim)
+        for latitude in (28.6, 28.60001):
+            response = client.post("/api/location/update", json={"latitude": latitude, "longitude": 77.2}).json()
+            assert response["location"]["latitude"] == latitude  # nothing filtered during an SOS
+        assert touched == [victim.id, victim.id]
+    finally:
+        location_cache.remove(victim.id)
+        location_buffer.pending.clear()
+        location_buffer.history.clear()
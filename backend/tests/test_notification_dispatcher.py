@@ -0,0 +1,202 @@
+import asyncio
+
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from models.sos import SOSDelivery, SOSEvent
+from services import notification_services
+from services.notification_services import (
+    Channel, FakeChannel, NotificationDispatcher, WebSocketChannel, backoff_delay, MAX_ATTEMPTS, RETRY_MAX_DELAY
+)
+from tests.factories import FakeWebSocket, make_contact, make_sos, make_user
+from websocket.broker import InMemoryBroker
+from websocket.manager import ConnectionManager
+
+
+def setup_sos(engine, contacts=2):
+    with Session(engine, expire_on_commit=False) as db:
+        user = make_user(db)
+        rows = [make_contact(db, user, f"c{i}@example.com", f"900000000{i}") for i in range(contacts)]
+        sos_id = make_sos(db, user).id
+        db.commit()
+    return sos_id, rows
+
+
+def deliveries(engine, sos_id):
+    with Session(engine) as db:
+        return db.scalars(select(SOSDelivery).where(SOSDelivery.sos_id == sos_id).order_by(SOSDelivery.id)).all()
+
+
+def delivery_status(engine, sos_id):
+    with Session(engine) as db:
+        return db.get(SOSEvent, sos_id).delivery_status
+
+
+def test_backoff_delay_is_jittered_and_capped():
+    for attempt in range(1, 12):
+        delay = backoff_delay(attempt)
+        assert 0 <= delay <= min(RETRY_MAX_DELAY, 2 ** (attempt - 1))
+
+
+def test_sends_one_delivery_per_contact_and_channel(db_tables, arun):
+    sos_id, contacts = setup_sos(db_tables)
+    email, sms = FakeChannel("email"), FakeChannel("sms", address_field="phone_number")
+
+    async def scenario():
+        dispatcher = NotificationDispatcher([email, sms])
+        await dispatcher.start()
+        await dispatcher.enqueue_sos(sos_id, contacts, "help")
+        await dispatcher.join()
+        await dispatcher.stop()
+
+    arun(scenario())
+    assert sorted(email.sent) == [("c0@example.com", "help"), ("c1@example.com", "help")]
+    assert sorted(sms.sent) == [("9000000000", "help"), ("9000000001", "help")]
+    assert {row.status for row in deliveries(db_tables, sos_id)} == {"sent"}
+    assert delivery_status(db_tables, sos_id) == "delivered"
+
+
+def test_failed_sends_are_retried_with_backoff(db_tables, arun, monkeypatch):
+    delays = []
+    monkeypatch.setattr(notification_services, "backoff_delay", lambda attempt: delays.append(attempt) or 0)
+    sos_id, contacts = setup_sos(db_tables, contacts=1)
+    channel = FakeChannel("email", failures=2)
+
+    async def scenario():
+        dispatcher = NotificationDispatcher([channel])
+        await dispatcher.start()
+        await dispatcher.enqueue_sos(sos_id, contacts, "help")
+        await dispatcher.join()
+        await dispatcher.stop()
+
+    arun(scenario())
+    assert channel.sent == [("c0@example.com", "help")]
+    assert delays == [1, 2]
+    [row] = deliveries(db_tables, sos_id)
+    assert (row.status, row.attempts) == ("sent", 3)
+
+
+def test_gives_up_after_max_attempts(db_tables, arun, monkeypatch):
+    monkeypatch.setattr(notification_services, "backoff_delay", lambda attempt: 0)
+    sos_id, contacts = setup_sos(db_tables)
+    down, up = FakeChannel("sms", failures=1000, address_field="phone_number"), FakeChannel("email")
+
+    async def scenario():
+        dispatcher = NotificationDispatcher([down, up])
+        await dispatcher.start()
+        await dispatcher.enqueue_sos(sos_id, contacts, "help")
+        await dispatcher.join()
+        await dispatcher.stop()
+
+    arun(scenario())
+    assert down.sent == [] and len(up.sent) == 2
+    failed = [row for row in deliveries(db_tables, sos_id) if row.channel == "sms"]
+    assert [(row.status, row.attempts) for row in failed] == [("failed", MAX_ATTEMPTS)] * 2
+    assert all(row.last_error for row in failed)
+    assert delivery_status(db_tables, sos_id) == "partial"
+
+
+def test_deliveries_enqueued_while_stopped_are_sent_once_on_resume(db_tables, arun):
+    sos_id, contacts = setup_sos(db_tables)
+    channels = [FakeChannel("email"), FakeChannel("email")]
+
+    async def scenario():
+        # Recorded before any worker runs, as if the process died right after the SOS request
+        await NotificationDispatcher([FakeChannel("email")]).enqueue_sos(sos_id, contacts, "help")
+        workers = [NotificationDispatcher([channel]) for channel in channels]
+        for worker in workers:
+            await worker.start()
+        for worker in workers:
+            await worker.join()
+            await worker.stop()
+
+    arun(scenario())
+    assert sorted(channels[0].sent + channels[1].sent) == [("c0@example.com", "help"), ("c1@example.com", "help")]
+    assert {row.status for row in deliveries(db_tables, sos_id)} == {"sent"}
+
+
+def test_stop_requeues_sends_cut_off_mid_flight(db_tables, arun):
+    sos_id, contacts = setup_sos(db_tables, contacts=1)
+
+    async def scenario():
+        dispatcher = NotificationDispatcher([FakeChannel("email", latency=60)])
+        await dispatcher.start()
+        await dispatcher.enqueue_sos(sos_id, contacts, "help")
+        while not dispatcher.sending:
+            await asyncio.sleep(0.01)
+        await dispatcher.stop()
+
+    arun(scenario())
+    [row] = deliveries(db_tables, sos_id)
+    assert row.status == "queued"
+
+
+def dispatch(channel, sos_id, contacts):
+    async def scenario():
+        dispatcher = NotificationDispatcher([channel])
+        await dispatcher.start()
+        await dispatcher.enqueue_sos(sos_id, contacts, "help")
+        await dispatcher.join()
+        await dispatcher.stop()
+    return scenario()
+
+
+def test_websocket_alert_without_an_open_dashboard_is_not_sent(db_tables, arun, monkeypatch):
+    monkeypatch.setattr(notification_services, "backoff_delay", lambda attempt: 0)
+    sos_id, contacts = setup_sos(db_tables, contacts=1)
+
+    arun(dispatch(WebSocketChannel(ConnectionManager(InMemoryBroker())), sos_id, contacts))
+    [row] = deliveries(db_tables, sos_id)
+    assert (row.status, row.attempts) == ("failed", MAX_ATTEMPTS)
+    assert delivery_status(db_tables, sos_id) == "failed"
+
+
+def test_websocket_alert_reaches_the_dashboard_and_is_recorded(db_tables, arun):
+    sos_id, [contact] = setup_sos(db_tables, contacts=1)
+    connections = ConnectionManager(InMemoryBroker())
+    dashboard = FakeWebSocket()
+    group = f"contact:{contact.id}"
+
+    async def scenario():
+        connections.join(dashboard, group)
+        await dispatch(WebSocketChannel(connections), sos_id, [contact])
+        await asyncio.sleep(0.01)
+        connections.disconnect_all(dashboard)
+        return await connections.broker.get_events([group])
+
+    _, _, recorded = arun(scenario())
+    assert [json.loads(frame)["message"] for frame in dashboard.sent] == ["help"]
+    assert recorded == dashboard.sent  # replayable to a dashboard that reconnects
+    assert delivery_status(db_tables, sos_id) == "delivered"
+
+
+def test_contact_socket_replays_alerts_sent_to_the_contact(db_tables, arun):
+    from app.main import app
+    from routes.auth import create_access_token
+    from websocket.manager import manager
+
+    with Session(db_tables, expire_on_commit=False) as db:
+        victim = make_user(db, "victim@example.com")
+        friend = make_user(db, "friend@example.com")
+        contact = make_contact(db, victim, "friend@example.com")
+        db.commit()
+    seq = arun(manager.publish_event({"type": "sos_alert", "message": "help"}, [f"contact:{contact.id}"]))
+    token = create_access_token(friend.email, friend.id)
+
+    with TestClient(app).websocket_connect(f"/ws/contacts/{victim.id}?token={token}&sos_since={seq - 1}") as ws:
+        frames = []
+        while not frames or frames[-1].get("type") != "event_replay":
+            frames.append(ws.receive_json())
+    assert [frame.get("seq") for frame in frames if frame.get("type") == "sos_alert"] == [seq]
+
+
+def test_channel_without_send_fails_when_created():
+    class Silent(Channel):
+        name = "silent"
+
+    with pytest.raises(TypeError):
+        Silent()
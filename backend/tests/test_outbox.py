@@ -0,0 +1,118 @@
+import asyncio
+
+from tests.factories import FakeWebSocket
+from websocket.manager import _Outbox, MAX_DROPPED_FRAMES
+
+
+def drain(outbox):
+    frames = []
+    while outbox.size():
+        frames.append(outbox.pop())
+    return frames
+
+
+def test_put_frames_are_never_evicted(arun):
+    async def scenario():
+        outbox = _Outbox(websocket=None, maxsize=4)
+        for i in range(4):
+            await outbox.put(f"chunk{i}")
+        assert outbox.push("live1", key="loc:1")
+        assert outbox.dropped == 1
+        return drain(outbox)
+
+    assert arun(scenario()) == ["chunk0", "chunk1", "chunk2", "chunk3"]
+
+
+def test_full_queue_evicts_oldest_normal_frame_first(arun):
+    async def scenario():
+        outbox = _Outbox(websocket=None, maxsize=3)
+        outbox.push("a")
+        await outbox.put("chunk")
+        outbox.push("b")
+        outbox.push("c")
+        return drain(outbox)
+
+    assert arun(scenario()) == ["chunk", "b", "c"]
+
+
+def test_normal_push_never_evicts_priority_frame():
+    outbox = _Outbox(websocket=None, maxsize=2)
+    outbox.push("sos1", priority=True)
+    outbox.push("sos2", priority=True)
+    outbox.push("loc")
+    assert drain(outbox) == ["sos1", "sos2"]
+    assert outbox.dropped == 1
+
+
+def test_priority_push_evicts_normal_before_priority():
+    outbox = _Outbox(websocket=None, maxsize=2)
+    outbox.push("sos1", priority=True)
+    outbox.push("loc")
+    outbox.push("sos2", priority=True)
+    assert drain(outbox) == ["sos1", "sos2"]
+
+
+def test_priority_push_over_keep_frames_is_queued(arun):
+    async def scenario():
+        outbox = _Outbox(websocket=None, maxsize=2)
+        await outbox.put("chunk0")
+        await outbox.put("chunk1")
+        outbox.push("sos", priority=True)
+        return drain(outbox)
+
+    assert arun(scenario()) == ["sos", "chunk0", "chunk1"]
+
+
+def test_coalesce_keeps_one_entry_per_key():
+    outbox = _Outbox(websocket=None)
+    outbox.push("loc1", key="loc:1")
+    outbox.push("other")
+    outbox.push("loc2", key="loc:1")
+    assert drain(outbox) == ["loc2", "other"]
+
+
+def test_coalesce_with_priority_moves_entry_to_urgent_lane():
+    outbox = _Outbox(websocket=None)
+    outbox.push("other")
+    outbox.push("loc1", key="loc:1")
+    outbox.push("loc2", key="loc:1", priority=True)
+    assert drain(outbox) == ["loc2", "other"]
+    assert not outbox.pending
+
+
+def test_push_reports_a_socket_that_fell_too_far_behind():
+    outbox = _Outbox(websocket=None, maxsize=1)
+    results = [outbox.push(f"f{i}") for i in range(MAX_DROPPED_FRAMES + 2)]
+    assert all(results[:-1])
+    assert results[-1] is False
+
+
+def test_put_waits_for_room(arun):
+    async def scenario():
+        outbox = _Outbox(websocket=None, maxsize=1)
+        await outbox.put("first")
+        waiter = asyncio.create_task(outbox.put("second"))
+        await asyncio.sleep(0)
+        assert not waiter.done()
+        assert outbox.pop() == "first"
+        await asyncio.wait_for(waiter, 1)
+        return drain(outbox)
+
+    assert arun(scenario()) == ["second"]
+
+
+def test_replies_go_through_the_outbox_in_order(arun):
+    from websocket.manager import ConnectionManager
+
+    async def scenario():
+        manager = ConnectionManager()
+        websocket = FakeWebSocket()
+        manager.join(websocket, "sos_responders")
+        await manager.outboxes[websocket].put("snapshot")
+        await manager.send(websocket, {"status": "connected"}, key="status")
+        await manager.send(websocket, {"status": "connected"}, key="status")
+        await asyncio.sleep(0.01)
+        manager.disconnect_all(websocket)
+        return websocket.sent
+
+    assert arun(scenario()) == ["snapshot", '{"status":"connected"}']
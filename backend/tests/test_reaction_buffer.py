@@ -0,0 +1,137 @@
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.database import AsyncSessionLocal
+from models.awareness import Awareness, AwarenessCategory, AwarenessSource
+from models.reaction import Reaction, ReactionCount
+from services import reaction
+from services.reaction import ReactionWriteBuffer, _MISSING
+
+POST = 1
+
+
+@pytest.fixture
+def buffer(db_tables):
+    return ReactionWriteBuffer()
+
+
+def counters(engine):
+    with Session(engine) as db:
+        rows = db.execute(
+            select(ReactionCount.emoji, ReactionCount.count)
+            .where(ReactionCount.awareness_id == POST, ReactionCount.count != 0)
+        )
+        return {emoji: count for emoji, count in rows}
+
+
+def recount(engine):
+    with Session(engine) as db:
+        rows = db.execute(
+            select(Reaction.emoji, func.count()).where(Reaction.awareness_id == POST).group_by(Reaction.emoji)
+        )
+        return {emoji: count for emoji, count in rows}
+
+
+def test_flush_writes_latest_reaction_per_user(buffer, db_tables):
+    buffer.add(1, POST, "like")
+    buffer.add(1, POST, "love")  # coalesced with the one above
+    buffer.add(2, POST, "like")
+    buffer.add(3, POST, "like")
+    assert buffer.flush() == {POST}
+    assert counters(db_tables) == recount(db_tables) == {"love": 1, "like": 2}
+    assert buffer.get(1, POST) is _MISSING
+
+
+def test_changes_and_removals_move_the_counters(buffer, db_tables):
+    for user_id in (1, 2, 3):
+        buffer.add(user_id, POST, "like")
+    buffer.flush()
+    buffer.add(1, POST, "love")
+    buffer.remove(2, POST)
+    buffer.add(3, POST, "like")  # unchanged
+    buffer.flush()
+    assert counters(db_tables) == recount(db_tables) == {"love": 1, "like": 1}
+
+
+def test_pending_reactions_are_readable_until_written(buffer):
+    buffer.add(1, POST, "like")
+    buffer.remove(2, POST)
+    assert buffer.get(1, POST) == "like"
+    assert buffer.get(2, POST) is None
+    assert buffer.get(3, POST) is _MISSING
+    assert buffer.snapshot([POST])[1] == {(1, POST): "like", (2, POST): None}
+
+
+def test_reaction_written_by_another_worker_meanwhile_keeps_counters_exact(buffer, db_tables, monkeypatch):
+    other = ReactionWriteBuffer()
+    other.add(1, POST, "love")
+    other.flush()
+
+    # This worker read the stored reactions before the other one wrote
+    real = reaction._stored_reactions_for_update
+    reads = []
+
+    def stale_first_read(db, keys):
+        reads.append(keys)
+        return {} if len(reads) == 1 else real(db, keys)
+
+    monkeypatch.setattr(reaction, "_stored_reactions_for_update", stale_first_read)
+    buffer.add(1, POST, "like")
+    buffer.flush()
+    assert counters(db_tables) == recount(db_tables) == {"like": 1}
+
+
+def test_failed_flush_puts_the_batch_back(buffer, monkeypatch):
+    def fail(db, deltas):
+        raise RuntimeError("database unavailable")
+
+    monkeypatch.setattr(reaction, "_apply_count_deltas", fail)
+    buffer.add(1, POST, "like")
+    with pytest.raises(RuntimeError):
+        buffer.flush()
+    assert buffer.get(1, POST) == "like"
+    assert buffer.generation % 2 == 0
+
+
+@pytest.fixture
+def post(db_tables):
+    with Session(db_tables) as db:
+        row = Awareness(title="Post", content="text", category=AwarenessCategory.law, source=AwarenessSource.ngo)
+        db.add(row)
+        db.commit()
+        post_id = row.id
+    yield post_id
+    reaction.reaction_buffer.posts.clear()
+    reaction.reaction_buffer.pending.clear()
+
+
+def react(arun, post_id):
+    async def scenario():
+        async with AsyncSessionLocal() as db:
+            return await reaction.add_or_update_reaction(db, 1, post_id, "🤝")
+    return arun(scenario())
+
+
+def test_unverified_post_stops_taking_reactions(post, db_tables, arun):
+    react(arun, post)
+    assert reaction.reaction_buffer.post_validated(post)
+    with Session(db_tables) as db:
+        db.get(Awareness, post).is_verified = False
+        db.commit()
+    assert not reaction.reaction_buffer.post_validated(post)
+    with pytest.raises(HTTPException) as error:
+        react(arun, post)
+    assert error.value.status_code == 404
+
+
+def test_validated_posts_expire_and_are_bounded(monkeypatch):
+    buffer = ReactionWriteBuffer()
+    monkeypatch.setattr(reaction, "VALIDATED_POST_SIZE", 2)
+    for post_id in (1, 2, 3):
+        buffer.remember_post(post_id)
+    assert list(buffer.posts) == [2, 3]
+    buffer.posts[3] = 0.0  # expired
+    assert buffer.post_validated(2) and not buffer.post_validated(3)
+    assert list(buffer.posts) == [2]
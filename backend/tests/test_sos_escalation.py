@@ -0,0 +1,67 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy.orm import Session
+
+from models.sos import SOSEvent
+from services import sos_escalation
+from services.sos_escalation import SOSEscalationScheduler, ESCALATE
+from tests.factories import make_contact, make_sos, make_user
+
+
+class RecordingDispatcher:
+    def __init__(self):
+        self.sent = []
+
+    async def enqueue_sos(self, sos_id, contacts, message):
+        self.sent.append(sos_id)
+
+
+def test_each_escalation_is_sent_by_one_worker(db_tables, arun, monkeypatch):
+    dispatcher = RecordingDispatcher()
+    monkeypatch.setattr(sos_escalation, "notification_dispatcher", dispatcher)
+    with Session(db_tables) as db:
+        user = make_user(db)
+        make_contact(db, user)
+        sos_id = make_sos(db, user).id
+        db.commit()
+
+    async def scenario():
+        workers = [SOSEscalationScheduler(), SOSEscalationScheduler()]
+        for worker in workers:
+            await worker.start()
+            await worker.stop()
+        for worker in workers:
+            await worker._fire(sos_id, ESCALATE)
+        return workers
+
+    workers = arun(scenario())
+    assert dispatcher.sent == [sos_id]
+    with Session(db_tables) as db:
+        sos_event = db.get(SOSEvent, sos_id)
+        assert sos_event.escalation_level == 1
+        assert sos_event.status == "escalated"
+        assert sos_event.escalate_at > datetime.utcnow()
+    # The losing worker stays armed for the next level
+    assert any(action == ESCALATE for _, _, _, action in workers[1].heap)
+
+
+def test_escalation_is_not_claimed_before_it_is_due(db_tables, arun, monkeypatch):
+    dispatcher = RecordingDispatcher()
+    monkeypatch.setattr(sos_escalation, "notification_dispatcher", dispatcher)
+    with Session(db_tables) as db:
+        user = make_user(db)
+        make_contact(db, user)
+        sos_id = make_sos(db, user, status="escalated", escalation_level=1,
+                          escalate_at=datetime.utcnow() + timedelta(minutes=1)).id
+        db.commit()
+
+    async def scenario():
+        worker = SOSEscalationScheduler()
+        await worker.start()
+        await worker.stop()
+        await worker._fire(sos_id, ESCALATE)
+
+    arun(scenario())
+    assert dispatcher.sent == []
+    with Session(db_tables) as db:
+        assert db.get(SOSEvent, sos_id).escalation_level == 1
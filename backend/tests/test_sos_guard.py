@@ -0,0 +1,151 @@
+import asyncio
+
+import fakeredis.aioredis
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.database import AsyncSessionLocal
+from models.location import LiveLocation
+from models.sos import SOSEvent
+from services import sos_guard as guard_module
+from services.auth_services import Principal
+from services.sos_guard import InMemorySOSGuard, RedisSOSGuard, SOSGuard, PENDING, trigger_sos_once
+from tests.factories import make_contact, make_user
+
+
+@pytest.fixture(params=["memory", "redis"])
+def guard(request, monkeypatch):
+    if request.param == "memory":
+        guard = InMemorySOSGuard()
+    else:
+        guard = RedisSOSGuard(client=fakeredis.aioredis.FakeRedis(decode_responses=True), prefix="test")
+    monkeypatch.setattr(guard_module, "sos_guard", guard)
+    return guard
+
+
+@pytest.fixture
+def user(db_tables):
+    with Session(db_tables, expire_on_commit=False) as db:
+        user = make_user(db)
+        make_contact(db, user)
+        db.add(LiveLocation(user_id=user.id, latitude=28.6, longitude=77.2))
+        db.commit()
+    return Principal.from_user(user)
+
+
+def sos_count(engine):
+    with Session(engine) as db:
+        return db.scalar(select(func.count()).select_from(SOSEvent))
+
+
+def test_claim_is_exclusive_and_release_compares(guard, arun):
+    async def scenario():
+        results = await asyncio.gather(*(guard.claim(1) for _ in range(10)))
+        assert sum(claimed for claimed, _ in results) == 1
+        assert {value for claimed, value in results if not claimed} == {PENDING}
+        await guard.bind(1, 42)
+        assert await guard.get(1) == "42"
+        await guard.release(1, "41")
+        assert await guard.get(1) == "42"
+        await guard.release(1, "42")
+        assert await guard.get(1) is None
+        assert (await guard.claim(1))[0]
+
+    arun(scenario())
+
+
+def test_idempotency_keys_are_per_user(guard, arun):
+    async def scenario():
+        await guard.remember_key(1, "abc", 7)
+        return await guard.lookup_key(1, "abc"), await guard.lookup_key(2, "abc"), await guard.lookup_key(1, "other")
+
+    assert arun(scenario()) == (7, None, None)
+
+
+def test_concurrent_triggers_create_one_event(guard, user, db_tables, arun):
+    async def trigger():
+        async with AsyncSessionLocal() as db:
+            trigger = await trigger_sos_once(db, user)
+            return trigger.sos_event.id, trigger.created
+
+    async def scenario():
+        return await asyncio.gather(*(trigger() for _ in range(5)))
+
+    results = arun(scenario())
+    assert sum(created for _, created in results) == 1
+    assert len({sos_id for sos_id, _ in results}) == 1
+    assert sos_count(db_tables) == 1
+
+
+def test_idempotency_key_returns_the_same_event(guard, user, db_tables, arun):
+    async def scenario():
+        async with AsyncSessionLocal() as db:
+            first = await trigger_sos_once(db, user, "key-1")
+            await guard.release(user.id, str(first.sos_event.id))  # even outside the dedup window
+            again = await trigger_sos_once(db, user, "key-1")
+        return first, again
+
+    first, again = arun(scenario())
+    assert first.created and not again.created
+    assert again.sos_event.id == first.sos_event.id
+    assert [c.email for c in first.contacts] == ["contact@example.com"] and again.contacts == []
+    assert first.contact_count == again.contact_count == 1
+    assert sos_count(db_tables) == 1
+
+
+def test_trigger_claims_again_when_the_creator_fails(guard, user, db_tables, arun):
+    async def scenario():
+        await guard.claim(user.id)  # another request is creating the event...
+
+        async def creator_fails():
+            await asyncio.sleep(0.1)
+            await guard.release(user.id, PENDING)  # ...and gives up
+
+        failing = asyncio.create_task(creator_fails())
+        async with AsyncSessionLocal() as db:
+            trigger = await trigger_sos_once(db, user)
+        await failing
+        return trigger.sos_event.id, trigger.created, await guard.get(user.id)
+
+    sos_id, created, claim = arun(scenario())
+    assert created
+    assert claim == str(sos_id)
+    assert sos_count(db_tables) == 1
+
+
+def test_stuck_creator_does_not_block_the_alert(guard, user, db_tables, arun, monkeypatch):
+    monkeypatch.setattr(guard_module, "CLAIM_WAIT", 0.1)
+
+    async def scenario():
+        await guard.claim(user.id)  # pending and never resolved
+        async with AsyncSessionLocal() as db:
+            return (await trigger_sos_once(db, user)).created
+
+    assert arun(scenario())
+    assert sos_count(db_tables) == 1
+
+
+def test_memory_guard_drops_expired_keys_on_write(arun, monkeypatch):
+    guard = InMemorySOSGuard()
+    now = [1000.0]
+    monkeypatch.setattr(guard_module.time, "time", lambda: now[0])
+
+    async def scenario():
+        for i in range(100):
+            await guard.remember_key(1, f"key-{i}", i)
+        await guard.bind(1, 7)
+        now[0] += guard_module.IDEMPOTENCY_TTL
+        await guard.remember_key(1, "fresh", 8)
+        return await guard.lookup_key(1, "fresh")
+
+    assert arun(scenario()) == 8
+    assert set(guard.entries) == {"idem:1:fresh"}
+
+
+def test_incomplete_guard_fails_when_created():
+    class Incomplete(SOSGuard):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete()
@@ -0,0 +1,36 @@
+from sqlalchemy import create_engine, text
+
+from services.sos_services import ensure_sos_event_columns
+
+OLD_SOS_EVENTS = (
+    "CREATE TABLE sos_events (id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL, latitude FLOAT NOT NULL, "
+    "longitude FLOAT NOT NULL, status VARCHAR, triggered_at DATETIME, timestamp DATETIME)"
+)
+
+
+def events(engine):
+    with engine.connect() as conn:
+        return conn.execute(text(
+            "SELECT status, delivery_status, escalation_level, acknowledged_by, escalate_at FROM sos_events ORDER BY id"
+        )).all()
+
+
+def test_new_columns_are_filled_in_for_existing_events(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as conn:
+        conn.execute(text(OLD_SOS_EVENTS))
+        conn.execute(text("INSERT INTO sos_events (user_id, latitude, longitude, status) VALUES (1, 0, 0, 'resolved')"))
+    ensure_sos_event_columns(engine)
+    assert events(engine) == [("resolved", "pending", 0, None, None)]
+
+
+def test_nulls_left_by_an_earlier_migration_are_backfilled(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as conn:
+        conn.execute(text(OLD_SOS_EVENTS))
+        for column in ("delivery_status VARCHAR", "escalation_level INTEGER", "acknowledged_by INTEGER"):
+            conn.execute(text(f"ALTER TABLE sos_events ADD COLUMN {column}"))
+        conn.execute(text("INSERT INTO sos_events (user_id, latitude, longitude, status) VALUES (1, 0, 0, 'triggered')"))
+    ensure_sos_event_columns(engine)
+    ensure_sos_event_columns(engine)  # idempotent
+    assert events(engine) == [("triggered", "pending", 0, None, None)]
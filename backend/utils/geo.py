@@ -0,0 +1,154 @@
+import math
+import numpy as np
+
+EARTH_RADIUS_KM = 6371
+
+
+def haversine_distance(lat1, lon1, lat2, lon2):
+    R = EARTH_RADIUS_KM  # Earth radius in km
+    dlat = math.radians(lat2 - lat1)
+    dlon = math.radians(lon2 - lon1)
+    a = math.sin(dlat/2)**2 + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlon/2)**2
+    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
+    return R * c
+
+
+# Movement filter: a fix is dropped if it is closer than this and sooner than that
+MIN_MOVE_KM = 0.01      # 10 metres
+MIN_MOVE_INTERVAL = 30  # seconds
+
+
+def haversine_many(lat1, lon1, lat2, lon2):
+    """haversine_distance over arrays of points, in km"""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=np.float64)) for v in (lat1, lon1, lat2, lon2))
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    return EARTH_RADIUS_KM * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+def bearing_many(lat1, lon1, lat2, lon2):
+    """Initial bearing from the first point to the second, in degrees clockwise from north"""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=np.float64)) for v in (lat1, lon1, lat2, lon2))
+    dlon = lon2 - lon1
+    x = np.sin(dlon) * np.cos(lat2)
+    y = np.cos(lat1) * np.sin(lat2) - np.sin(lat1) * np.cos(lat2) * np.cos(dlon)
+    return np.degrees(np.arctan2(x, y)) % 360
+
+
+def movement_many(prev_lat, prev_lon, prev_time, lat, lon, time):
+    """Distance (km), bearing (deg) and speed (m/s) from each previous fix to the current one.
+
+    Times are epoch seconds. A NaN previous fix yields NaN metrics.
+    """
+    distance = haversine_many(prev_lat, prev_lon, lat, lon)
+    bearing = bearing_many(prev_lat, prev_lon, lat, lon)
+    elapsed = np.asarray(time, dtype=np.float64) - np.asarray(prev_time, dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        speed = np.where(elapsed > 0, distance * 1000 / elapsed, np.nan)
+    return distance, bearing, speed, elapsed
+
+
+def significant_moves(prev_lat, prev_lon, prev_time, lat, lon, time,
+                      min_km: float = MIN_MOVE_KM, min_interval: float = MIN_MOVE_INTERVAL):
+    """Mask of fixes worth keeping, plus their movement metrics.
+
+    A fix is kept if there is no previous fix, or it moved at least min_km, or
+    at least min_interval seconds passed since the previous fix.
+    """
+    distance, bearing, speed, elapsed = movement_many(prev_lat, prev_lon, prev_time, lat, lon, time)
+    keep = np.isnan(np.asarray(prev_lat, dtype=np.float64)) | (distance >= min_km) | (elapsed >= min_interval)
+    return keep, distance, bearing, speed
+
+
+# Below this many fixes the NumPy call overhead outweighs the vectorized math (see bench_geo.py)
+VECTORIZE_MIN_BATCH = 64
+SCAN_WINDOW = 16  # dropped fixes in a row before the rest are checked vectorized, in windows doubling from this size
+
+
+def movement(prev_lat, prev_lon, prev_time, lat, lon, time):
+    """Scalar movement_many for a single fix"""
+    distance = haversine_distance(prev_lat, prev_lon, lat, lon)
+    dlon = math.radians(lon - prev_lon)
+    lat1, lat2 = math.radians(prev_lat), math.radians(lat)
+    x = math.sin(dlon) * math.cos(lat2)
+    y = math.cos(lat1) * math.sin(lat2) - math.sin(lat1) * math.cos(lat2) * math.cos(dlon)
+    bearing = math.degrees(math.atan2(x, y)) % 360
+    elapsed = time - prev_time
+    speed = distance * 1000 / elapsed if elapsed > 0 else math.nan
+    return distance, bearing, speed, elapsed
+
+
+def _next_move(last, lat, lon, time, start):
+    """Index of the first fix from start on that moved away from last (len(lat) if none).
+
+    Looks ahead in windows that double while nothing moves, so a long stretch
+    of dropped fixes costs a few vectorized calls.
+    """
+    window = SCAN_WINDOW
+    while start < len(lat):
+        end = min(start + window, len(lat))
+        distance = haversine_many(last[0], last[1], lat[start:end], lon[start:end])
+        moved = np.flatnonzero((distance >= MIN_MOVE_KM) | (time[start:end] - last[2] >= MIN_MOVE_INTERVAL))
+        if moved.size:
+            return start + int(moved[0])
+        start, window = end, window * 2
+    return len(lat)
+
+
+def filter_moves(previous, lat, lon, time):
+    """significant_moves for one user's fixes in order, each compared with the last kept fix.
+
+    previous is the last accepted (lat, lon, time) before the batch, or None.
+    A dropped fix does not become the reference, so a slow walk uploaded in
+    one batch still keeps a fix every MIN_MOVE_KM. Picks the scalar or NumPy
+    path by batch size. Returns (keep, bearing, speed) lists, metrics measured
+    from the last kept fix, with NaN where a metric is undefined.
+    """
+    if previous is not None and previous[0] is None:
+        previous = None
+    if len(lat) < VECTORIZE_MIN_BATCH:
+        keep, bearings, speeds = [], [], []
+        last = previous
+        for fix in zip(lat, lon, time):
+            if last is None:
+                keep.append(True)
+                bearings.append(math.nan)
+                speeds.append(math.nan)
+                last = fix
+                continue
+            distance, bearing, speed, elapsed = movement(*last, *fix)
+            kept = distance >= MIN_MOVE_KM or elapsed >= MIN_MOVE_INTERVAL
+            keep.append(kept)
+            bearings.append(bearing)
+            speeds.append(speed)
+            if kept:
+                last = fix
+        return keep, bearings, speeds
+
+    lat, lon, time = (np.asarray(v, dtype=np.float64) for v in (lat, lon, time))
+    points = list(zip(lat.tolist(), lon.tolist(), time.tolist()))
+    keep = [False] * len(points)
+    ref = []  # index of the last kept fix before each fix, -1 for previous
+    last, last_index = previous, -1
+    i = 0
+    # The accept scan is sequential; only the distance math of long dropped stretches is vectorized
+    while i < len(points):
+        point = points[i]
+        ref.append(last_index)
+        if last is not None and point[2] - last[2] < MIN_MOVE_INTERVAL \
+                and haversine_distance(last[0], last[1], point[0], point[1]) < MIN_MOVE_KM:
+            i += 1
+            if i - last_index > SCAN_WINDOW:
+                j = _next_move(last, lat, lon, time, i)
+                ref += [last_index] * (j - i)
+                i = j
+            continue
+        keep[i] = True
+        last, last_index = point, i
+        i += 1
+    first = previous or (np.nan, np.nan, np.nan)
+    ref = np.asarray(ref) + 1
+    prev_lat, prev_lon, prev_time = (np.concatenate(([p], v))[ref] for p, v in zip(first, (lat, lon, time)))
+    _, bearing, speed, _ = movement_many(prev_lat, prev_lon, prev_time, lat, lon, time)
+    return keep, bearing.tolist(), speed.tolist()
@@ -0,0 +1,67 @@
+from fastapi import HTTPException, status
+from concurrent.futures import ThreadPoolExecutor
+from passlib.context import CryptContext
+from typing import Optional
+import asyncio
+import threading
+from app.config import settings
+
+# bcrypt cost factor; each +1 doubles the time per hash (12 is ~250 ms)
+BCRYPT_ROUNDS = settings.bcrypt_rounds
+# Threads hashing at once; bcrypt releases the GIL, so this is how many cores logins may use
+HASH_WORKERS = settings.hash_workers
+# Hashes running or waiting before new requests are rejected with 429
+HASH_QUEUE_LIMIT = settings.hash_queue_limit
+RETRY_AFTER = 1  # seconds suggested to rejected clients
+
+bcrypt_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+
+class PasswordHasher:
+    """Runs bcrypt on a small dedicated thread pool, off the event loop.
+
+    At most workers hashes run at once and at most queue_limit may be running
+    or waiting; beyond that callers get a 429 straight away instead of piling
+    up behind a login storm. A hash counts until its thread finishes, even
+    if the request that started it has gone away.
+    """
+
+    def __init__(self, workers: int = HASH_WORKERS, queue_limit: int = HASH_QUEUE_LIMIT, context: CryptContext = bcrypt_context):
+        self.context = context
+        self.queue_limit = queue_limit
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self.pending = 0  # hashes submitted and not finished yet
+        self.lock = threading.Lock()  # pending is decremented from the pool threads
+
+    def _done(self, future):
+        with self.lock:
+            self.pending -= 1
+
+    async def _run(self, fn, *args):
+        with self.lock:
+            if self.pending >= self.queue_limit:
+                raise HTTPException(
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    detail="Too many concurrent password checks, try again shortly",
+                    headers={"Retry-After": str(RETRY_AFTER)},
+                )
+            self.pending += 1
+        try:
+            future = self.executor.submit(fn, *args)
+        except BaseException:
+            self._done(None)
+            raise
+        # Released when the work itself ends, not when the awaiting request is cancelled
+        future.add_done_callback(self._done)
+        return await asyncio.wrap_future(future)
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self.context.hash, password)
+
+    async def verify(self, password: str, hashed_password: Optional[str]) -> bool:
+        if not hashed_password:
+            return False
+        return await self._run(self.context.verify, password, hashed_password)
+
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,52 @@
+import re
+import unicodedata
+from typing import List
+
+# Letters and digits, plus the Devanagari vowel signs and marks that \w leaves out
+TOKEN_RE = re.compile(r"(?:[^\W_]|[ऀ-ॣ०-ॿ])+")
+POSSESSIVE_RE = re.compile(r"['’]s\b")
+
+NUKTA = "़"
+CHANDRABINDU, ANUSVARA = "ँ", "ं"
+
+STOPWORDS = {
+    # English
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "in", "is", "it",
+    "of", "on", "or", "that", "the", "this", "to", "was", "were", "with",
+    # Hindi
+    "और", "का", "की", "के", "को", "में", "से", "है", "हैं", "था", "थे", "थी", "पर",
+    "भी", "ही", "तो", "यह", "वह", "इस", "उस", "एक", "लिए", "ने", "कि", "या",
+}
+
+# Inflectional endings of a light Hindi stemmer, longest first
+HINDI_SUFFIXES = sorted([
+    "ियों", "ाओं", "ाएं", "ुओं", "ुएं", "ियां", "ाइयां", "ाकर", "ाइए", "ाया", "ेगी", "ेगा",
+    "ोगी", "ोगे", "ाने", "ाना", "ाते", "ाती", "ाता", "ों", "ें", "ीं", "ां", "कर", "ाओ",
+    "िए", "ाई", "ाए", "ने", "नी", "ना", "ते", "ती", "ता",
+    "ो", "े", "ू", "ु", "ी", "ि", "ा",
+], key=len, reverse=True)
+
+
+def _stem(token: str) -> str:
+    if "ऀ" <= token[0] <= "ॿ":
+        for suffix in HINDI_SUFFIXES:
+            if token.endswith(suffix) and len(token) - len(suffix) >= 2:
+                return token[:-len(suffix)]
+        return token
+    # English plurals; enough to match "law" and "laws"
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    """Search terms of a Hindi/English text, in order.
+
+    Lowercased and NFC-normalized, with nukta dropped and chandrabindu folded
+    into anusvara so spelling variants match; stopwords removed and common
+    inflections stripped. Documents and queries go through the same steps.
+    """
+    text = unicodedata.normalize("NFC", text).casefold()
+    text = text.replace(NUKTA, "").replace(CHANDRABINDU, ANUSVARA)
+    text = POSSESSIVE_RE.sub("", text)
+    return [_stem(token) for token in TOKEN_RE.findall(text) if token not in STOPWORDS]
@@ -1,15 +1,16 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import HTTPException, status
 from models.awareness import Awareness
 from schemas.reaction import AllowedEmoji
 
 
-def validate_awareness_exists(db: Session, awareness_id: int):
+async def validate_awareness_exists(db: AsyncSession, awareness_id: int):
     """Ensure awareness post exists and is verified"""
-    post = db.query(Awareness).filter(
-        Awareness.id == awareness_id, 
+    post = await db.scalar(select(Awareness).where(
+        Awareness.id == awareness_id,
         Awareness.is_verified.is_(True)
-    ).first()
+    ))
     
     if not post:
         raise HTTPException(
@@ -1,33 +1,13 @@
 from fastapi import WebSocket, WebSocketDisconnect, HTTPException
 from typing import Annotated
-from .manager import manager
-from routes.auth import get_db, SECRET_KEY, ALGORITHM
-from models.user import User
-from sqlalchemy.orm import Session
-from jose import JWTError, jwt
+from .manager import manager, snapshot_params
+from app.database import AsyncSessionLocal
+from services.auth_services import authenticate_token
 import logging
 import json
 
 logger = logging.getLogger(__name__)
 
-async def get_current_user_from_token(token: str, db: Session):
-    credentials_exception = HTTPException(
-        status_code=401,
-        detail="Could not validate credentials",
-    )
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        user_id: int = payload.get("user_id")
-        if username is None or user_id is None:
-            raise credentials_exception
-    except JWTError:
-        raise credentials_exception
-    user = db.query(User).filter(User.email == username).first()
-    if user is None:
-        raise credentials_exception
-    return user
-
 async def admin_websocket_endpoint(websocket: WebSocket):
     # Extract token from Authorization header or query parameters
     token = None
@@ -41,9 +21,9 @@ async def admin_websocket_endpoint(websocket: WebSocket):
         await websocket.close(code=1008, reason="No token provided")
         return
     
-    db = next(get_db())
     try:
-        user = await get_current_user_from_token(token, db)
+        async with AsyncSessionLocal() as db:
+            user = await authenticate_token(token, db)
     except HTTPException:
         await websocket.close(code=1008, reason="Invalid token")
         return
@@ -54,8 +34,9 @@ async def admin_websocket_endpoint(websocket: WebSocket):
     await manager.connect(websocket, group)
     logger.info(f"User {user.username} connected to admin WS as {group}")
 
-    # Send all last known locations
-    await manager.send_last_locations_to_client(websocket)
+    # Stream last known locations, only those changed since the client's cursor if it sent one
+    since, compress = snapshot_params(websocket)
+    manager.send_snapshot(websocket, since=since, compress=compress)
 
     try:
         while True:
@@ -71,9 +52,7 @@ async def admin_websocket_endpoint(websocket: WebSocket):
                 await websocket.close(code=1011, reason="Internal server error")
                 manager.disconnect(websocket, group)
                 return
-            await websocket.send_json({"status": "connected"})
+            await manager.send(websocket, {"status": "connected"}, key="status")
     except WebSocketDisconnect:
         logger.info(f"User {user.username} disconnected from admin WS")
         manager.disconnect(websocket, group)
-    finally:
-        db.close()
\ No newline at end of file
@@ -0,0 +1,317 @@
+from abc import ABC, abstractmethod
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple, Union
+from collections import Counter, deque
+import asyncio
+import json
+import logging
+import time
+from app.config import settings
+from services.location_cache import location_cache, CACHE_TTL
+
+logger = logging.getLogger(__name__)
+
+# Unset runs everything in-process; a redis:// URL shares groups across workers and nodes
+BROKER_URL = settings.broker_url
+BROKER_PREFIX = settings.broker_prefix
+EVENT_LOG_SIZE = 1000  # recent sequenced events kept for replay on reconnect
+RESUBSCRIBE_BASE_DELAY = 0.5  # seconds before resubscribing after the connection drops; doubled per failure
+RESUBSCRIBE_MAX_DELAY = 30.0  # seconds, upper bound for that backoff
+
+# handler(groups, frame, key, priority) delivers a published frame to this worker's sockets
+DeliveryHandler = Callable[[List[str], Union[str, bytes], Optional[str], bool], Awaitable[None]]
+
+
+class Broker(ABC):
+    """Publishes websocket frames to every worker and stores the shared location snapshot"""
+
+    def __init__(self):
+        self.handler: Optional[DeliveryHandler] = None
+
+    def bind(self, handler: DeliveryHandler):
+        self.handler = handler
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    @abstractmethod
+    async def publish(self, groups: List[str], frame: Union[str, bytes], key: Optional[str] = None, priority: bool = False):
+        raise NotImplementedError
+
+    @abstractmethod
+    async def set_location(self, user_id: int, location: dict) -> int:
+        """Store a user's last location and return its snapshot version"""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_snapshot(self, user_id: Optional[int] = None, since: int = 0) -> Tuple[int, Dict[int, dict]]:
+        """Current snapshot version plus the locations updated after version since"""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def next_event_seq(self) -> int:
+        """Next number in the sequence shared by all replayable events"""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def record_event(self, seq: int, groups: List[str], frame: str):
+        """Keep an event for replay, dropping the oldest past EVENT_LOG_SIZE"""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_events(self, groups: List[str], since: int = 0) -> Tuple[int, int, List[str]]:
+        """(latest seq, oldest seq still kept, frames after since sent to any of groups) in seq order"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def track_members(self, group: str, delta: int):
+        """Add delta to the sockets joined to group on this worker (called when sockets join and leave)"""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def count_members(self, group: str) -> int:
+        """Sockets joined to group across all workers"""
+        raise NotImplementedError
+
+
+class InMemoryBroker(Broker):
+    """Single-process broker: publishing delivers straight to the local sockets.
+
+    The snapshot is the process-wide location cache, which location ingest
+    already keeps up to date, so there is nothing else to share.
+    """
+
+    def __init__(self, cache=location_cache, log_size: int = EVENT_LOG_SIZE):
+        super().__init__()
+        self.cache = cache
+        self.seq = 0
+        self.events: deque = deque(maxlen=log_size)  # (seq, groups, frame)
+        self.members: Counter = Counter()  # group to joined sockets
+
+    async def publish(self, groups, frame, key=None, priority=False):
+        if self.handler:
+            await self.handler(list(groups), frame, key, priority)
+
+    async def set_location(self, user_id, location):
+        return self.cache.get_version(user_id)
+
+    async def get_snapshot(self, user_id=None, since=0):
+        return self.cache.snapshot([user_id] if user_id is not None else None, since)
+
+    async def next_event_seq(self):
+        self.seq += 1
+        return self.seq
+
+    async def record_event(self, seq, groups, frame):
+        self.events.append((seq, list(groups), frame))
+
+    async def get_events(self, groups, since=0):
+        oldest = self.events[0][0] if self.events else self.seq + 1
+        wanted = set(groups)
+        frames = [frame for seq, g, frame in self.events if seq > since and wanted.intersection(g)]
+        return self.seq, oldest, frames
+
+    def track_members(self, group, delta):
+        self.members[group] += delta
+        if self.members[group] <= 0:
+            del self.members[group]
+
+    async def count_members(self, group):
+        return self.members[group]
+
+
+class RedisBroker(Broker):
+    """Redis pub/sub broker.
+
+    Every worker subscribes to one channel and delivers the frames it receives
+    to its own sockets, including frames it published itself. The location
+    snapshot lives in a Redis hash, with a sorted set of update times used to
+    evict users not seen for CACHE_TTL seconds and one of versions (from a
+    shared INCR counter) used to fetch only what changed. Replayable events
+    are numbered by another INCR counter and kept in a capped list. Group
+    member counts are summed over workers in a hash; each worker takes its
+    own sockets back out on stop(), while counts of a worker that died stay
+    until the hash is cleared. Any client with the redis.asyncio API can be
+    passed in (e.g. fakeredis for tests).
+    """
+
+    def __init__(self, url: Optional[str] = None, client=None, prefix: str = BROKER_PREFIX, ttl: float = CACHE_TTL,
+                 log_size: int = EVENT_LOG_SIZE):
+        super().__init__()
+        if client is None:
+            try:
+                import redis.asyncio as aioredis
+            except ImportError:
+                raise RuntimeError("BROKER_URL is set but the redis package is not installed")
+            client = aioredis.from_url(url)
+        self.client = client
+        self.channel = f"{prefix}:ws"
+        self.locations_key = f"{prefix}:locations"
+        self.touched_key = f"{prefix}:locations:touched"
+        self.versions_key = f"{prefix}:locations:versions"
+        self.version_key = f"{prefix}:locations:version"
+        self.events_key = f"{prefix}:events"
+        self.seq_key = f"{prefix}:events:seq"
+        self.members_key = f"{prefix}:members"
+        self.ttl = ttl
+        self.log_size = log_size
+        self.listener: Optional[asyncio.Task] = None
+        self.members: Counter = Counter()  # group to sockets joined on this worker
+        self.member_updates: Set[asyncio.Task] = set()
+
+    async def start(self):
+        pubsub = await self._subscribe()
+        self.listener = asyncio.create_task(self._run(pubsub))
+
+    async def stop(self):
+        if self.listener:
+            self.listener.cancel()
+            try:
+                await self.listener
+            except asyncio.CancelledError:
+                pass
+            self.listener = None
+        await asyncio.gather(*self.member_updates, return_exceptions=True)
+        joined = {group: count for group, count in self.members.items() if count > 0}
+        if joined:
+            pipe = self.client.pipeline()
+            for group, count in joined.items():
+                pipe.hincrby(self.members_key, group, -count)
+            await pipe.execute()
+        self.members.clear()
+
+    async def _subscribe(self):
+        pubsub = self.client.pubsub()
+        await pubsub.subscribe(self.channel)
+        return pubsub
+
+    async def _run(self, pubsub):
+        # Listen until stop(); a dropped connection (e.g. Redis restarting) is resubscribed with backoff
+        delay = RESUBSCRIBE_BASE_DELAY
+        while True:
+            try:
+                if pubsub is None:
+                    pubsub = await self._subscribe()
+                    logger.info("Resubscribed to the broker channel")
+                    delay = RESUBSCRIBE_BASE_DELAY
+                await self._listen(pubsub)
+                raise ConnectionError("subscription ended")
+            except Exception as e:
+                logger.error(f"Broker subscription lost: {e}; resubscribing in {delay:.1f}s")
+                await self._close(pubsub)
+                pubsub = None
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, RESUBSCRIBE_MAX_DELAY)
+
+    async def _close(self, pubsub):
+        if pubsub is None:
+            return
+        try:
+            await pubsub.aclose()
+        except Exception:
+            pass  # the connection is already gone
+
+    async def _listen(self, pubsub):
+        try:
+            async for message in pubsub.listen():
+                if message["type"] != "message" or not self.handler:
+                    continue
+                try:
+                    groups, frame, key, priority = self._decode(message["data"])
+                    await self.handler(groups, frame, key, priority)
+                except Exception as e:
+                    logger.error(f"Failed to deliver broker message: {e}")
+        except asyncio.CancelledError:
+            await self._close(pubsub)
+            raise
+
+    @staticmethod
+    def _encode(groups, frame, key, priority=False):
+        # Header line with routing info, then the frame untouched
+        header = json.dumps({"g": list(groups), "k": key, "b": isinstance(frame, bytes), "p": priority})
+        body = frame if isinstance(frame, bytes) else frame.encode()
+        return header.encode() + b"\n" + body
+
+    @staticmethod
+    def _decode(data):
+        header, _, body = data.partition(b"\n")
+        meta = json.loads(header)
+        frame = body if meta["b"] else body.decode()
+        return meta["g"], frame, meta["k"], meta.get("p", False)
+
+    async def publish(self, groups, frame, key=None, priority=False):
+        await self.client.publish(self.channel, self._encode(groups, frame, key, priority))
+
+    async def set_location(self, user_id, location):
+        version = await self.client.incr(self.version_key)
+        pipe = self.client.pipeline()
+        pipe.hset(self.locations_key, str(user_id), json.dumps({**location, "version": version}))
+        pipe.zadd(self.touched_key, {str(user_id): time.time()})
+        pipe.zadd(self.versions_key, {str(user_id): version})
+        await pipe.execute()
+        return version
+
+    async def evict_stale(self):
+        stale = await self.client.zrangebyscore(self.touched_key, "-inf", time.time() - self.ttl)
+        if stale:
+            pipe = self.client.pipeline()
+            pipe.hdel(self.locations_key, *stale)
+            pipe.zrem(self.touched_key, *stale)
+            pipe.zrem(self.versions_key, *stale)
+            await pipe.execute()
+
+    async def get_snapshot(self, user_id=None, since=0):
+        await self.evict_stale()
+        # Read the version first: a client resuming from it may see an update twice but never misses one
+        version = int(await self.client.get(self.version_key) or 0)
+        if user_id is not None:
+            raw = await self.client.hget(self.locations_key, str(user_id))
+            location = json.loads(raw) if raw else None
+            if location is None or location.get("version", 0) <= since:
+                return version, {}
+            return version, {user_id: location}
+        if since:
+            changed = await self.client.zrangebyscore(self.versions_key, f"({since}", "+inf")
+            if not changed:
+                return version, {}
+            raw = await self.client.hmget(self.locations_key, changed)
+            return version, {int(uid): json.loads(loc) for uid, loc in zip(changed, raw) if loc}
+        raw = await self.client.hgetall(self.locations_key)
+        return version, {int(uid): json.loads(loc) for uid, loc in raw.items()}
+
+    async def next_event_seq(self):
+        return await self.client.incr(self.seq_key)
+
+    async def record_event(self, seq, groups, frame):
+        pipe = self.client.pipeline()
+        pipe.rpush(self.events_key, json.dumps({"s": seq, "g": list(groups), "f": frame}))
+        pipe.ltrim(self.events_key, -self.log_size, -1)
+        await pipe.execute()
+
+    async def get_events(self, groups, since=0):
+        latest = int(await self.client.get(self.seq_key) or 0)
+        # Workers may push slightly out of order, so sort by seq rather than list position
+        events = sorted((json.loads(raw) for raw in await self.client.lrange(self.events_key, 0, -1)), key=lambda e: e["s"])
+        oldest = events[0]["s"] if events else latest + 1
+        wanted = set(groups)
+        frames = [e["f"] for e in events if e["s"] > since and wanted.intersection(e["g"])]
+        return latest, oldest, frames
+
+
+    def track_members(self, group, delta):
+        self.members[group] += delta
+        # Increments commute, so the updates may land in any order
+        task = asyncio.create_task(self.client.hincrby(self.members_key, group, delta))
+        self.member_updates.add(task)
+        task.add_done_callback(self.member_updates.discard)
+
+    async def count_members(self, group):
+        return max(int(await self.client.hget(self.members_key, group) or 0), 0)
+
+
+def create_broker(url: Optional[str] = BROKER_URL) -> Broker:
+    if url:
+        return RedisBroker(url)
+    return InMemoryBroker()
@@ -1,49 +1,19 @@
 from fastapi import WebSocket, WebSocketDisconnect, WebSocketException, HTTPException
 from typing import Annotated
 from .manager import manager
-from services.location_services import upsert_live_location
-from routes.auth import get_db, SECRET_KEY, ALGORITHM
-from models.user import User
+from services.location_services import ingest_location_fixes
+from services.sos_escalation import sos_scheduler
+from app.database import AsyncSessionLocal
+from services.auth_services import authenticate_token
 from models.contact import Contact
-from sqlalchemy.orm import Session
-from jose import JWTError, jwt
 from datetime import datetime, timedelta
 import logging
-import math
 from pydantic import ValidationError
 from schemas.location import LocationUpdate
 import json
 
 logger = logging.getLogger(__name__)
 
-last_location = {}
-
-def haversine_distance(lat1, lon1, lat2, lon2):
-    R = 6371  # Earth radius in km
-    dlat = math.radians(lat2 - lat1)
-    dlon = math.radians(lon2 - lon1)
-    a = math.sin(dlat/2)**2 + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlon/2)**2
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-    return R * c
-
-async def get_current_user_from_token(token: str, db: Session):
-    credentials_exception = HTTPException(
-        status_code=401,
-        detail="Could not validate credentials",
-    )
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        user_id: int = payload.get("user_id")
-        if username is None or user_id is None:
-            raise credentials_exception
-    except JWTError:
-        raise credentials_exception
-    user = db.query(User).filter(User.email == username).first()
-    if user is None:
-        raise credentials_exception
-    return user
-
 async def location_websocket_endpoint(websocket: WebSocket, user_id: int):
     # Extract token from Authorization header or query parameters
     token = None
@@ -57,9 +27,9 @@ async def location_websocket_endpoint(websocket: WebSocket, user_id: int):
         await websocket.close(code=1008, reason="No token provided")
         return
     
-    db = next(get_db())
     try:
-        user = await get_current_user_from_token(token, db)
+        async with AsyncSessionLocal() as db:
+            user = await authenticate_token(token, db)
     except HTTPException:
         await websocket.close(code=1008, reason="Invalid token")
         return
@@ -76,7 +46,11 @@ async def location_websocket_endpoint(websocket: WebSocket, user_id: int):
         while True:
             try:
                 data = await websocket.receive_json()
-                location_update = LocationUpdate(**data)
+                # A message is one fix or a list of fixes buffered by the client
+                if isinstance(data, list):
+                    fixes = [LocationUpdate(**item) for item in data]
+                else:
+                    fixes = [LocationUpdate(**data)]
             except json.JSONDecodeError as e:
                 logger.error(f"JSON decode error for user {user.username}: {e}")
                 await websocket.close(code=1003, reason="Invalid JSON")
@@ -93,28 +67,23 @@ async def location_websocket_endpoint(websocket: WebSocket, user_id: int):
                 manager.disconnect(websocket, group)
                 return
 
-            latitude = location_update.latitude
-            longitude = location_update.longitude
-            timestamp = location_update.timestamp or datetime.utcnow().isoformat()
-
-            # Check if location has changed significantly (more than 10 meters) or time elapsed
-            user_id = user.id
-            current_time = datetime.utcnow()
-            if user_id in last_location:
-                last_lat, last_lon, last_time = last_location[user_id]
-                distance = haversine_distance(last_lat, last_lon, latitude, longitude)
-                time_diff = (current_time - last_time).total_seconds()
-                if distance < 0.01 and time_diff < 30:  # 10 meters, 30 seconds
-                    continue  # Skip update
-
-            last_location[user_id] = (latitude, longitude, current_time)
-
-            # Store the location data
-            location = upsert_live_location(db, user.id, latitude, longitude)
+            # Drop fixes that barely moved and queue the rest for the next bulk write;
+            # broadcasting does not wait on the database. During an active SOS every
+            # fix is kept and sent ahead of other traffic.
+            in_sos = sos_scheduler.is_tracking(user.id)
+            if in_sos:
+                sos_scheduler.touch(user.id)
+            accepted = ingest_location_fixes(user.id, fixes, high_frequency=in_sos)
+            if not accepted:
+                continue  # Skip update
+            latest = accepted[-1]
+            latitude = latest["latitude"]
+            longitude = latest["longitude"]
+            timestamp = latest["timestamp"]
             logger.info(f"Updated location for user {user.id}: {latitude}, {longitude}")
 
-            # Update last known location cache
-            manager.update_last_location(user.id, {"latitude": latitude, "longitude": longitude, "timestamp": timestamp})
+            # Update last known location cache; the version lets dashboards resume from a cursor
+            version = await manager.update_last_location(user.id, {"latitude": latitude, "longitude": longitude, "timestamp": timestamp})
 
             # Broadcast to emergency contacts, SOS responders, and admin dashboard
             message = {
@@ -123,11 +92,14 @@ async def location_websocket_endpoint(websocket: WebSocket, user_id: int):
                 "username": user.username,
                 "latitude": latitude,
                 "longitude": longitude,
-                "timestamp": timestamp
+                "timestamp": timestamp,
+                "speed_mps": latest["speed_mps"],
+                "bearing": latest["bearing"],
+                "version": version
             }
-            await manager.broadcast_to_group(message, f"emergency_contacts:{user.id}")
-            await manager.broadcast_to_group(message, "sos_responders")
-            await manager.broadcast_to_group(message, "admin_dashboard")
+            await manager.broadcast(
+                message, [f"emergency_contacts:{user.id}", "sos_responders", "admin_dashboard"], priority=in_sos
+            )
 
     except WebSocketDisconnect:
         logger.info(f"User {user.username} disconnected from location WS")
@@ -136,5 +108,3 @@ async def location_websocket_endpoint(websocket: WebSocket, user_id: int):
         logger.error(f"Error in WS for user {user.username}: {e}")
         await websocket.close(code=1011, reason="Internal server error")
         manager.disconnect(websocket, group)
-    finally:
-        db.close()
\ No newline at end of file
@@ -1,43 +1,376 @@
 from fastapi import WebSocket
-from typing import List, Dict, Set
-from fastapi import Depends
-from models.user import User
-from routes.auth import get_current_user
-from sqlalchemy.orm import Session
-from models.contact import Contact
+from typing import List, Dict, Set, Optional, Iterable, Union
+from .broker import Broker, create_broker
+from collections import deque
+import asyncio
+import json
+import logging
+import zlib
+
+logger = logging.getLogger(__name__)
+
+# Outbound queue limits per connection
+MAX_QUEUE_SIZE = 256      # frames buffered per socket before dropping the oldest
+MAX_DROPPED_FRAMES = 1024  # drops since the last successful send before eviction
+SEND_TIMEOUT = 10.0       # seconds a single send may take before eviction
+
+# Initial location snapshot streaming
+SNAPSHOT_CHUNK_SIZE = 500       # locations per snapshot frame
+SNAPSHOT_COMPRESS_LEVEL = 6     # zlib level for clients that asked for compressed frames
+
+
+def encode_message(message: dict) -> str:
+    """Encode a message the same way WebSocket.send_json does"""
+    return json.dumps(message, separators=(",", ":"), ensure_ascii=False)
+
+
+# Kind of a queued entry
+NORMAL = 0  # may be dropped when the queue is full
+URGENT = 1  # priority lane; only dropped to make room for another priority frame
+KEEP = 2    # queued by put(); never dropped
+
+
+class _Outbox:
+    """Bounded outbound queue for one websocket, drained by its own writer task.
+
+    Messages with a coalesce key (e.g. the latest location of a user) replace
+    any still-queued message with the same key instead of queueing behind it;
+    a priority update of a normal entry moves it to the priority lane.
+    Priority messages (SOS events, locations of users in an active SOS) go in
+    a separate lane that the writer always drains first.
+
+    When the queue is full the oldest normal message is dropped. With none
+    left, an incoming normal message is dropped itself, and an incoming
+    priority one replaces the oldest priority message (or is queued over the
+    limit if the queue holds only put() frames). Frames queued by put()
+    (snapshot chunks, replays) are never dropped; put() waits for room.
+    """
+
+    def __init__(self, websocket: WebSocket, maxsize: int = MAX_QUEUE_SIZE):
+        self.websocket = websocket
+        self.maxsize = maxsize
+        self.queue: deque = deque()  # entries are [key, frame, kind]
+        self.urgent: deque = deque()  # priority lane, same entries
+        self.pending: Dict[str, list] = {}  # coalesce key to queued entry
+        self.dropped = 0  # dropped since the last successful send
+        self.ready = asyncio.Event()
+        self.space = asyncio.Event()  # set whenever the queue is below maxsize
+        self.space.set()
+        self.task: Optional[asyncio.Task] = None
+        self.snapshot_task: Optional[asyncio.Task] = None
+        self.replay_task: Optional[asyncio.Task] = None
+
+    def size(self) -> int:
+        return len(self.queue) + len(self.urgent)
+
+    def _evict(self, priority: bool) -> bool:
+        """Drop the oldest entry an incoming frame may displace. Returns False if there is none."""
+        for i, entry in enumerate(self.queue):
+            if entry[2] == NORMAL:
+                del self.queue[i]
+                break
+        else:
+            if not (priority and self.urgent):
+                return False
+            entry = self.urgent.popleft()
+        if entry[0] is not None:
+            self.pending.pop(entry[0], None)
+        return True
+
+    def push(self, frame: Union[str, bytes], key: Optional[str] = None, priority: bool = False) -> bool:
+        """Queue an encoded frame without blocking. Returns False if the socket fell too far behind."""
+        if key is not None and key in self.pending:
+            entry = self.pending[key]
+            entry[1] = frame
+            if priority and entry[2] == NORMAL:
+                self.queue.remove(entry)
+                entry[2] = URGENT
+                self.urgent.append(entry)
+            return True
+
+        if self.size() >= self.maxsize:
+            if self._evict(priority):
+                self.dropped += 1
+            elif not priority:
+                self.dropped += 1  # nothing droppable queued: drop the incoming frame
+                return self.dropped <= MAX_DROPPED_FRAMES
+            if self.dropped > MAX_DROPPED_FRAMES:
+                return False
+
+        entry = [key, frame, URGENT if priority else NORMAL]
+        (self.urgent if priority else self.queue).append(entry)
+        if key is not None:
+            self.pending[key] = entry
+        if self.size() >= self.maxsize:
+            self.space.clear()
+        self.ready.set()
+        return True
+
+    async def put(self, frame: Union[str, bytes]):
+        """Queue a frame that must not be dropped, waiting until the writer makes room"""
+        while self.size() >= self.maxsize:
+            self.space.clear()
+            await self.space.wait()
+        self.queue.append([None, frame, KEEP])
+        self.ready.set()
+
+    def pop(self):
+        key, frame, _ = (self.urgent or self.queue).popleft()
+        if key is not None:
+            self.pending.pop(key, None)
+        if not self.size():
+            self.ready.clear()
+        if self.size() < self.maxsize:
+            self.space.set()
+        return frame
+
 
 class ConnectionManager:
-    def __init__(self):
-        self.active_connections: Dict[str, List[WebSocket]] = {}  # group to list of websockets
-        self.last_known_locations: Dict[int, dict] = {}  # user_id to location dict
+    def __init__(self, broker: Optional[Broker] = None):
+        self.active_connections: Dict[str, List[WebSocket]] = {}  # group to list of websockets (this worker only)
+        self.outboxes: Dict[WebSocket, _Outbox] = {}  # websocket to its outbound queue
+        self.memberships: Dict[WebSocket, Set[str]] = {}  # websocket to the groups it joined
+        self.broker = broker or create_broker()
+        self.broker.bind(self.deliver)
+
+    async def start(self):
+        await self.broker.start()
+
+    async def stop(self):
+        await self.broker.stop()
 
     async def connect(self, websocket: WebSocket, group: str):
         await websocket.accept()
+        self.join(websocket, group)
+
+    def join(self, websocket: WebSocket, group: str):
+        """Add an accepted socket to another group"""
         if group not in self.active_connections:
             self.active_connections[group] = []
         self.active_connections[group].append(websocket)
+        self.memberships.setdefault(websocket, set()).add(group)
+        self.broker.track_members(group, 1)
+        if websocket not in self.outboxes:
+            outbox = _Outbox(websocket)
+            outbox.task = asyncio.create_task(self._writer(outbox))
+            self.outboxes[websocket] = outbox
 
     def disconnect(self, websocket: WebSocket, group: str):
         if group in self.active_connections:
-            self.active_connections[group].remove(websocket)
+            if websocket in self.active_connections[group]:
+                self.active_connections[group].remove(websocket)
+                self.broker.track_members(group, -1)
             if not self.active_connections[group]:
                 del self.active_connections[group]
 
+        groups = self.memberships.get(websocket)
+        if groups is not None:
+            groups.discard(group)
+            if not groups:
+                del self.memberships[websocket]
+                self._stop_writer(websocket)
+
+    def _stop_writer(self, websocket: WebSocket):
+        outbox = self.outboxes.pop(websocket, None)
+        if outbox is None:
+            return
+        for task in (outbox.task, outbox.snapshot_task, outbox.replay_task):
+            if task and task is not asyncio.current_task():
+                task.cancel()
+
+    def disconnect_all(self, websocket: WebSocket):
+        """Drop a socket from every group it joined"""
+        for group in list(self.memberships.get(websocket, ())):
+            self.disconnect(websocket, group)
+        self._stop_writer(websocket)
+
+    async def evict(self, websocket: WebSocket, reason: str):
+        """Drop a socket from every group and close it"""
+        self.disconnect_all(websocket)
+        try:
+            await websocket.close(code=1011, reason=reason)
+        except Exception:
+            pass
+
+    async def _writer(self, outbox: _Outbox):
+        websocket = outbox.websocket
+        try:
+            while True:
+                await outbox.ready.wait()
+                frame = outbox.pop()
+                if isinstance(frame, bytes):
+                    await asyncio.wait_for(websocket.send_bytes(frame), SEND_TIMEOUT)
+                else:
+                    await asyncio.wait_for(websocket.send_text(frame), SEND_TIMEOUT)
+                outbox.dropped = 0
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.warning(f"Evicting websocket after failed send: {e}")
+            await self.evict(websocket, "Send failed")
+
+    async def group_size(self, group: str) -> int:
+        """Sockets joined to a group on every worker"""
+        return await self.broker.count_members(group)
+
+    async def send(self, websocket: WebSocket, message: dict, key: Optional[str] = None):
+        """Queue a message for one socket, behind what its outbox already holds"""
+        outbox = self.outboxes.get(websocket)
+        if outbox is not None and not outbox.push(encode_message(message), key):
+            logger.warning("Evicting websocket: too far behind")
+            await self.evict(websocket, "Too slow")
+
     async def broadcast_to_group(self, message: dict, group: str):
-        if group in self.active_connections:
-            for connection in self.active_connections[group]:
-                await connection.send_json(message)
+        await self.broadcast(message, [group])
 
-    def update_last_location(self, user_id: int, location: dict):
-        self.last_known_locations[user_id] = location
+    async def broadcast(
+        self,
+        message: Union[dict, str, bytes],
+        groups: Iterable[str],
+        key: Optional[str] = None,
+        priority: bool = False
+    ):
+        """Send one message to every socket in the given groups on every worker.
 
-    async def send_last_locations_to_client(self, websocket: WebSocket, user_id: int = None):
-        if user_id:
-            if user_id in self.last_known_locations:
-                loc = self.last_known_locations[user_id]
-                await websocket.send_json({"type": "last_known_location", "user_id": user_id, **loc})
+        The message is encoded once and each socket receives it once, even if
+        it belongs to several of the groups. Pre-encoded str/bytes frames are
+        sent as-is. Priority messages jump ahead of anything queued normally.
+        """
+        if isinstance(message, dict):
+            # Only the newest location of a user matters to a subscriber that is behind
+            if key is None and message.get("type") == "location_update":
+                key = f"location_update:{message.get('user_id')}"
+            frame = encode_message(message)
         else:
-            for uid, loc in self.last_known_locations.items():
-                await websocket.send_json({"type": "last_known_location", "user_id": uid, **loc})
+            frame = message
+
+        await self.broker.publish(list(groups), frame, key, priority)
+
+    async def deliver(self, groups: List[str], frame: Union[str, bytes], key: Optional[str] = None, priority: bool = False):
+        """Queue a published frame for this worker's sockets in the given groups"""
+        targets = {}
+        for group in groups:
+            for connection in self.active_connections.get(group, ()):
+                targets[connection] = group
+
+        lagging = []
+        for connection, group in targets.items():
+            outbox = self.outboxes.get(connection)
+            if outbox and not outbox.push(frame, key, priority):
+                lagging.append((connection, group))
+
+        for connection, group in lagging:
+            logger.warning(f"Evicting websocket in group {group}: too far behind")
+            await self.evict(connection, "Too slow")
+
+    async def publish_event(self, message: dict, groups: Iterable[str], priority: bool = True) -> int:
+        """Broadcast a message that subscribers can replay later; returns the seq it was stamped with"""
+        groups = list(groups)
+        seq = await self.broker.next_event_seq()
+        frame = encode_message({**message, "seq": seq})
+        await self.broker.record_event(seq, groups, frame)
+        await self.broker.publish(groups, frame, None, priority)
+        return seq
+
+    def send_replay(self, websocket: WebSocket, groups: Iterable[str], since: int):
+        """Resend the recorded events of the given groups with seq > since, in the background.
+
+        The replayed frames are followed by an event_replay message with the
+        latest seq. Its gap flag is set when events after since have already
+        left the ring buffer, in which case the client should refetch state
+        over REST. Live events may interleave with the replay; clients drop
+        any seq they have already seen.
+        """
+        outbox = self.outboxes.get(websocket)
+        if outbox is None:
+            return
+        if outbox.replay_task:
+            outbox.replay_task.cancel()
+        outbox.replay_task = asyncio.create_task(self._stream_replay(outbox, list(groups), since))
+
+    async def _stream_replay(self, outbox: _Outbox, groups: List[str], since: int):
+        try:
+            latest, oldest, frames = await self.broker.get_events(groups, since)
+            for frame in frames:
+                await outbox.put(frame)
+            await outbox.put(encode_message({
+                "type": "event_replay",
+                "since": since,
+                "seq": latest,
+                "count": len(frames),
+                "gap": oldest > since + 1 and latest > since,
+            }))
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.error(f"Failed to replay events: {e}")
+        finally:
+            if outbox.replay_task is asyncio.current_task():
+                outbox.replay_task = None
+
+    async def update_last_location(self, user_id: int, location: dict) -> int:
+        """Store a user's last location; returns the snapshot version to tag its update with"""
+        return await self.broker.set_location(user_id, location)
+
+    def send_snapshot(self, websocket: WebSocket, user_id: Optional[int] = None, since: int = 0, compress: bool = False):
+        """Stream the last known locations to a connected socket in the background.
+
+        Locations go out SNAPSHOT_CHUNK_SIZE at a time as location_snapshot
+        frames carrying the snapshot version. A client that reconnects with
+        since=<version> only gets the users updated after it; every later
+        location_update carries its own version, so the client keeps its
+        cursor current and only ever receives deltas. With compress, frames
+        are zlib-compressed JSON sent as binary.
+        """
+        outbox = self.outboxes.get(websocket)
+        if outbox is None:
+            return
+        if outbox.snapshot_task:
+            outbox.snapshot_task.cancel()
+        outbox.snapshot_task = asyncio.create_task(self._stream_snapshot(outbox, user_id, since, compress))
+
+    async def _stream_snapshot(self, outbox: _Outbox, user_id: Optional[int], since: int, compress: bool):
+        try:
+            version, locations = await self.broker.get_snapshot(user_id, since)
+            entries = [{"user_id": uid, **loc} for uid, loc in locations.items()]
+            chunks = max(1, -(-len(entries) // SNAPSHOT_CHUNK_SIZE))
+            for chunk in range(chunks):
+                frame = encode_message({
+                    "type": "location_snapshot",
+                    "version": version,
+                    "since": since,
+                    "chunk": chunk,
+                    "chunks": chunks,
+                    "locations": entries[chunk * SNAPSHOT_CHUNK_SIZE:(chunk + 1) * SNAPSHOT_CHUNK_SIZE],
+                })
+                if compress:
+                    frame = zlib.compress(frame.encode(), SNAPSHOT_COMPRESS_LEVEL)
+                await outbox.put(frame)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.error(f"Failed to send location snapshot: {e}")
+        finally:
+            if outbox.snapshot_task is asyncio.current_task():
+                outbox.snapshot_task = None
+
+
+def replay_since(websocket: WebSocket, param: str = "sos_since") -> Optional[int]:
+    """Event seq the client last saw, or None if it did not ask for a replay"""
+    try:
+        return max(int(websocket.query_params[param]), 0)
+    except (KeyError, ValueError):
+        return None
+
+
+def snapshot_params(websocket: WebSocket):
+    """(since, compress) requested in the websocket query string"""
+    try:
+        since = max(int(websocket.query_params.get("since", 0)), 0)
+    except ValueError:
+        since = 0
+    compress = websocket.query_params.get("compress", "").lower() in ("1", "true", "zlib")
+    return since, compress
+
 
-manager = ConnectionManager()
\ No newline at end of file
+manager = ConnectionManager()